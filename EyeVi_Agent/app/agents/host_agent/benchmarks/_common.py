@@ -0,0 +1,7 @@
+"""
+Helper dùng chung cho các benchmark script của host agent
+"""
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
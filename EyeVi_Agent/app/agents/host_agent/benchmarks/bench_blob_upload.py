@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark đường đi của một file upload 5 MB từ host tới search agent (không tính network)
+
+- inline: base64 ở host -> JSON A2A payload -> decode ở executor -> base64 lại ở SearchChain.arun
+          -> decode ở EmbedQueryNode (luồng cũ)
+- blob (new):    upload mới, blob store ghi file, payload chỉ chứa blob:// reference, agent đọc + verify SHA-256
+- blob (repeat): cùng ảnh upload lại trong session, blob đã tồn tại nên không ghi lại
+- blob (ref):    client gửi file_refs thay vì upload lại
+
+Usage:
+    python benchmarks/bench_blob_upload.py --size-mb 5 --iterations 20 --backend local
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from server.blob_store import BlobStore, LocalBlobStore, RedisBlobStore, blob_uri, parse_blob_uri
+from _common import percentile
+
+def a2a_payload(file_part: dict) -> str:
+    return json.dumps({
+        "message": {
+            "role": "user",
+            "parts": [{"kind": "text", "text": "Tìm kính giống ảnh này"}, {"kind": "file", "file": file_part}],
+            "messageId": "bench"
+        }
+    })
+
+def run_inline(data: bytes) -> int:
+    # Host: encode base64 vào FileInfo.data
+    payload = a2a_payload({"name": "image.jpg", "mimeType": "image/jpeg", "bytes": base64.b64encode(data).decode("utf-8")})
+    # Search agent: parse JSON, decode ở executor
+    file_part = json.loads(payload)["message"]["parts"][1]["file"]
+    image_bytes = base64.b64decode(file_part["bytes"])
+    # SearchChain.arun encode lại, EmbedQueryNode decode lại
+    state_image = base64.b64encode(image_bytes).decode("utf-8")
+    assert len(base64.b64decode(state_image)) == len(data)
+    return len(payload)
+
+async def agent_read(store: BlobStore, uri: str) -> bytes:
+    """Phía search agent: đọc blob và verify SHA-256 (như tools/blob_store.BlobReader)"""
+    digest = parse_blob_uri(uri)
+    image_bytes = await store.get(digest)
+    assert await asyncio.to_thread(lambda: hashlib.sha256(image_bytes).hexdigest()) == digest
+    return image_bytes
+
+async def run_blob(store: BlobStore, data: bytes, use_ref: str = None) -> int:
+    if use_ref:
+        metadata = await store.get_metadata(use_ref)
+        uri = blob_uri(use_ref)
+        mime_type = metadata["mime_type"]
+    else:
+        digest, _ = await store.put(data, "image/jpeg", "image.jpg")
+        uri = blob_uri(digest)
+        mime_type = "image/jpeg"
+    payload = a2a_payload({"name": "image.jpg", "mimeType": mime_type, "uri": uri})
+    file_part = json.loads(payload)["message"]["parts"][1]["file"]
+    image_bytes = await agent_read(store, file_part["uri"])
+    assert len(image_bytes) == len(data)
+    return len(payload)
+
+async def timed(fn, iterations: int):
+    latencies, size = [], 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            result = await result
+        latencies.append((time.perf_counter() - start) * 1000)
+        size = result
+    return latencies, size
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark file upload path: inline base64 vs blob store")
+    parser.add_argument("--size-mb", type=float, default=5)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--backend", choices=["local", "redis"], default="local")
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = LocalBlobStore(directory=tmp_dir) if args.backend == "local" else RedisBlobStore(ttl=300)
+
+        print(f"{'path':>14} | {'p50 ms':>8} | {'p95 ms':>8} | {'mean ms':>8} | {'A2A payload':>12}")
+        print("-" * 64)
+
+        def report(name, latencies, payload_size):
+            print(
+                f"{name:>14} | {statistics.median(latencies):>8.2f} | {percentile(latencies, 0.95):>8.2f} | "
+                f"{statistics.mean(latencies):>8.2f} | {payload_size:>10} B"
+            )
+
+        data = os.urandom(size)
+        report("inline", *await timed(lambda: run_inline(data), args.iterations))
+
+        # Mỗi iteration một ảnh khác nhau -> luôn ghi blob mới
+        images = [os.urandom(size) for _ in range(args.iterations)]
+        new_uploads = iter(images)
+        report("blob (new)", *await timed(lambda: run_blob(store, next(new_uploads)), args.iterations))
+
+        report("blob (repeat)", *await timed(lambda: run_blob(store, data), args.iterations))
+
+        digest = hashlib.sha256(data).hexdigest()
+        report("blob (ref)", *await timed(lambda: run_blob(store, data, use_ref=digest), args.iterations))
+
+        print(f"\nblob store stats: {store.get_stats()}")
+        await store.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark lưu chat history trên Redis: JSON blob (GET + SET toàn bộ) vs append-only LIST (RPUSH)
+
+Đo latency mỗi turn và số bytes ghi xuống Redis cho các session dài 10/50/100/200 turns.
+
+Usage:
+    python benchmarks/bench_chat_history_storage.py
+    python benchmarks/bench_chat_history_storage.py --turns 10 50 100 200 --sessions 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import redis.asyncio as aioredis
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from server.conversation_store import HISTORY_TTL_SECONDS
+from _common import percentile
+
+SAMPLE_CONTENT = "Mình muốn tìm kính mát Rayban gọng tròn, giá dưới 3 triệu, phù hợp mặt tròn. " * 2
+
+def make_message(turn: int) -> dict:
+    return {
+        "type": "human" if turn % 2 == 0 else "ai",
+        "content": SAMPLE_CONTENT,
+        "additional_kwargs": {},
+        "timestamp": datetime.now().isoformat()
+    }
+
+async def run_blob(redis_client: aioredis.Redis, key: str, turns: int):
+    """Format cũ: mỗi turn GET toàn bộ JSON, append, SET lại"""
+    latencies, bytes_written = [], 0
+    for turn in range(turns):
+        start = time.perf_counter()
+        data = await redis_client.get(key)
+        history = json.loads(data) if data else {"messages": [], "created_at": datetime.now().isoformat()}
+        history["messages"].append(make_message(turn))
+        history["last_updated"] = datetime.now().isoformat()
+        payload = json.dumps(history, ensure_ascii=False)
+        await redis_client.set(key, payload, ex=HISTORY_TTL_SECONDS)
+        latencies.append((time.perf_counter() - start) * 1000)
+        bytes_written += len(payload.encode("utf-8"))
+    return latencies, bytes_written
+
+async def run_list(redis_client: aioredis.Redis, key: str, turns: int):
+    """Format mới: mỗi turn một pipeline RPUSH + LTRIM + EXPIRE + meta"""
+    meta_key = f"{key}:meta"
+    latencies, bytes_written = [], 0
+    for turn in range(turns):
+        start = time.perf_counter()
+        entry = json.dumps(make_message(turn), ensure_ascii=False)
+        now = datetime.now().isoformat()
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.rpush(key, entry)
+        pipe.ltrim(key, -1000, -1)
+        pipe.expire(key, HISTORY_TTL_SECONDS)
+        pipe.hsetnx(meta_key, "created_at", now)
+        pipe.hset(meta_key, "last_updated", now)
+        pipe.hincrby(meta_key, "message_count", 1)
+        pipe.expire(meta_key, HISTORY_TTL_SECONDS)
+        await pipe.execute()
+        latencies.append((time.perf_counter() - start) * 1000)
+        bytes_written += len(entry.encode("utf-8"))
+    return latencies, bytes_written
+
+async def bench(redis_client: aioredis.Redis, turns: int, sessions: int):
+    prefix = f"bench_chat_history:{uuid4().hex[:8]}"
+    results = {}
+    for name, runner in (("blob", run_blob), ("list", run_list)):
+        all_latencies, last_turn_latencies, total_bytes = [], [], 0
+        keys = []
+        for i in range(sessions):
+            key = f"{prefix}:{name}:{i}"
+            keys.extend([key, f"{key}:meta"])
+            latencies, bytes_written = await runner(redis_client, key, turns)
+            all_latencies.extend(latencies)
+            last_turn_latencies.append(latencies[-1])
+            total_bytes += bytes_written
+        await redis_client.delete(*keys)
+        results[name] = {
+            "p50_ms": statistics.median(all_latencies),
+            "p95_ms": percentile(all_latencies, 0.95),
+            "last_turn_ms": statistics.median(last_turn_latencies),
+            "bytes_per_turn": total_bytes / (turns * sessions)
+        }
+    return results
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark Redis chat history storage")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args()
+
+    redis_client = aioredis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        password=os.getenv("REDIS_PASSWORD") or None,
+        db=int(os.getenv("REDIS_DB", "0")),
+        decode_responses=True
+    )
+    await redis_client.ping()
+
+    print(f"{'turns':>6} | {'format':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'last turn ms':>12} | {'bytes/turn':>10}")
+    print("-" * 66)
+    for turns in args.turns:
+        results = await bench(redis_client, turns, args.sessions)
+        for name, stats in results.items():
+            print(
+                f"{turns:>6} | {name:>6} | {stats['p50_ms']:>8.3f} | {stats['p95_ms']:>8.3f} | "
+                f"{stats['last_turn_ms']:>12.3f} | {stats['bytes_per_turn']:>10.0f}"
+            )
+
+    await redis_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
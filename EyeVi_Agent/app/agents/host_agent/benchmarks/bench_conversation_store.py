@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-turn write latency: triple-write cũ vs ConversationStore
+
+- before: LangChain history JSON blob (GET + SET cho user message, GET + SET cho AI message)
+          + ChatHistory JSON blob chat_history:* (GET + SET) trên request path
+- after:  ConversationStore.append_records (một pipeline Redis cho cả turn, MySQL fan-out ở background)
+
+MySQL không nằm trong phép đo (ở path mới MySQL ghi bất đồng bộ, không tính vào latency của turn).
+
+Usage:
+    python benchmarks/bench_conversation_store.py --turns 50 --sessions 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import redis.asyncio as aioredis
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from server.conversation_store import ConversationStore, HISTORY_TTL_SECONDS, make_record
+from _common import percentile
+
+USER_MESSAGE = "Mình muốn tìm kính mát Rayban gọng tròn, giá dưới 3 triệu"
+AI_MESSAGE = "Dưới đây là một số mẫu kính Rayban gọng tròn phù hợp với bạn: ... " * 4
+
+async def legacy_blob_append(redis_client: aioredis.Redis, key: str, message: dict, wrap: bool):
+    data = await redis_client.get(key)
+    if wrap:
+        history = json.loads(data) if data else {"messages": [], "created_at": datetime.now().isoformat()}
+        history["messages"].append(message)
+        history["last_updated"] = datetime.now().isoformat()
+    else:
+        history = json.loads(data) if data else []
+        history.append(message)
+    await redis_client.set(key, json.dumps(history, ensure_ascii=False), ex=HISTORY_TTL_SECONDS)
+
+async def run_before(redis_client: aioredis.Redis, prefix: str, session: int, turns: int):
+    langchain_key = f"{prefix}:before:langchain:{session}"
+    chat_key = f"{prefix}:before:chat:{session}"
+    latencies = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        await legacy_blob_append(redis_client, langchain_key, {"type": "human", "content": USER_MESSAGE}, wrap=False)
+        await legacy_blob_append(redis_client, langchain_key, {"type": "ai", "content": f"[Search Agent] {AI_MESSAGE}"}, wrap=False)
+        await legacy_blob_append(redis_client, chat_key, make_record("assistant", AI_MESSAGE, agent_used="Search Agent"), wrap=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, [langchain_key, chat_key]
+
+async def run_after(redis_client: aioredis.Redis, prefix: str, session: int, turns: int):
+    store = ConversationStore(redis_client=redis_client)
+    store.KEY_PREFIX = f"{prefix}:after"
+    store.META_PREFIX = f"{prefix}:after_meta"
+    session_id = str(session)
+    latencies = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        store.append_records(session_id, "bench", [
+            make_record("user", USER_MESSAGE, user_id="bench"),
+            make_record("assistant", AI_MESSAGE, agent_used="Search Agent")
+        ])
+        await store.flush(session_id, "bench")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, [store._get_key(session_id, "bench"), store._get_meta_key(session_id, "bench")]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn conversation write latency")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+
+    redis_client = aioredis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        password=os.getenv("REDIS_PASSWORD") or None,
+        db=int(os.getenv("REDIS_DB", "0")),
+        decode_responses=True
+    )
+    await redis_client.ping()
+    prefix = f"bench_conversation:{uuid4().hex[:8]}"
+
+    print(f"{'path':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'mean ms':>8}")
+    print("-" * 42)
+    for name, runner in (("before", run_before), ("after", run_after)):
+        all_latencies, keys = [], []
+        for session in range(args.sessions):
+            latencies, session_keys = await runner(redis_client, prefix, session, args.turns)
+            all_latencies.extend(latencies)
+            keys.extend(session_keys)
+        await redis_client.delete(*keys)
+        print(
+            f"{name:>7} | {statistics.median(all_latencies):>8.3f} | "
+            f"{percentile(all_latencies, 0.95):>8.3f} | {statistics.mean(all_latencies):>8.3f}"
+        )
+
+    await redis_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
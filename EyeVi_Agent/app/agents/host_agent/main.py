@@ -4,17 +4,20 @@ Orchestrator agent để điều phối message tới các agent khác
 """
 
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import asyncio
 import os
 import logging
 import base64
+import json
 from datetime import datetime
 
 # Import các modules local
 from server.host_server import HostServer
 from server.a2a_client_manager import FileInfo
+from server.blob_store import blob_uri, parse_blob_uri
 
 
 import dotenv
@@ -38,6 +41,7 @@ host_server = HostServer()
 class ChatResponse(BaseModel):
     response: str
     agent_used: Optional[str] = None
+    agents_used: Optional[List[str]] = None
     session_id: Optional[str] = None
     clarified_message: Optional[str] = None
     analysis: Optional[str] = None
@@ -47,6 +51,7 @@ class ChatResponse(BaseModel):
     status: str = "success"
     timestamp: str
     extracted_product_ids: Optional[List[str]] = None
+    file_refs: Optional[List[str]] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -92,16 +97,83 @@ async def health():
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
+async def _process_upload_files(files: Optional[List[UploadFile]], file_refs: Optional[str] = None) -> Optional[List[FileInfo]]:
+    """
+    Chuyển các file upload thành FileInfo
+
+    - Có blob store: lưu theo SHA-256 (file trùng không ghi lại), FileInfo chỉ mang blob reference
+    - Không có blob store: encode base64 inline như cũ
+    - file_refs: các digest (phân tách bởi dấu phẩy) của file đã upload trước đó, client không cần gửi lại nội dung
+    """
+    processed_files = []
+    blob_store = host_server.blob_store
+    
+    if file_refs and blob_store:
+        for digest in (ref.strip().lower() for ref in file_refs.split(",")):
+            if not digest:
+                continue
+            metadata = await blob_store.get_metadata(digest)
+            if metadata is None:
+                raise HTTPException(status_code=400, detail=f"File ref không tồn tại hoặc đã hết hạn, cần upload lại: {digest}")
+            processed_files.append(FileInfo(
+                name=metadata.get("name") or digest[:12],
+                mime_type=metadata.get("mime_type") or "application/octet-stream",
+                uri=blob_uri(digest),
+                size=metadata.get("size")
+            ))
+            logger.info(f"📎 Reused file ref: {digest[:12]} ({metadata.get('size')} bytes)")
+    
+    if files and any(file.filename for file in files):
+        for file in files:
+            if file.filename:  # Kiểm tra file có tồn tại
+                # Đọc file content
+                file_content = await file.read()
+                
+                # Xác định mime type
+                mime_type = file.content_type or "application/octet-stream"
+                
+                if blob_store:
+                    digest, created = await blob_store.put(file_content, mime_type, file.filename)
+                    processed_files.append(FileInfo(
+                        name=file.filename,
+                        mime_type=mime_type,
+                        uri=blob_uri(digest),
+                        size=len(file_content)
+                    ))
+                    logger.info(f"📎 Processed file: {file.filename} ({mime_type}, {len(file_content)} bytes, {'stored' if created else 'dedup'} {digest[:12]})")
+                else:
+                    # Encode thành base64
+                    file_base64 = base64.b64encode(file_content).decode('utf-8')
+                    processed_files.append(FileInfo(
+                        name=file.filename,
+                        mime_type=mime_type,
+                        data=file_base64,
+                        size=len(file_content)
+                    ))
+                    logger.info(f"📎 Processed file: {file.filename} ({mime_type}, {len(file_content)} bytes)")
+    return processed_files or None
+
+def _file_refs(processed_files: Optional[List[FileInfo]]) -> Optional[List[str]]:
+    """Digest của các file đã lưu trong blob store (client gửi lại qua file_refs thay vì upload lại)"""
+    refs = [parse_blob_uri(f.uri) for f in processed_files or [] if f.uri]
+    return refs or None
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format một Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     message: str = Form(...),
     user_id: Optional[str] = Form(None),
     session_id: Optional[str] = Form(None),
-    files: List[UploadFile] = File(None)
+    files: List[UploadFile] = File(None),
+    file_refs: Optional[str] = Form(None)
 ):
     """
     Main endpoint để nhận message từ user và điều phối tới agent phù hợp
     Có thể kèm theo files (ảnh, document) hoặc không
+    file_refs: digest của các file đã upload trước đó (trả về trong response), dùng thay cho việc upload lại
     """
     try:
         logger.info(f"📨 Nhận message từ user: {message[:100]}...")
@@ -113,27 +185,7 @@ async def chat(
             logger.info(f"🆔 Tạo session ID mới: {session_id}")
         
         # Xử lý files nếu có
-        processed_files = None
-        if files and any(file.filename for file in files):
-            processed_files = []
-            for file in files:
-                if file.filename:  # Kiểm tra file có tồn tại
-                    # Đọc file content
-                    file_content = await file.read()
-                    
-                    # Encode thành base64
-                    file_base64 = base64.b64encode(file_content).decode('utf-8')
-                    
-                    # Xác định mime type
-                    mime_type = file.content_type or "application/octet-stream"
-                    
-                    processed_files.append(FileInfo(
-                        name=file.filename,
-                        mime_type=mime_type,
-                        data=file_base64
-                    ))
-                    
-                    logger.info(f"📎 Processed file: {file.filename} ({mime_type}, {len(file_content)} bytes)")
+        processed_files = await _process_upload_files(files, file_refs)
         
         # Xử lý message thông qua host server
         if processed_files:
@@ -157,6 +209,7 @@ async def chat(
         return ChatResponse(
             response=result["response"],
             agent_used=result.get("agent_used"),
+            agents_used=result.get("agents_used"),
             session_id=result.get("session_id"),
             clarified_message=result.get("clarified_message"),
             analysis=result.get("analysis"),
@@ -165,9 +218,12 @@ async def chat(
             orders=result.get("orders"),
             status="success",
             timestamp=datetime.now().isoformat(),
-            extracted_product_ids=result.get("extracted_product_ids")
+            extracted_product_ids=result.get("extracted_product_ids"),
+            file_refs=_file_refs(processed_files)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Lỗi khi xử lý message: {e}")
         raise HTTPException(
@@ -176,6 +232,62 @@ async def chat(
         )
 
 
+@app.post("/chat/stream")
+async def chat_stream(
+    message: str = Form(...),
+    user_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    files: List[UploadFile] = File(None),
+    file_refs: Optional[str] = Form(None)
+):
+    """
+    Streaming version của /chat (Server-Sent Events)
+    Gửi lần lượt các event: decision -> agent_text (0..n) -> final (hoặc error)
+    """
+    logger.info(f"📨 Nhận streaming message từ user: {message[:100]}...")
+    
+    # Tự động tạo session ID nếu không có
+    if not session_id:
+        from uuid import uuid4
+        session_id = str(uuid4())
+        logger.info(f"🆔 Tạo session ID mới: {session_id}")
+    
+    # Đọc files trước khi stream (UploadFile bị đóng sau khi handler return)
+    processed_files = await _process_upload_files(files, file_refs)
+    
+    async def event_generator():
+        if processed_files:
+            events = host_server.process_message_with_files_stream(
+                message=message,
+                user_id=user_id,
+                session_id=session_id,
+                files=processed_files
+            )
+        else:
+            events = host_server.process_message_stream(
+                message=message,
+                user_id=user_id,
+                session_id=session_id
+            )
+        
+        async for event in events:
+            event_type = event.pop("event")
+            event["timestamp"] = datetime.now().isoformat()
+            if event_type == "final":
+                event["status"] = "success"
+                event["file_refs"] = _file_refs(processed_files)
+                logger.info(f"✅ Streaming xử lý thành công, agent được sử dụng: {event.get('agent_used', 'None')}")
+            elif event_type == "error":
+                event["status"] = "error"
+            yield _format_sse(event_type, event)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 
 @app.get("/agents/status")
 async def get_agents_status():
@@ -193,6 +305,15 @@ async def get_agents_status():
 
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Thống kê performance của host (fast-path router, ...)"""
+    return {
+        "status": "success",
+        "metrics": host_server.get_metrics(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/sessions/{session_id}/history")
 async def get_chat_history(session_id: str, user_id: Optional[str] = None):
     """Lấy lịch sử chat cho session"""
@@ -303,36 +424,21 @@ async def list_active_sessions():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/users/{user_id}/sessions")
-async def get_user_sessions(user_id: str):
-    """Lấy danh sách tất cả sessions của user"""
+async def get_user_sessions(user_id: str, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Lấy danh sách sessions của user (mới hoạt động nhất trước), phân trang bằng cursor
+    
+    Truyền next_cursor của response vào `cursor` để lấy trang tiếp theo (null khi đã hết)
+    """
     try:
-        sessions = await host_server.get_user_sessions(user_id)
-        
-        # Lấy thông tin chi tiết cho từng session
-        sessions_info = []
-        for session_id in sessions:
-            try:
-                chat_history = await host_server.get_chat_history(user_id, session_id)
-                if chat_history:
-                    sessions_info.append({
-                        "session_id": session_id,
-                        "created_at": chat_history.created_at.isoformat(),
-                        "last_updated": chat_history.last_updated.isoformat(),
-                        "message_count": len(chat_history.messages),
-                        "last_message_preview": chat_history.messages[-1]["content"][:100] + "..." if chat_history.messages else ""
-                    })
-            except Exception as e:
-                logger.warning(f"Cannot get details for session {session_id}: {e}")
-                sessions_info.append({
-                    "session_id": session_id,
-                    "error": "Cannot retrieve details"
-                })
+        page = await host_server.list_user_sessions(user_id, limit=max(1, min(limit, 100)), cursor=cursor)
         
         return {
             "status": "success",
             "user_id": user_id,
-            "total_sessions": len(sessions_info),
-            "sessions": sessions_info,
+            "total_sessions": page["total_sessions"],
+            "sessions": page["sessions"],
+            "next_cursor": page["next_cursor"],
             "timestamp": datetime.now().isoformat()
         }
         
@@ -4,29 +4,70 @@ A2A Client Manager - Quản lý các A2A clients cho các agent khác nhau
 
 import asyncio
 import logging
-import httpx
 import os
 import json
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator, Set
+from contextlib import aclosing
 from datetime import datetime
 from uuid import uuid4
 
 import redis.asyncio as aioredis
 from a2a.client import A2AClient, A2ACardResolver
-from a2a.types import SendMessageRequest, SendStreamingMessageRequest, MessageSendParams
+from a2a.types import SendMessageRequest, SendStreamingMessageRequest, MessageSendParams, CancelTaskRequest, TaskIdParams
 from .redis_optimizations import OptimizedRedisClient, RedisHealthMonitor
+from .conversation_store import ConversationStore
+from .http_transport import AgentTransportPool, AgentTransportConfig
+from .circuit_breaker import CircuitBreaker, DegradedResponseCache
+from .health_prober import AgentHealthProber
+from .session_sweeper import SessionSweeper
+from .agent_card_cache import AgentCardCache
 
 from dotenv import load_dotenv
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+CHAT_HISTORY_TTL_SECONDS = 86400 * 7  # Expire sau 7 ngày
+CHAT_HISTORY_MAX_STORED = int(os.getenv("CHAT_HISTORY_MAX_STORED", "1000"))
+
+async def migrate_chat_history_key(redis_client: aioredis.Redis, redis_key: str) -> bool:
+    """
+    Migrate key chat_history:{user}:{session} từ JSON string (ChatHistory.to_dict) sang LIST + meta hash
+    Trả về True nếu key đã được migrate
+    """
+    if await redis_client.type(redis_key) != "string":
+        return False
+    
+    data = await redis_client.get(redis_key)
+    chat_data = json.loads(data) if data else {}
+    messages = chat_data.get("messages", [])
+    ttl = await redis_client.ttl(redis_key)
+    meta_key = redis_key.replace("chat_history:", "chat_history_meta:", 1)
+    ex = ttl if ttl and ttl > 0 else CHAT_HISTORY_TTL_SECONDS
+    
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(redis_key)
+    if messages:
+        pipe.rpush(redis_key, *[json.dumps(m, ensure_ascii=False) for m in messages[-CHAT_HISTORY_MAX_STORED:]])
+        pipe.expire(redis_key, ex)
+    pipe.hset(meta_key, mapping={
+        "created_at": chat_data.get("created_at", datetime.now().isoformat()),
+        "last_updated": chat_data.get("last_updated", datetime.now().isoformat())
+    })
+    pipe.expire(meta_key, ex)
+    await pipe.execute()
+    logger.info(f"🔁 Migrated {redis_key} từ JSON string sang Redis list ({len(messages)} messages)")
+    return True
+
 class FileInfo:
     """Class để represent file information"""
-    def __init__(self, name: str, mime_type: str, data: str):
+    def __init__(self, name: str, mime_type: str, data: Optional[str] = None, uri: Optional[str] = None, size: Optional[int] = None):
         self.name = name
         self.mime_type = mime_type
-        self.data = data  # base64 encoded
+        self.data = data  # base64 encoded (khi không dùng blob store)
+        self.uri = uri  # blob://sha256/<digest> trong blob store dùng chung
+        self.size = size
 
 class ChatHistory:
     """Quản lý lịch sử chat cho mỗi session"""
@@ -36,8 +77,9 @@ class ChatHistory:
         self.created_at = datetime.now()
         self.last_updated = datetime.now()
     
-    def add_message(self, role: str, content: str, clarified_content: str, agent_used: Optional[str] = None, user_id: Optional[str] = None):
-        """Thêm message vào lịch sử"""
+    @staticmethod
+    def build_message(role: str, content: str, clarified_content: Optional[str] = None, agent_used: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Tạo message dict theo format của ChatHistory"""
         message = {
             "role": role,
             "content": content,
@@ -48,9 +90,14 @@ class ChatHistory:
             message["agent_used"] = agent_used
         if user_id:
             message["user_id"] = user_id
-
+        return message
+    
+    def add_message(self, role: str, content: str, clarified_content: Optional[str] = None, agent_used: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Thêm message vào lịch sử"""
+        message = self.build_message(role, content, clarified_content, agent_used, user_id)
         self.messages.append(message)
         self.last_updated = datetime.now()
+        return message
     
     def get_recent_messages(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Lấy các message gần đây"""
@@ -89,26 +136,52 @@ class ChatHistory:
 class A2AAgentClient:
     """Wrapper class cho một A2A client cụ thể"""
     
-    def __init__(self, agent_name: str, base_url: str):
+    def __init__(
+        self,
+        agent_name: str,
+        base_url: str,
+        transport: Optional[AgentTransportPool] = None,
+        card_cache: Optional[AgentCardCache] = None
+    ):
         self.agent_name = agent_name
         self.base_url = base_url
+        # Transport dùng chung (connection pool, timeouts, deadlines); tự tạo nếu dùng độc lập
+        self._owns_transport = transport is None
+        self.transport = transport or AgentTransportPool()
+        self.card_cache = card_cache
         self.httpx_client = None
         self.a2a_client = None
         self.agent_card = None
+        # "network" | "cache": nguồn của agent card hiện tại
+        self.card_source: Optional[str] = None
         self.is_initialized = False
         self.last_health_check = None
         self.is_healthy = False
+        # Gộp các lần initialize đồng thời (bootstrap, prober, request đầu tiên) thành một lần resolve
+        self._init_lock = asyncio.Lock()
 
     async def initialize(self):
-        """Khởi tạo A2A client"""
+        """
+        Khởi tạo A2A client (idempotent, an toàn khi gọi đồng thời)
+
+        Resolve agent card qua mạng; nếu agent chưa lên thì dùng card đã cache trên disk
+        (client được dựng nhưng is_healthy=False cho tới khi health check/prober xác nhận)
+        """
         if self.is_initialized:
             return True
-            
+        
+        async with self._init_lock:
+            # Một coroutine khác đã khởi tạo xong trong lúc chờ lock
+            if self.is_initialized:
+                return True
+            return await self._initialize()
+
+    async def _initialize(self) -> bool:
         try:
             logger.info(f"🔄 Khởi tạo A2A client cho {self.agent_name} tại {self.base_url}")
             
-            # Tạo httpx client
-            self.httpx_client = httpx.AsyncClient(timeout=30.0)
+            # Lấy httpx client từ transport pool dùng chung
+            self.httpx_client = self.transport.get_client(self.agent_name)
             
             # Khởi tạo A2ACardResolver để fetch agent card
             resolver = A2ACardResolver(
@@ -118,27 +191,119 @@ class A2AAgentClient:
             
             # Fetch agent card
             self.agent_card = await resolver.get_agent_card()
-            
-            # Khởi tạo A2A client với agent card
-            self.a2a_client = A2AClient(
-                httpx_client=self.httpx_client,
-                agent_card=self.agent_card
-            )
-            
-            self.is_initialized = True
+            self.card_source = "network"
+            if self.card_cache:
+                self.card_cache.save(self.agent_name, self.base_url, self.agent_card)
             self.is_healthy = True
-            self.last_health_check = datetime.now()
-            
-            logger.info(f"✅ {self.agent_name} A2A client khởi tạo thành công")
-            logger.info(f"   - Name: {self.agent_card.name}")
-            logger.info(f"   - Description: {self.agent_card.description}")
-            
-            return True
             
         except Exception as e:
-            logger.error(f"❌ Lỗi khởi tạo A2A client cho {self.agent_name}: {e}")
+            cached_card = self.card_cache.load(self.agent_name, self.base_url) if self.card_cache else None
+            if cached_card is None:
+                logger.error(f"❌ Lỗi khởi tạo A2A client cho {self.agent_name}: {e}")
+                self.is_healthy = False
+                return False
+            
+            logger.warning(f"⚠️ Không resolve được agent card của {self.agent_name} ({e}), dùng card đã cache")
+            self.agent_card = cached_card
+            self.card_source = "cache"
             self.is_healthy = False
-            return False
+        
+        # Khởi tạo A2A client với agent card
+        self.a2a_client = A2AClient(
+            httpx_client=self.httpx_client,
+            agent_card=self.agent_card
+        )
+        
+        self.is_initialized = True
+        self.last_health_check = datetime.now()
+        
+        logger.info(f"✅ {self.agent_name} A2A client khởi tạo thành công (card: {self.card_source})")
+        logger.info(f"   - Name: {self.agent_card.name}")
+        logger.info(f"   - Description: {self.agent_card.description}")
+        
+        return True
+
+    def _build_send_payload(self, message: str, context: Optional[str] = None, files: Optional[List[Any]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Chuẩn bị message payload theo A2A format (dùng chung cho send_message và send_message_streaming)"""
+        # Chuẩn bị message với context nếu có
+        full_message = message
+        if context:
+            full_message = f"Context từ cuộc hội thoại trước:\n{context}\n\nCâu hỏi hiện tại:\n{message}"
+        
+        # Chỉ thêm thông tin user_id vào message khi gọi tới Order Agent
+        if user_id and self.agent_name == "Order Agent":
+            full_message = f"User ID: {user_id}\n\n{full_message}"
+        
+        # Chuẩn bị parts cho message
+        parts = []
+        
+        # Thêm phần text
+        if full_message:
+            parts.append({
+                'kind': 'text', 
+                'text': full_message
+            })
+        
+        # Thêm files nếu có
+        if files:
+            for file_info in files:
+                file_payload = {
+                    'name': file_info.name,
+                    'mimeType': file_info.mime_type,
+                }
+                if file_info.uri:
+                    # Agent đọc nội dung từ blob store, payload chỉ chứa reference
+                    file_payload['uri'] = file_info.uri
+                else:
+                    file_payload['bytes'] = file_info.data  # base64 encoded
+                parts.append({
+                    'kind': 'file',
+                    'file': file_payload
+                })
+                logger.info(f"📎 Thêm file vào message: {file_info.name} ({file_info.mime_type})")
+        
+        # Chuẩn bị message payload theo A2A format
+        send_message_payload: Dict[str, Any] = {
+            'message': {
+                'role': 'user',
+                'parts': parts,
+                'messageId': uuid4().hex,
+            },
+        }
+        
+        # Chỉ thêm user_id vào metadata khi gọi tới Order Agent
+        if user_id and self.agent_name == "Order Agent":
+            send_message_payload['message']['metadata'] = {'user_id': user_id}
+        
+        if files:
+            logger.info(f"📤 Gửi message với {len(files)} files tới {self.agent_name}: {message[:100]}...")
+        else:
+            if user_id and self.agent_name == "Order Agent":
+                logger.info(f"📤 Gửi message tới {self.agent_name} với User ID {user_id}: {message[:100]}...")
+            else:
+                logger.info(f"📤 Gửi message tới {self.agent_name} qua A2A: {message[:100]}...")
+        
+        return send_message_payload
+
+    @staticmethod
+    def _extract_content_from_parts(parts: List[Dict[str, Any]], content: Dict[str, Any], append: bool = False):
+        """Extract text/data từ A2A parts vào content dict"""
+        for part in parts:
+            if part.get('kind') == 'text':
+                if append and content.get("text"):
+                    content["text"] += part.get('text', '')
+                else:
+                    content["text"] = part.get('text', '')
+            elif part.get('kind') == 'data':
+                content["data"] = part.get('data', {}).get("products", [])
+                content["orders"] = part.get('data', {}).get("orders", [])
+                content["user_info"] = part.get('data', {}).get("user_info", {})
+
+    @property
+    def supports_streaming(self) -> bool:
+        """Agent có hỗ trợ A2A streaming hay không (theo agent card)"""
+        capabilities = getattr(self.agent_card, "capabilities", None) if self.agent_card else None
+        return bool(capabilities and getattr(capabilities, "streaming", False))
 
     async def send_message(self, message: str, context: Optional[str] = None, files: Optional[List[Any]] = None, user_id: Optional[str] = None) -> str:
         """Gửi message tới agent qua A2A, có thể kèm files"""
@@ -148,58 +313,7 @@ class A2AAgentClient:
                 raise Exception(f"Không thể khởi tạo A2A client cho {self.agent_name}")
         
         try:
-            # Chuẩn bị message với context nếu có
-            full_message = message
-            if context:
-                full_message = f"Context từ cuộc hội thoại trước:\n{context}\n\nCâu hỏi hiện tại:\n{message}"
-            
-            # Chỉ thêm thông tin user_id vào message khi gọi tới Order Agent
-            if user_id and self.agent_name == "Order Agent":
-                full_message = f"User ID: {user_id}\n\n{full_message}"
-            
-            # Chuẩn bị parts cho message
-            parts = []
-            
-            # Thêm phần text
-            if full_message:
-                parts.append({
-                    'kind': 'text', 
-                    'text': full_message
-                })
-            
-            # Thêm files nếu có
-            if files:
-                for file_info in files:
-                    parts.append({
-                        'kind': 'file',
-                        'file': {
-                            'name': file_info.name,
-                            'mimeType': file_info.mime_type,
-                            'bytes': file_info.data  # base64 encoded
-                        }
-                    })
-                    logger.info(f"📎 Thêm file vào message: {file_info.name} ({file_info.mime_type})")
-            
-            # Chuẩn bị message payload theo A2A format
-            send_message_payload: Dict[str, Any] = {
-                'message': {
-                    'role': 'user',
-                    'parts': parts,
-                    'messageId': uuid4().hex,
-                },
-            }
-            
-            # Chỉ thêm user_id vào metadata khi gọi tới Order Agent
-            if user_id and self.agent_name == "Order Agent":
-                send_message_payload['message']['metadata'] = {'user_id': user_id}
-            
-            if files:
-                logger.info(f"📤 Gửi message với {len(files)} files tới {self.agent_name}: {message[:100]}...")
-            else:
-                if user_id and self.agent_name == "Order Agent":
-                    logger.info(f"📤 Gửi message tới {self.agent_name} với User ID {user_id}: {message[:100]}...")
-                else:
-                    logger.info(f"📤 Gửi message tới {self.agent_name} qua A2A: {message[:100]}...")
+            send_message_payload = self._build_send_payload(message, context, files, user_id)
             
             # Tạo request
             request = SendMessageRequest(
@@ -207,11 +321,12 @@ class A2AAgentClient:
                 params=MessageSendParams(**send_message_payload)
             )
             
-            # Gửi message
-            response = await self.a2a_client.send_message(
-                request=request, 
-                http_kwargs={"timeout": None}
-            )
+            # Gửi message (timeout per-request + deadline tổng của agent)
+            async with self.transport.request(self.agent_name):
+                response = await self.a2a_client.send_message(
+                    request=request, 
+                    http_kwargs={"timeout": self.transport.timeout_for(self.agent_name)}
+                )
             
             # Parse response
             response_data = response.model_dump(mode='json', exclude_none=True)
@@ -219,14 +334,7 @@ class A2AAgentClient:
             # Extract content từ response
             content = {}
             if 'result' in response_data:
-                result = response_data['result']["artifacts"][0]["parts"]
-                for part in result:
-                    if part.get('kind') == 'text':
-                        content["text"] = part.get('text', '')
-                    elif part.get('kind') == 'data':
-                        content["data"] = part.get('data', {}).get("products", [])
-                        content["orders"] = part.get('data', {}).get("orders", [])
-                        content["user_info"] = part.get('data', {}).get("user_info", {})
+                self._extract_content_from_parts(response_data['result']["artifacts"][0]["parts"], content)
             
             if not content:
                 content["text"] = "Không có response từ agent"
@@ -240,6 +348,117 @@ class A2AAgentClient:
             self.is_healthy = False
             raise Exception(error_msg)
 
+    async def send_message_streaming(self, message: str, context: Optional[str] = None, files: Optional[List[Any]] = None, user_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gửi message tới agent qua A2A streaming (SendStreamingMessageRequest)
+        
+        Yield các event:
+            {"type": "status", "state": ...}   - trạng thái task từ agent
+            {"type": "text", "text": ...}      - text từng phần từ agent
+            {"type": "final", "content": ...}  - content cuối cùng (cùng format với send_message)
+        
+        Nếu agent không hỗ trợ streaming thì fallback về send_message và chỉ yield event final.
+        """
+        if not self.is_initialized:
+            success = await self.initialize()
+            if not success:
+                raise Exception(f"Không thể khởi tạo A2A client cho {self.agent_name}")
+        
+        if not self.supports_streaming:
+            content = await self.send_message(message, context, files, user_id)
+            yield {"type": "final", "content": content}
+            return
+        
+        try:
+            send_message_payload = self._build_send_payload(message, context, files, user_id)
+            
+            request = SendStreamingMessageRequest(
+                id=str(uuid4()),
+                params=MessageSendParams(**send_message_payload)
+            )
+            
+            content: Dict[str, Any] = {}
+            seen_artifacts = set()
+            # Read timeout áp dụng giữa các chunk, deadline tổng kiểm tra sau mỗi event
+            deadline_at = time.monotonic() + self.transport.deadline_for(self.agent_name)
+            
+            async with self.transport.track(self.agent_name):
+                async for response in self.a2a_client.send_message_streaming(
+                    request=request,
+                    http_kwargs={"timeout": self.transport.timeout_for(self.agent_name)}
+                ):
+                    if time.monotonic() > deadline_at:
+                        raise TimeoutError(f"Vượt quá deadline {self.transport.deadline_for(self.agent_name)}s")
+                    
+                    response_data = response.model_dump(mode='json', exclude_none=True)
+                    
+                    if 'error' in response_data:
+                        raise Exception(response_data['error'].get('message', 'Unknown A2A error'))
+                    
+                    result = response_data.get('result', {})
+                    kind = result.get('kind')
+                    
+                    if kind == 'status-update':
+                        status = result.get('status', {})
+                        yield {"type": "status", "state": status.get('state'), "task_id": result.get('taskId')}
+                        parts = (status.get('message') or {}).get('parts', [])
+                        append = False
+                    elif kind == 'artifact-update':
+                        artifact = result.get('artifact', {})
+                        seen_artifacts.add(artifact.get('artifactId'))
+                        parts = artifact.get('parts', [])
+                        append = bool(result.get('append'))
+                    elif kind == 'task':
+                        yield {"type": "status", "state": result.get('status', {}).get('state'), "task_id": result.get('id')}
+                        # Task snapshot có thể chứa lại các artifact đã stream trước đó
+                        parts = []
+                        for artifact in result.get('artifacts', []):
+                            if artifact.get('artifactId') not in seen_artifacts:
+                                seen_artifacts.add(artifact.get('artifactId'))
+                                parts.extend(artifact.get('parts', []))
+                        append = False
+                    elif kind == 'message':
+                        parts = result.get('parts', [])
+                        append = False
+                    else:
+                        continue
+                    
+                    for part in parts:
+                        if part.get('kind') == 'text' and part.get('text'):
+                            yield {"type": "text", "text": part['text']}
+                    
+                    self._extract_content_from_parts(parts, content, append=append)
+            
+            if not content:
+                content["text"] = "Không có response từ agent"
+            
+            logger.info(f"📥 Nhận streaming response từ {self.agent_name}: {content.get('text', '')[:100]}...")
+            yield {"type": "final", "content": content}
+            
+        except Exception as e:
+            error_msg = f"Lỗi khi gửi streaming message tới {self.agent_name}: {str(e)}"
+            logger.error(error_msg)
+            self.is_healthy = False
+            raise Exception(error_msg)
+
+    async def cancel_task(self, task_id: str) -> bool:
+        """Yêu cầu agent hủy task A2A đang chạy (best-effort, agent có thể không hỗ trợ cancel)"""
+        if not self.a2a_client:
+            return False
+        try:
+            response = await self.a2a_client.cancel_task(
+                request=CancelTaskRequest(id=str(uuid4()), params=TaskIdParams(id=task_id)),
+                http_kwargs={"timeout": self.transport.get_config(self.agent_name).connect_timeout}
+            )
+            response_data = response.model_dump(mode='json', exclude_none=True)
+            if 'error' in response_data:
+                logger.debug(f"{self.agent_name} không hủy được task {task_id}: {response_data['error'].get('message')}")
+                return False
+            return True
+        except Exception as e:
+            logger.debug(f"Lỗi khi hủy task {task_id} của {self.agent_name}: {e}")
+            return False
+
     async def health_check(self) -> bool:
         """Kiểm tra health của agent"""
         try:
@@ -263,10 +482,10 @@ class A2AAgentClient:
             return False
 
     async def close(self):
-        """Đóng connections"""
+        """Đóng connections (client thuộc transport dùng chung được đóng bởi A2AClientManager)"""
         try:
-            if self.httpx_client:
-                await self.httpx_client.aclose()
+            if self._owns_transport:
+                await self.transport.aclose()
             logger.info(f"✅ Đã đóng A2A client cho {self.agent_name}")
         except Exception as e:
             logger.error(f"❌ Lỗi khi đóng A2A client cho {self.agent_name}: {e}")
@@ -276,8 +495,36 @@ class A2AClientManager:
     
     def __init__(self):
         self.agents: Dict[str, A2AAgentClient] = {}
+        # Connection pool dùng chung cho tất cả agents
+        self.transport = AgentTransportPool()
+        
+        # Circuit breaker theo từng agent + cache response cho chế độ degraded
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.degraded_cache = DegradedResponseCache()
+        self.hedge_min_delay = float(os.getenv("HEDGE_MIN_DELAY", "2.0"))
+        self.resilience_stats = {"hedged_requests": 0, "hedge_wins": 0, "fast_failed": 0, "degraded_cache_hits": 0}
+        
+        # Fan-out nhiều agents cho một yêu cầu gộp: timeout riêng cho từng agent
+        self.fanout_timeout = float(os.getenv("FANOUT_AGENT_TIMEOUT", "45"))
+        self.fanout_stats = {"requests": 0, "agent_tasks": 0, "timeouts": 0, "errors": 0}
+        
+        # Background health prober (availability snapshot cho request path)
+        self.health_prober = AgentHealthProber(self)
+        
+        # Background cleanup chat_history:* đã expired (pipelined, giới hạn ops/sec, có checkpoint)
+        self.session_sweeper = SessionSweeper(self)
+        
+        # Bootstrap song song với deadline, agent cards cache trên disk
+        self.card_cache = AgentCardCache()
+        self.startup_deadline = float(os.getenv("AGENT_STARTUP_DEADLINE", "3"))
+        self._bootstrap_tasks: Set[asyncio.Task] = set()
+        self.bootstrap_stats: Dict[str, Any] = {}
         self.redis_client: Optional[aioredis.Redis] = None
         self.chat_histories: Dict[str, ChatHistory] = {}  # Fallback cho backward compatibility
+        # Khi được gán (bởi HostServer), history đọc/ghi qua ConversationStore thay vì chat_history:* riêng
+        self.conversation_store: Optional[ConversationStore] = None
+        # UserSessionIndex dùng chung (gán bởi HostServer), cập nhật khi ghi chat_history:*
+        self.session_index: Optional[Any] = None
         
         # Cấu hình Redis
         self.redis_config = {
@@ -291,15 +538,33 @@ class A2AClientManager:
         self.agents_config = {
             "Advisor Agent": {
                 "url": os.getenv("ADVISOR_AGENT_URL", "http://advisor_agent:10001"),
-                "enabled": True
+                "enabled": True,
+                # Request dạng đọc (idempotent) -> cho phép hedged retry và speculative dispatch
+                "hedge": True,
+                "speculative": True,
+                "transport": AgentTransportConfig(
+                    read_timeout=float(os.getenv("ADVISOR_AGENT_TIMEOUT", "60")),
+                    deadline=float(os.getenv("ADVISOR_AGENT_DEADLINE", "90"))
+                )
             },
             "Search Agent": {
                 "url": os.getenv("SEARCH_AGENT_URL", "http://search_agent:10002"),
-                "enabled": True
+                "enabled": True,
+                # Request dạng đọc (idempotent) -> cho phép hedged retry và speculative dispatch
+                "hedge": True,
+                "speculative": True,
+                "transport": AgentTransportConfig(
+                    read_timeout=float(os.getenv("SEARCH_AGENT_TIMEOUT", "90")),
+                    deadline=float(os.getenv("SEARCH_AGENT_DEADLINE", "120"))
+                )
             },
             "Order Agent": {
                 "url": os.getenv("ORDER_AGENT_URL", "http://order_agent:10000"),
-                "enabled": True
+                "enabled": True,
+                "transport": AgentTransportConfig(
+                    read_timeout=float(os.getenv("ORDER_AGENT_TIMEOUT", "30")),
+                    deadline=float(os.getenv("ORDER_AGENT_DEADLINE", "60"))
+                )
             }
         }
 
@@ -331,18 +596,75 @@ class A2AClientManager:
         
         for agent_name, config in self.agents_config.items():
             if config["enabled"]:
+                if config.get("transport"):
+                    self.transport.configure(agent_name, config["transport"])
+                self.breakers[agent_name] = CircuitBreaker(agent_name)
                 self.agents[agent_name] = A2AAgentClient(
                     agent_name=agent_name,
-                    base_url=config["url"]
+                    base_url=config["url"],
+                    transport=self.transport,
+                    card_cache=self.card_cache
                 )
-                
-                # Thử khởi tạo ngay (không chặn nếu agent không available)
-                try:
-                    await self.agents[agent_name].initialize()
-                except Exception as e:
-                    logger.warning(f"⚠️ Không thể khởi tạo {agent_name}: {e}")
+        
+        await self._bootstrap_agents()
         
         logger.info(f"✅ A2A Client Manager đã khởi tạo với {len(self.agents)} agents")
+        
+        if os.getenv("HEALTH_PROBE_ENABLED", "true").lower() == "true":
+            self.health_prober.start()
+        
+        if self.optimized_redis_client and os.getenv("SESSION_SWEEP_ENABLED", "true").lower() == "true":
+            self.session_sweeper.start()
+
+    async def _bootstrap_agents(self):
+        """
+        Resolve agent cards song song với deadline khởi động
+
+        Agent chưa xong sau deadline không chặn startup: task resolve tiếp tục chạy nền, request đầu tiên
+        tới agent đó sẽ chờ chính task này (qua init lock) hoặc resolve lại nếu nó thất bại
+        """
+        start = time.perf_counter()
+        tasks = {
+            asyncio.create_task(agent_client.initialize()): agent_name
+            for agent_name, agent_client in self.agents.items()
+        }
+        if not tasks:
+            return
+        
+        done, pending = await asyncio.wait(tasks.keys(), timeout=self.startup_deadline)
+        
+        for task in done:
+            agent_name = tasks[task]
+            try:
+                if not task.result():
+                    logger.warning(f"⚠️ Không thể khởi tạo {agent_name}, sẽ thử lại khi có request")
+            except Exception as e:
+                logger.warning(f"⚠️ Không thể khởi tạo {agent_name}: {e}")
+        
+        for task in pending:
+            logger.info(f"⏳ {tasks[task]} chưa sẵn sàng sau {self.startup_deadline}s, tiếp tục resolve ở background")
+            self._bootstrap_tasks.add(task)
+            task.add_done_callback(self._bootstrap_tasks.discard)
+        
+        self.bootstrap_stats = {
+            "duration_ms": (time.perf_counter() - start) * 1000,
+            "deadline": self.startup_deadline,
+            "ready_at_startup": sorted(tasks[task] for task in done if not task.exception() and task.result()),
+            "deferred": sorted(tasks[task] for task in pending)
+        }
+        logger.info(
+            f"🚀 Bootstrap agents trong {self.bootstrap_stats['duration_ms']:.0f}ms "
+            f"({len(self.bootstrap_stats['ready_at_startup'])}/{len(tasks)} sẵn sàng)"
+        )
+
+    def get_bootstrap_stats(self) -> Dict[str, Any]:
+        """Kết quả bootstrap, nguồn agent card hiện tại của từng agent và card cache"""
+        return {
+            **self.bootstrap_stats,
+            "in_progress": len(self._bootstrap_tasks),
+            "card_sources": {name: client.card_source for name, client in self.agents.items()},
+            "card_cache": self.card_cache.get_stats()
+        }
 
     async def send_message_to_agent(
         self, 
@@ -357,32 +679,248 @@ class A2AClientManager:
             raise ValueError(f"Agent '{agent_name}' không tồn tại")
         
         agent_client = self.agents[agent_name]
+        breaker = self.breakers.setdefault(agent_name, CircuitBreaker(agent_name))
         
-        # Lấy context từ chat history (sử dụng Redis nếu có user_id)
+        # Breaker mở -> fast-fail với response degraded, không gửi thêm traffic tới agent
+        if not breaker.allow_request():
+            return self._degraded_response(agent_name, message)
+        
+        start = time.monotonic()
+        try:
+            if self._should_hedge(agent_name, breaker, files):
+                response = await self._send_hedged(agent_client, breaker, message, files, user_id)
+            else:
+                # Gửi message với files và user_id
+                response = await agent_client.send_message(message, None, files, user_id)
+        except (Exception, asyncio.CancelledError):
+            # Cancel (ví dụ timeout của fan-out) cũng tính là lỗi, tránh giữ slot half_open của breaker
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        breaker.record_success(time.monotonic() - start)
         
-        # Gửi message với files và user_id
-        response = await agent_client.send_message(message, None, files, user_id)
+        self._cache_degraded(agent_name, message, response, files)
         
         # Lưu vào chat history
-        if session_id:
-            # Tạo message content bao gồm thông tin về files
-            message_content = message
-            if files:
-                file_names = [f.name for f in files]
-                message_content += f" [Đính kèm: {', '.join(file_names)}]"
-            
-            if user_id and self.redis_client:
-                # Sử dụng Redis
-                chat_history = await self._ensure_chat_history_with_redis(user_id, session_id)
-                chat_history.add_message("assistant", response.get("text", ""), agent_name)
-                await self._save_chat_history_to_redis(user_id, session_id, chat_history)
-            else:
-                # Fallback to in-memory
-                self._ensure_chat_history(session_id)
-                self.chat_histories[session_id].add_message("assistant", response.get("text", ""), agent_name)
+        await self._record_agent_response(agent_name, message, response, user_id, session_id, files)
         
         return response
 
+    async def send_message_to_agents(
+        self,
+        agent_tasks: List[Dict[str, str]],
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Gửi song song nhiều agent tasks ({"agent", "message"}), mỗi agent có timeout riêng
+        
+        Returns:
+            Kết quả theo đúng thứ tự agent_tasks: {"agent", "response", "latency"} hoặc {"agent", "error", "latency"}
+            (agent chậm/lỗi không làm hỏng kết quả của các agents còn lại)
+        """
+        timeout = timeout if timeout is not None else self.fanout_timeout
+        self.fanout_stats["requests"] += 1
+        self.fanout_stats["agent_tasks"] += len(agent_tasks)
+        
+        async def _run(task: Dict[str, str]) -> Dict[str, Any]:
+            start = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.send_message_to_agent(task["agent"], task["message"], user_id, session_id),
+                    timeout=timeout
+                )
+                return {"agent": task["agent"], "response": response, "latency": time.monotonic() - start}
+            except asyncio.TimeoutError:
+                self.fanout_stats["timeouts"] += 1
+                logger.warning(f"⏱️ {task['agent']} không phản hồi trong {timeout}s, bỏ qua trong kết quả gộp")
+                return {"agent": task["agent"], "error": "timeout", "latency": time.monotonic() - start}
+            except Exception as e:
+                self.fanout_stats["errors"] += 1
+                logger.error(f"❌ Lỗi khi gửi message tới {task['agent']} trong fan-out: {e}")
+                return {"agent": task["agent"], "error": str(e), "latency": time.monotonic() - start}
+        
+        return list(await asyncio.gather(*(_run(task) for task in agent_tasks)))
+
+    def can_speculate(self, agent_name: str) -> bool:
+        """Agent có thể nhận speculative request: request dạng đọc (không side-effect) và breaker đang closed"""
+        if agent_name not in self.agents or not self.agents_config.get(agent_name, {}).get("speculative"):
+            return False
+        breaker = self.breakers.get(agent_name)
+        return breaker is None or breaker.state == CircuitBreaker.CLOSED
+
+    async def run_speculative(self, agent_name: str, message: str, user_id: Optional[str] = None, on_task_id: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Gửi speculative request tới agent (trước khi orchestrator quyết định)
+        
+        - Dùng streaming khi agent hỗ trợ để biết task id sớm (on_task_id), phục vụ hủy task qua A2A
+        - Kết quả tính vào circuit breaker, nhưng bị cancel thì không (cancel là do orchestrator không đồng ý)
+        - Chat history chỉ được ghi khi kết quả được dùng (record_speculative_response)
+        """
+        agent_client = self.agents[agent_name]
+        breaker = self.breakers.setdefault(agent_name, CircuitBreaker(agent_name))
+        start = time.monotonic()
+        try:
+            if agent_client.supports_streaming:
+                response = None
+                # aclosing: khi bị cancel, đóng stream HTTP ngay thay vì chờ GC
+                async with aclosing(agent_client.send_message_streaming(message, None, None, user_id)) as events:
+                    async for event in events:
+                        if event["type"] == "status" and event.get("task_id") and on_task_id:
+                            on_task_id(event["task_id"])
+                        elif event["type"] == "final":
+                            response = event["content"]
+            else:
+                response = await agent_client.send_message(message, None, None, user_id)
+        except Exception:
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return response
+
+    async def record_speculative_response(
+        self,
+        agent_name: str,
+        message: str,
+        response: Dict[str, Any],
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None
+    ):
+        """Ghi nhận speculative response đã được orchestrator xác nhận (giống send_message_to_agent)"""
+        self._cache_degraded(agent_name, message, response, None)
+        await self._record_agent_response(agent_name, message, response, user_id, session_id, None)
+
+    def _should_hedge(self, agent_name: str, breaker: CircuitBreaker, files: Optional[List[Any]]) -> bool:
+        """Chỉ hedge request dạng đọc, không kèm files (tránh gửi lại payload lớn) và khi breaker đang closed"""
+        return bool(self.agents_config.get(agent_name, {}).get("hedge")) and not files and breaker.state == CircuitBreaker.CLOSED
+
+    async def _send_hedged(
+        self,
+        agent_client: A2AAgentClient,
+        breaker: CircuitBreaker,
+        message: str,
+        files: Optional[List[Any]],
+        user_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Hedged request: nếu request đầu chưa xong sau p95 latency, gửi thêm một request giống hệt
+        và lấy kết quả thành công đầu tiên (request còn lại bị cancel)
+        """
+        hedge_delay = max(breaker.latency_quantile(0.95) or self.hedge_min_delay, self.hedge_min_delay)
+        primary = asyncio.create_task(agent_client.send_message(message, None, files, user_id))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+        
+        self.resilience_stats["hedged_requests"] += 1
+        logger.info(f"🪃 Hedged request tới {agent_client.agent_name} sau {hedge_delay:.2f}s")
+        hedge = asyncio.create_task(agent_client.send_message(message, None, files, user_id))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.resilience_stats["hedge_wins"] += 1
+                        return task.result()
+            # Cả hai đều lỗi
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _is_read_only(self, agent_name: str) -> bool:
+        """Agent chỉ đọc (không side-effect, response không phụ thuộc dữ liệu riêng của user)"""
+        return bool(self.agents_config.get(agent_name, {}).get("speculative"))
+
+    def _cache_degraded(self, agent_name: str, message: str, response: Dict[str, Any], files: Optional[List[Any]]):
+        """
+        Lưu response vào degraded cache - chỉ với agent chỉ đọc và request không kèm files.
+        Key không có user_id nên không được cache response chứa dữ liệu riêng (ví dụ Order Agent: đơn hàng, user_info).
+        """
+        if not files and self._is_read_only(agent_name):
+            self.degraded_cache.put(agent_name, message, response)
+
+    def _degraded_response(self, agent_name: str, message: str) -> Dict[str, Any]:
+        """Response khi breaker mở: response đã cache cho cùng message nếu có, ngược lại là thông báo quá tải"""
+        self.resilience_stats["fast_failed"] += 1
+        cached = self.degraded_cache.get(agent_name, message) if self._is_read_only(agent_name) else None
+        if cached is not None:
+            self.resilience_stats["degraded_cache_hits"] += 1
+            cached["degraded"] = True
+            return cached
+        # Không nhắc tên agent trong response tới user; đủ key như response bình thường của agent
+        return {
+            "text": "Xin lỗi, hệ thống đang quá tải hoặc gián đoạn. Bạn vui lòng thử lại sau ít phút nhé.",
+            "data": [],
+            "user_info": {},
+            "orders": [],
+            "degraded": True
+        }
+
+    async def send_message_to_agent_streaming(
+        self, 
+        agent_name: str, 
+        message: str,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        files: Optional[List[Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Gửi message tới agent qua A2A streaming, yield các event từ A2AAgentClient.send_message_streaming"""
+        if agent_name not in self.agents:
+            raise ValueError(f"Agent '{agent_name}' không tồn tại")
+        
+        agent_client = self.agents[agent_name]
+        breaker = self.breakers.setdefault(agent_name, CircuitBreaker(agent_name))
+        
+        if not breaker.allow_request():
+            yield {"type": "final", "content": self._degraded_response(agent_name, message)}
+            return
+        
+        start = time.monotonic()
+        recorded = False
+        try:
+            async for event in agent_client.send_message_streaming(message, None, files, user_id):
+                if event["type"] == "final" and not recorded:
+                    breaker.record_success(time.monotonic() - start)
+                    recorded = True
+                    self._cache_degraded(agent_name, message, event["content"], files)
+                    await self._record_agent_response(agent_name, message, event["content"], user_id, session_id, files)
+                yield event
+        finally:
+            # Lỗi, cancel, client ngắt kết nối (GeneratorExit) hoặc stream kết thúc không có final
+            # đều tính là lỗi, tránh giữ slot half_open của breaker
+            if not recorded:
+                breaker.record_failure(time.monotonic() - start)
+
+    async def _record_agent_response(
+        self,
+        agent_name: str,
+        message: str,
+        response: Dict[str, Any],
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        files: Optional[List[Any]] = None
+    ):
+        """Lưu response của agent vào chat history"""
+        # Với ConversationStore, HostServer ghi cả turn (user + response) trong một lần -> không ghi lặp ở đây
+        if session_id and not self.conversation_store:
+            chat_message = ChatHistory.build_message("assistant", response.get("text", ""), agent_used=agent_name)
+            await self.append_chat_message(user_id, session_id, chat_message)
+
+    async def append_chat_message(self, user_id: Optional[str], session_id: str, message: Dict[str, Any]):
+        """Append một message vào chat history (ConversationStore, Redis list nếu có user_id, fallback in-memory)"""
+        if self.conversation_store:
+            self.conversation_store.append_records(session_id, user_id, [message])
+        elif user_id and self.redis_client:
+            await self._append_chat_message_to_redis(user_id, session_id, message)
+        else:
+            self._ensure_chat_history(session_id)
+            chat_history = self.chat_histories[session_id]
+            chat_history.messages.append(message)
+            chat_history.last_updated = datetime.now()
+
     def _ensure_chat_history(self, session_id: str):
         """Đảm bảo chat history tồn tại cho session"""
         if session_id not in self.chat_histories:
@@ -396,31 +934,82 @@ class A2AClientManager:
         """Tạo pattern để tìm tất cả sessions của user"""
         return f"chat_history:{user_id}:*"
     
+    def _get_meta_key(self, user_id: str, session_id: str) -> str:
+        """Tạo Redis key cho metadata hash của chat history"""
+        return f"chat_history_meta:{user_id}:{session_id}"
+    
+    async def _append_chat_message_to_redis(self, user_id: str, session_id: str, message: Dict[str, Any]):
+        """Append một message vào Redis list (một pipeline round trip, không rewrite toàn bộ history)"""
+        if not self.redis_client:
+            return
+        
+        try:
+            redis_key = self._get_redis_key(user_id, session_id)
+            meta_key = self._get_meta_key(user_id, session_id)
+            await migrate_chat_history_key(self.redis_client, redis_key)
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.rpush(redis_key, json.dumps(message, ensure_ascii=False))
+            pipe.ltrim(redis_key, -CHAT_HISTORY_MAX_STORED, -1)
+            pipe.expire(redis_key, CHAT_HISTORY_TTL_SECONDS)
+            pipe.hsetnx(meta_key, "created_at", message["timestamp"])
+            pipe.hset(meta_key, "last_updated", message["timestamp"])
+            pipe.expire(meta_key, CHAT_HISTORY_TTL_SECONDS)
+            if self.session_index:
+                self.session_index.add_to_pipeline(pipe, user_id, session_id)
+            await pipe.execute()
+            logger.debug(f"💾 Append chat message vào Redis: {redis_key}")
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi append chat message vào Redis: {e}")
+    
     async def _save_chat_history_to_redis(self, user_id: str, session_id: str, chat_history: ChatHistory):
-        """Lưu chat history vào Redis"""
+        """Rewrite toàn bộ chat history vào Redis list (dùng khi tạo mới/bulk import)"""
         if not self.redis_client:
             return
         
         try:
             redis_key = self._get_redis_key(user_id, session_id)
-            data = json.dumps(chat_history.to_dict())
-            await self.redis_client.set(redis_key, data, ex=86400*7)  # Expire sau 7 ngày
+            meta_key = self._get_meta_key(user_id, session_id)
+            
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(redis_key)
+            if chat_history.messages:
+                pipe.rpush(redis_key, *[json.dumps(m, ensure_ascii=False) for m in chat_history.messages[-CHAT_HISTORY_MAX_STORED:]])
+                pipe.expire(redis_key, CHAT_HISTORY_TTL_SECONDS)
+            pipe.hset(meta_key, mapping={
+                "created_at": chat_history.created_at.isoformat(),
+                "last_updated": chat_history.last_updated.isoformat()
+            })
+            pipe.expire(meta_key, CHAT_HISTORY_TTL_SECONDS)
+            if self.session_index:
+                self.session_index.add_to_pipeline(pipe, user_id, session_id, chat_history.last_updated.timestamp())
+            await pipe.execute()
             logger.debug(f"💾 Lưu chat history vào Redis: {redis_key}")
         except Exception as e:
             logger.error(f"❌ Lỗi khi lưu chat history vào Redis: {e}")
     
-    async def _load_chat_history_from_redis(self, user_id: str, session_id: str) -> Optional[ChatHistory]:
-        """Tải chat history từ Redis"""
+    async def _load_chat_history_from_redis(self, user_id: str, session_id: str, limit: Optional[int] = None) -> Optional[ChatHistory]:
+        """Tải chat history từ Redis (chỉ `limit` messages cuối nếu có)"""
         if not self.redis_client:
             return None
         
         try:
             redis_key = self._get_redis_key(user_id, session_id)
-            data = await self.redis_client.get(redis_key)
-            if data:
-                chat_data = json.loads(data)
-                return ChatHistory.from_dict(chat_data)
-            return None
+            await migrate_chat_history_key(self.redis_client, redis_key)
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.lrange(redis_key, -limit if limit else 0, -1)
+            pipe.hgetall(self._get_meta_key(user_id, session_id))
+            entries, meta = await pipe.execute()
+            
+            if not entries and not meta:
+                return None
+            
+            return ChatHistory.from_dict({
+                "messages": [json.loads(entry) for entry in entries],
+                "created_at": meta.get("created_at", datetime.now().isoformat()),
+                "last_updated": meta.get("last_updated", datetime.now().isoformat())
+            })
         except Exception as e:
             logger.error(f"❌ Lỗi khi tải chat history từ Redis: {e}")
             return None
@@ -446,7 +1035,17 @@ class A2AClientManager:
     async def get_available_agents(self) -> List[str]:
         """Lấy danh sách agents khả dụng"""
         available = []
+        snapshot = self.health_prober.snapshot
         for agent_name, agent_client in self.agents.items():
+            # Agent có circuit breaker đang mở -> orchestrator không route tới
+            breaker = self.breakers.get(agent_name)
+            if breaker and breaker.is_open:
+                continue
+            # Có snapshot từ background prober -> đọc trực tiếp, không health check trên request path
+            if agent_name in snapshot:
+                if snapshot[agent_name].healthy:
+                    available.append(agent_name)
+                continue
             if agent_client.is_healthy:
                 available.append(agent_name)
             else:
@@ -457,6 +1056,15 @@ class A2AClientManager:
         
         return available
 
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Trạng thái circuit breakers, hedging và degraded cache"""
+        return {
+            "breakers": {name: breaker.get_stats() for name, breaker in self.breakers.items()},
+            **self.resilience_stats,
+            "fanout": dict(self.fanout_stats, timeout=self.fanout_timeout),
+            "degraded_cache": self.degraded_cache.get_stats()
+        }
+
     async def health_check_all(self) -> Dict[str, Any]:
         """Health check tất cả agents"""
         results = {}
@@ -473,7 +1081,16 @@ class A2AClientManager:
         return results
 
     async def get_chat_history(self, user_id: str, session_id: str) -> Optional[ChatHistory]:
-        """Lấy chat history cho session (ưu tiên Redis nếu có user_id)"""
+        """Lấy chat history cho session (ưu tiên ConversationStore, sau đó Redis nếu có user_id)"""
+        if self.conversation_store:
+            records = await self.conversation_store.get_records(session_id, user_id)
+            if not records:
+                return None
+            return ChatHistory.from_dict({
+                "messages": records,
+                "created_at": records[0]["timestamp"],
+                "last_updated": records[-1]["timestamp"]
+            })
         if user_id and self.redis_client:
             return await self._load_chat_history_from_redis(user_id, session_id)
         else:
@@ -488,7 +1105,11 @@ class A2AClientManager:
         if user_id and self.redis_client:
             try:
                 redis_key = self._get_redis_key(user_id, session_id)
-                await self.redis_client.delete(redis_key)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.delete(redis_key, self._get_meta_key(user_id, session_id))
+                if self.session_index:
+                    self.session_index.remove_in_pipeline(pipe, user_id, session_id)
+                await pipe.execute()
                 logger.info(f"🗑️ Đã xóa chat history từ Redis: {redis_key}")
             except Exception as e:
                 logger.error(f"❌ Lỗi khi xóa chat history từ Redis: {e}")
@@ -537,28 +1158,27 @@ class A2AClientManager:
         
         return await self.redis_health_monitor.performance_report()
     
-    async def cleanup_expired_sessions(self, ttl_threshold: int = 86400) -> int:
-        """Cleanup các chat history sessions đã expired"""
+    async def cleanup_expired_sessions(self) -> int:
+        """Cleanup các chat history sessions đã expired (một vòng sweep, tiếp tục từ checkpoint nếu có)"""
         if not self.optimized_redis_client:
             return 0
         
-        pattern = "chat_history:*"
-        return await self.optimized_redis_client.cleanup_expired_sessions(pattern, ttl_threshold)
+        return await self.session_sweeper.sweep()
 
     async def cleanup(self):
         """Cleanup tất cả resources"""
         logger.info("🔄 Cleanup A2A Client Manager...")
         
+        await self.health_prober.stop()
+        await self.session_sweeper.stop()
+        for task in list(self._bootstrap_tasks):
+            task.cancel()
+        
         for agent_name, agent_client in self.agents.items():
             await agent_client.close()
+        await self.transport.aclose()
         
-        # Cleanup expired sessions trước khi đóng connection
-        if self.optimized_redis_client:
-            try:
-                cleaned_count = await self.cleanup_expired_sessions()
-                logger.info(f"🧹 Đã cleanup {cleaned_count} expired sessions")
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi cleanup expired sessions: {e}")
+        # Expired sessions được sweep ở background (session_sweeper), vòng dở dang tiếp tục từ checkpoint sau restart
         
         # Đóng Redis connection
         if self.redis_client:
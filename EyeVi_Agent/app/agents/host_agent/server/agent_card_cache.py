@@ -0,0 +1,99 @@
+"""
+Agent Card Cache - Lưu agent cards xuống disk để restart không phụ thuộc vào việc tất cả agents đang chạy
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from a2a.types import AgentCard
+
+logger = logging.getLogger(__name__)
+
+class AgentCardCache:
+    """
+    Cache agent card theo từng agent trong thư mục local (một file JSON mỗi agent)
+
+    - Card được ghi lại mỗi lần resolve thành công qua mạng (ghi atomic: temp file + os.replace)
+    - Khi agent chưa lên lúc khởi động, A2AAgentClient dựng A2A client từ card đã cache
+      (request thật vẫn đi qua circuit breaker, prober sẽ refresh card khi agent hồi phục)
+    - Cache bị bỏ qua nếu base_url đã đổi hoặc card quá max_age
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_age: Optional[float] = None, enabled: Optional[bool] = None):
+        self.directory = directory if directory is not None else os.getenv("AGENT_CARD_CACHE_DIR", ".cache/agent_cards")
+        self.max_age = max_age if max_age is not None else float(os.getenv("AGENT_CARD_CACHE_MAX_AGE", str(86400 * 7)))
+        self.enabled = enabled if enabled is not None else os.getenv("AGENT_CARD_CACHE_ENABLED", "true").lower() == "true"
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _path(self, agent_name: str) -> str:
+        filename = re.sub(r'[^a-z0-9]+', '_', agent_name.lower()).strip('_')
+        return os.path.join(self.directory, f"{filename}.json")
+
+    def load(self, agent_name: str, base_url: str) -> Optional[AgentCard]:
+        """Đọc card đã cache của agent (None nếu không có, hết hạn hoặc khác base_url)"""
+        if not self.enabled:
+            return None
+        path = self._path(agent_name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            cached_at = datetime.fromisoformat(data["cached_at"])
+            if data.get("base_url") != base_url or (datetime.now() - cached_at).total_seconds() > self.max_age:
+                self.misses += 1
+                return None
+            card = AgentCard.model_validate(data["card"])
+            self.hits += 1
+            return card
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Agent card cache của {agent_name} không hợp lệ ({path}): {e}")
+            return None
+
+    def save(self, agent_name: str, base_url: str, card: AgentCard):
+        """Ghi card vừa resolve xuống disk (best-effort, lỗi chỉ log)"""
+        if not self.enabled:
+            return
+        path = self._path(agent_name)
+        payload = {
+            "agent_name": agent_name,
+            "base_url": base_url,
+            "cached_at": datetime.now().isoformat(),
+            "card": card.model_dump(mode="json", by_alias=True, exclude_none=True)
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Không thể ghi agent card cache cho {agent_name}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors
+        }
@@ -0,0 +1,302 @@
+"""
+Blob Store - Lưu file upload theo SHA-256 (content-addressed), agents chỉ nhận reference trong A2A file part
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+BLOB_URI_PREFIX = "blob://sha256/"
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def blob_uri(digest: str) -> str:
+    return f"{BLOB_URI_PREFIX}{digest}"
+
+def parse_blob_uri(uri: str) -> Optional[str]:
+    """Lấy digest từ blob URI (None nếu không phải blob reference hợp lệ)"""
+    if not uri or not uri.startswith(BLOB_URI_PREFIX):
+        return None
+    digest = uri[len(BLOB_URI_PREFIX):]
+    return digest if _DIGEST_RE.match(digest) else None
+
+def is_valid_digest(digest: str) -> bool:
+    return bool(digest and _DIGEST_RE.match(digest))
+
+class BlobStore(ABC):
+    """
+    Interface chung cho blob store
+
+    - put() hash nội dung, bỏ qua write nếu blob đã tồn tại (upload lặp lại không ghi lại)
+    - Metadata (mime_type, name, size) lưu cạnh blob để client có thể gửi lại chỉ bằng digest
+    - Blob hết hạn sau BLOB_STORE_TTL kể từ lần dùng cuối (exists() gia hạn khi dedup hit hoặc file_refs)
+    """
+
+    backend = "base"
+
+    def __init__(self):
+        # Metrics
+        self.puts = 0
+        self.dedup_hits = 0
+        self.bytes_written = 0
+        self.ref_lookups = 0
+        self.ref_misses = 0
+
+    async def put(self, data: bytes, mime_type: str, name: Optional[str] = None) -> Tuple[str, bool]:
+        """Lưu blob, trả về (digest, created)"""
+        digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        self.puts += 1
+        if await self.exists(digest):
+            self.dedup_hits += 1
+            return digest, False
+        await self._write(digest, data, {"mime_type": mime_type, "name": name, "size": len(data)})
+        self.bytes_written += len(data)
+        return digest, True
+
+    async def get_metadata(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Metadata của blob đã lưu (None nếu digest không tồn tại)"""
+        self.ref_lookups += 1
+        metadata = await self._read_metadata(digest) if is_valid_digest(digest) else None
+        if metadata is None:
+            self.ref_misses += 1
+        return metadata
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        """Blob có tồn tại không (đồng thời gia hạn retention của blob)"""
+
+    @abstractmethod
+    async def get(self, digest: str) -> Optional[bytes]:
+        """Nội dung blob (None nếu không tồn tại)"""
+
+    @abstractmethod
+    async def _write(self, digest: str, data: bytes, metadata: Dict[str, Any]):
+        """Ghi blob mới cùng metadata"""
+
+    @abstractmethod
+    async def _read_metadata(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Metadata của blob (None nếu không tồn tại)"""
+
+    def start(self):
+        """Khởi động background tasks của backend (nếu có)"""
+
+    async def aclose(self):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "puts": self.puts,
+            "dedup_hits": self.dedup_hits,
+            "bytes_written": self.bytes_written,
+            "ref_lookups": self.ref_lookups,
+            "ref_misses": self.ref_misses
+        }
+
+class LocalBlobStore(BlobStore):
+    """
+    Blob store trên filesystem (thư mục dùng chung giữa host và agents, ví dụ docker volume)
+
+    Retention giống backend redis: blob có mtime cũ hơn BLOB_STORE_TTL bị xóa bởi sweep chạy nền
+    mỗi BLOB_STORE_SWEEP_INTERVAL; exists() touch blob để gia hạn khi được dùng lại
+    """
+
+    backend = "local"
+
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[int] = None, sweep_interval: Optional[float] = None):
+        super().__init__()
+        self.directory = directory if directory is not None else os.getenv("BLOB_STORE_DIR", "/tmp/eyevi_blobs")
+        self.ttl = ttl if ttl is not None else int(os.getenv("BLOB_STORE_TTL", str(86400)))
+        self.sweep_interval = sweep_interval if sweep_interval is not None else float(os.getenv("BLOB_STORE_SWEEP_INTERVAL", "3600"))
+        self._sweep_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.swept_blobs = 0
+        self.last_sweep_at: Optional[float] = None
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    async def exists(self, digest: str) -> bool:
+        def _touch(path: str) -> bool:
+            # Reset mtime (dedup hit / file_refs) để sweep không xóa blob đang được dùng
+            try:
+                os.utime(path)
+                os.utime(f"{path}.json")
+                return True
+            except FileNotFoundError:
+                return False
+        return await asyncio.to_thread(_touch, self._path(digest))
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        def _read():
+            try:
+                with open(self._path(digest), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                return None
+        return await asyncio.to_thread(_read)
+
+    async def _write(self, digest: str, data: bytes, metadata: Dict[str, Any]):
+        def _write_atomic(path: str, payload: bytes):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+        path = self._path(digest)
+        # Metadata ghi trước, blob ghi sau: blob tồn tại => metadata đã có
+        await asyncio.to_thread(_write_atomic, f"{path}.json", json.dumps(metadata, ensure_ascii=False).encode("utf-8"))
+        await asyncio.to_thread(_write_atomic, path, data)
+
+    async def _read_metadata(self, digest: str) -> Optional[Dict[str, Any]]:
+        def _read():
+            try:
+                with open(f"{self._path(digest)}.json", "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return None
+        if not await self.exists(digest):
+            return None
+        return await asyncio.to_thread(_read)
+
+    def start(self):
+        """Chạy sweep blob hết hạn trong background"""
+        if self.ttl > 0 and (self._sweep_task is None or self._sweep_task.done()):
+            self._sweep_task = asyncio.create_task(self._run_sweeper())
+            logger.info(f"🧹 Blob sweeper started (ttl={self.ttl}s, interval={self.sweep_interval}s)")
+
+    async def _run_sweeper(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi sweep blob store: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def sweep(self) -> int:
+        """Xóa blob (và metadata, file .tmp bị bỏ dở) có mtime cũ hơn TTL, trả về số blob đã xóa"""
+        def _sweep() -> int:
+            cutoff = time.time() - self.ttl
+            removed = 0
+            if not os.path.isdir(self.directory):
+                return 0
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        continue
+                    try:
+                        if entry.stat().st_mtime >= cutoff:
+                            continue
+                        # Blob xóa trước, metadata sau: giữ bất biến "blob tồn tại => metadata đã có"
+                        os.unlink(entry.path)
+                        if not entry.name.endswith(".tmp"):
+                            removed += 1
+                            try:
+                                os.unlink(f"{entry.path}.json")
+                            except FileNotFoundError:
+                                pass
+                    except FileNotFoundError:
+                        continue
+            return removed
+
+        removed = await asyncio.to_thread(_sweep)
+        self.swept_blobs += removed
+        self.last_sweep_at = time.time()
+        if removed:
+            logger.info(f"🧹 Đã xóa {removed} blob hết hạn khỏi {self.directory}")
+        return removed
+
+    async def aclose(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **super().get_stats(),
+            "directory": self.directory,
+            "ttl": self.ttl,
+            "swept_blobs": self.swept_blobs,
+            "last_sweep_at": self.last_sweep_at
+        }
+
+class RedisBlobStore(BlobStore):
+    """Blob store trên Redis (binary-safe client riêng, blob hết hạn sau BLOB_STORE_TTL)"""
+
+    backend = "redis"
+    KEY_PREFIX = "blob:sha256"
+
+    def __init__(self, redis_client: Optional[aioredis.Redis] = None, ttl: Optional[int] = None):
+        super().__init__()
+        self.ttl = ttl if ttl is not None else int(os.getenv("BLOB_STORE_TTL", str(86400)))
+        # Client riêng với decode_responses=False vì blob là binary
+        self.redis_client = redis_client or aioredis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            password=os.getenv("REDIS_PASSWORD") or None,
+            db=int(os.getenv("REDIS_DB", "0")),
+            decode_responses=False
+        )
+
+    def _key(self, digest: str) -> str:
+        return f"{self.KEY_PREFIX}:{digest}"
+
+    async def exists(self, digest: str) -> bool:
+        # Upload lặp lại gia hạn TTL thay vì ghi lại nội dung
+        return bool(await self.redis_client.expire(self._key(digest), self.ttl))
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        return await self.redis_client.hget(self._key(digest), "data")
+
+    async def _write(self, digest: str, data: bytes, metadata: Dict[str, Any]):
+        key = self._key(digest)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(key, mapping={"data": data, "meta": json.dumps(metadata, ensure_ascii=False)})
+        pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+    async def _read_metadata(self, digest: str) -> Optional[Dict[str, Any]]:
+        meta = await self.redis_client.hget(self._key(digest), "meta")
+        return json.loads(meta) if meta else None
+
+    async def aclose(self):
+        await self.redis_client.close()
+
+def create_blob_store(backend: Optional[str] = None) -> Optional[BlobStore]:
+    """
+    Tạo blob store theo BLOB_STORE_BACKEND (local | redis | none)
+
+    Returns:
+        None nếu tắt -> file upload được gửi inline (base64) như trước
+    """
+    backend = (backend if backend is not None else os.getenv("BLOB_STORE_BACKEND", "local")).lower()
+    if backend == "local":
+        return LocalBlobStore()
+    if backend == "redis":
+        return RedisBlobStore()
+    if backend not in ("none", ""):
+        logger.warning(f"⚠️ BLOB_STORE_BACKEND không hợp lệ: {backend}, gửi file inline")
+    return None
@@ -0,0 +1,187 @@
+"""
+Circuit Breaker - Ngắt traffic tới agent chậm/lỗi dựa trên cửa sổ latency/error gần nhất
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional
+
+from .text_utils import normalize_message
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Breaker đang mở, request bị fast-fail"""
+
+class CircuitBreaker:
+    """
+    Circuit breaker theo rolling window của N calls gần nhất
+
+    - closed: cho phép tất cả requests, trip khi error rate hoặc slow-call rate vượt ngưỡng
+    - open: fast-fail trong open_duration giây
+    - half_open: cho phép một số probe requests, đóng lại nếu thành công, mở lại nếu lỗi
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: Optional[int] = None,
+        min_calls: Optional[int] = None,
+        error_rate_threshold: Optional[float] = None,
+        slow_call_threshold: Optional[float] = None,
+        slow_call_rate_threshold: Optional[float] = None,
+        open_duration: Optional[float] = None,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.window_size = window_size if window_size is not None else int(os.getenv("CB_WINDOW_SIZE", "20"))
+        self.min_calls = min_calls if min_calls is not None else int(os.getenv("CB_MIN_CALLS", "5"))
+        self.error_rate_threshold = error_rate_threshold if error_rate_threshold is not None else float(os.getenv("CB_ERROR_RATE", "0.5"))
+        self.slow_call_threshold = slow_call_threshold if slow_call_threshold is not None else float(os.getenv("CB_SLOW_CALL_SECONDS", "20"))
+        self.slow_call_rate_threshold = slow_call_rate_threshold if slow_call_rate_threshold is not None else float(os.getenv("CB_SLOW_CALL_RATE", "0.6"))
+        self.open_duration = open_duration if open_duration is not None else float(os.getenv("CB_OPEN_SECONDS", "30"))
+        self.half_open_max_calls = half_open_max_calls
+
+        # Mỗi phần tử: (success, latency_seconds)
+        self._window: "deque[tuple]" = deque(maxlen=self.window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+
+        # Metrics
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_duration:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+            logger.info(f"🟡 Circuit breaker {self.name}: open -> half_open")
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def allow_request(self) -> bool:
+        """Request có được phép đi tiếp hay không (half_open chỉ cho một số probe)"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+            self._half_open_in_flight += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self, latency: float):
+        self._window.append((True, latency))
+        if self._state == self.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            if latency < self.slow_call_threshold:
+                self._close()
+                return
+            self._open("slow probe")
+            return
+        self._evaluate()
+
+    def record_failure(self, latency: float):
+        self._window.append((False, latency))
+        if self._state == self.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._open("probe failed")
+            return
+        self._evaluate()
+
+    def _rates(self) -> tuple:
+        calls = len(self._window)
+        if not calls:
+            return 0.0, 0.0
+        errors = sum(1 for success, _ in self._window if not success)
+        slow = sum(1 for _, latency in self._window if latency >= self.slow_call_threshold)
+        return errors / calls, slow / calls
+
+    def _evaluate(self):
+        if self._state != self.CLOSED or len(self._window) < self.min_calls:
+            return
+        error_rate, slow_rate = self._rates()
+        if error_rate >= self.error_rate_threshold:
+            self._open(f"error rate {error_rate:.0%}")
+        elif slow_rate >= self.slow_call_rate_threshold:
+            self._open(f"slow-call rate {slow_rate:.0%}")
+
+    def _open(self, reason: str):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"🔴 Circuit breaker {self.name} OPEN ({reason}), fast-fail trong {self.open_duration}s")
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._window.clear()
+        logger.info(f"🟢 Circuit breaker {self.name}: half_open -> closed")
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """Quantile latency của các calls thành công trong window (None nếu chưa đủ dữ liệu)"""
+        latencies = sorted(latency for success, latency in self._window if success)
+        if len(latencies) < self.min_calls:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        error_rate, slow_rate = self._rates()
+        return {
+            "state": self.state,
+            "window_calls": len(self._window),
+            "error_rate": error_rate,
+            "slow_call_rate": slow_rate,
+            "p50_latency_ms": (self.latency_quantile(0.5) or 0.0) * 1000,
+            "p95_latency_ms": (self.latency_quantile(0.95) or 0.0) * 1000,
+            "trips": self.trips,
+            "rejected": self.rejected
+        }
+
+class DegradedResponseCache:
+    """
+    LRU các response thành công gần nhất theo (agent, message đã chuẩn hóa), dùng khi breaker mở.
+    Key không chứa user_id: chỉ dùng cho agent chỉ đọc (Search/Advisor), không dùng cho Order Agent.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("DEGRADED_CACHE_MAX_ENTRIES", "500"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("DEGRADED_CACHE_TTL", "3600"))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, agent_name: str, message: str) -> str:
+        return hashlib.sha256(f"{agent_name}|{normalize_message(message)}".encode("utf-8")).hexdigest()
+
+    def put(self, agent_name: str, message: str, response: Dict[str, Any]):
+        key = self._key(agent_name, message)
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(response))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, agent_name: str, message: str) -> Optional[Dict[str, Any]]:
+        key = self._key(agent_name, message)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,329 @@
+"""
+Conversation Store - Nguồn lưu trữ duy nhất cho lịch sử hội thoại (Redis list + fan-out bất đồng bộ sang MySQL)
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import redis.asyncio as aioredis
+
+from .flush_coordinator import SessionFlushCoordinator
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TTL_SECONDS = 86400 * 7  # Expire sau 7 ngày
+
+# Marker trong hàng đợi flush: xóa history trước khi append các records phía sau
+_CLEAR_MARKER = object()
+
+_AGENT_PREFIX_RE = re.compile(r'^\[([^\]]+)\]\s*(.*)$', re.DOTALL)
+
+def make_record(
+    role: str,
+    content: str,
+    clarified_content: Optional[str] = None,
+    agent_used: Optional[str] = None,
+    user_id: Optional[str] = None,
+    files: Optional[List[str]] = None,
+    response_data: Optional[Any] = None,
+    analysis: Optional[str] = None,
+    timestamp: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Tạo canonical record cho một message (cùng field names với ChatHistory message dict)
+
+    Args:
+        role: "user" hoặc "assistant"
+        content: Nội dung gốc (user message chưa kèm tên file)
+        clarified_content: Message đã được orchestrator làm rõ
+        agent_used: Agent đã trả lời (assistant)
+        files: Tên các file đính kèm
+        response_data: Structured data từ agent (products, orders, ...)
+        analysis: Phân tích của orchestrator
+    """
+    record = {
+        "role": role,
+        "content": content,
+        "clarified_content": clarified_content,
+        "timestamp": timestamp or datetime.now().isoformat(),
+    }
+    if agent_used:
+        record["agent_used"] = agent_used
+    if user_id:
+        record["user_id"] = user_id
+    if files:
+        record["files"] = files
+    if response_data is not None:
+        record["response_data"] = response_data
+    if analysis:
+        record["analysis"] = analysis
+    return record
+
+def record_from_legacy(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Chuyển entry cũ ({"type": "human"|"ai"} của LangChain history hoặc ChatHistory dict) sang canonical record"""
+    if "role" in entry:
+        return entry
+    if entry.get("type") == "human":
+        return make_record("user", entry.get("content", ""), timestamp=entry.get("timestamp"))
+    if entry.get("type") == "ai":
+        content = entry.get("content", "")
+        agent_used = None
+        # LangChain history cũ lưu agent dưới dạng prefix "[Agent Name] ..."
+        agent_match = _AGENT_PREFIX_RE.match(content)
+        if agent_match:
+            agent_used, content = agent_match.group(1), agent_match.group(2)
+        return make_record("assistant", content, agent_used=agent_used, timestamp=entry.get("timestamp"))
+    return None
+
+class ConversationStore:
+    """
+    Lưu trữ hội thoại thống nhất cho HostServer, A2AClientManager và EnhancedMemoryManager
+
+    Storage layout:
+        langchain_history:{user}:{session}       -> LIST các canonical records (JSON)
+        langchain_history_meta:{user}:{session}  -> HASH (created_at, last_updated, message_count)
+        user_sessions:{user}                     -> ZSET (nếu có session_index, xem UserSessionIndex)
+    - Một turn (user + assistant) = một pipeline Redis, writes được gộp/ghi tuần tự qua SessionFlushCoordinator
+    - MySQL message_history nhận cùng records qua background task, không nằm trên request path
+    - Không có Redis: fallback lưu in-memory
+    """
+
+    KEY_PREFIX = "langchain_history"
+    META_PREFIX = "langchain_history_meta"
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        mysql_history: Optional[Any] = None,
+        max_stored_messages: Optional[int] = None,
+        flush_coordinator: Optional[SessionFlushCoordinator] = None,
+        session_index: Optional[Any] = None
+    ):
+        self.redis_client = redis_client
+        self.mysql_history = mysql_history
+        # UserSessionIndex: cập nhật user_sessions:{user} trong cùng pipeline với mỗi lần ghi
+        self.session_index = session_index
+        self.max_stored_messages = max_stored_messages if max_stored_messages is not None else int(os.getenv("CHAT_HISTORY_MAX_STORED", "1000"))
+        self.flush_coordinator = flush_coordinator or SessionFlushCoordinator()
+        self._local: Dict[str, List[Dict[str, Any]]] = {}
+        self._local_counts: Dict[str, int] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.appended_records = 0
+        self.mysql_fanouts = 0
+        self.mysql_errors = 0
+        self.migrated_keys = 0
+
+    def _get_key(self, session_id: str, user_id: Optional[str] = None) -> str:
+        return f"{self.KEY_PREFIX}:{user_id or 'anonymous'}:{session_id}"
+
+    def _get_meta_key(self, session_id: str, user_id: Optional[str] = None) -> str:
+        return f"{self.META_PREFIX}:{user_id or 'anonymous'}:{session_id}"
+
+    def append_records(self, session_id: str, user_id: Optional[str], records: List[Dict[str, Any]]):
+        """
+        Append records vào history (không block): Redis qua flush coordinator, MySQL qua background task
+        Các records của cùng một lần gọi luôn nằm trong cùng một pipeline
+        """
+        if not records:
+            return
+        self.appended_records += len(records)
+
+        key = self._get_key(session_id, user_id)
+        if self.redis_client:
+            writer = functools.partial(self._write_batch, session_id, user_id)
+            for record in records:
+                self.flush_coordinator.submit(key, record, writer)
+        else:
+            history = self._local.setdefault(key, [])
+            history.extend(records)
+            del history[:-self.max_stored_messages]
+            self._local_counts[key] = self._local_counts.get(key, 0) + len(records)
+
+        if self.mysql_history is not None and getattr(self.mysql_history, "async_session", None):
+            task = asyncio.create_task(self._fan_out_mysql(session_id, user_id, records))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    def clear(self, session_id: str, user_id: Optional[str] = None):
+        """Xóa history của session (đi qua cùng hàng đợi để không bị append cũ ghi đè)"""
+        key = self._get_key(session_id, user_id)
+        self._local.pop(key, None)
+        self._local_counts.pop(key, None)
+        if self.redis_client:
+            self.flush_coordinator.submit(key, _CLEAR_MARKER, functools.partial(self._write_batch, session_id, user_id))
+
+    async def flush(self, session_id: str, user_id: Optional[str] = None):
+        """Chờ writes pending của session hoàn tất (read-your-writes)"""
+        await self.flush_coordinator.flush(self._get_key(session_id, user_id))
+
+    async def get_records(self, session_id: str, user_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Đọc `limit` records gần nhất của session (toàn bộ nếu limit=None)"""
+        key = self._get_key(session_id, user_id)
+        if not self.redis_client:
+            history = self._local.get(key, [])
+            return list(history[-limit:] if limit else history)
+
+        try:
+            await self.flush(session_id, user_id)
+            await self.migrate_legacy_key(key)
+            entries = await self.redis_client.lrange(key, -limit if limit else 0, -1)
+            records = []
+            for entry in entries:
+                record = record_from_legacy(json.loads(entry))
+                if record is not None:
+                    records.append(record)
+            return records
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi đọc conversation từ Redis: {e}")
+            return []
+
+    async def get_message_count(self, session_id: str, user_id: Optional[str] = None) -> int:
+        """Tổng số messages đã append vào session (kể cả messages đã bị LTRIM khỏi list)"""
+        key = self._get_key(session_id, user_id)
+        if not self.redis_client:
+            return self._local_counts.get(key, 0)
+        await self.flush(session_id, user_id)
+        count = await self.redis_client.hget(self._get_meta_key(session_id, user_id), "message_count")
+        return int(count or 0)
+
+    async def get_window(self, session_id: str, user_id: Optional[str], limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Đọc `limit` records gần nhất cùng tổng số messages trong một snapshot (MULTI)
+
+        Returns:
+            (records, total) - record cuối cùng là message thứ `total` của session
+        """
+        if limit <= 0:
+            return [], await self.get_message_count(session_id, user_id)
+
+        key = self._get_key(session_id, user_id)
+        if not self.redis_client:
+            return list(self._local.get(key, [])[-limit:]), self._local_counts.get(key, 0)
+
+        await self.flush(session_id, user_id)
+        await self.migrate_legacy_key(key)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.lrange(key, -limit, -1)
+        pipe.hget(self._get_meta_key(session_id, user_id), "message_count")
+        entries, count = await pipe.execute()
+        records = [r for r in (record_from_legacy(json.loads(entry)) for entry in entries) if r is not None]
+        return records, int(count or 0)
+
+    async def _write_batch(self, session_id: str, user_id: Optional[str], batch: List[Any]):
+        """Writer cho flush coordinator: một pipeline cho toàn bộ batch (clear marker cuối cùng thắng)"""
+        clear_index = max((i for i, item in enumerate(batch) if item is _CLEAR_MARKER), default=-1)
+        records = batch[clear_index + 1:]
+        try:
+            await self._execute_write(session_id, user_id, records, clear_first=clear_index >= 0)
+        except aioredis.ResponseError as e:
+            # Key dạng JSON string cũ -> WRONGTYPE, migrate rồi ghi lại
+            if "WRONGTYPE" not in str(e) or not await self.migrate_legacy_key(self._get_key(session_id, user_id)):
+                raise
+            await self._execute_write(session_id, user_id, records, clear_first=clear_index >= 0)
+
+    async def _execute_write(self, session_id: str, user_id: Optional[str], records: List[Dict[str, Any]], clear_first: bool = False):
+        key = self._get_key(session_id, user_id)
+        meta_key = self._get_meta_key(session_id, user_id)
+        entries = [json.dumps(record, ensure_ascii=False, default=str) for record in records]
+        now = datetime.now().isoformat()
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        if clear_first:
+            pipe.delete(key, meta_key)
+            if not entries and self.session_index:
+                self.session_index.remove_in_pipeline(pipe, user_id, session_id)
+        if entries:
+            pipe.rpush(key, *entries)
+            pipe.ltrim(key, -self.max_stored_messages, -1)
+            pipe.expire(key, HISTORY_TTL_SECONDS)
+            pipe.hsetnx(meta_key, "created_at", now)
+            pipe.hset(meta_key, "last_updated", now)
+            pipe.hincrby(meta_key, "message_count", len(entries))
+            pipe.expire(meta_key, HISTORY_TTL_SECONDS)
+            if self.session_index:
+                self.session_index.add_to_pipeline(pipe, user_id, session_id)
+        await pipe.execute()
+
+    async def migrate_legacy_key(self, key: str) -> bool:
+        """Migrate key JSON string cũ (list các {"type", "content"}) sang LIST canonical records. Trả về True nếu đã migrate"""
+        if await self.redis_client.type(key) != "string":
+            return False
+
+        data = await self.redis_client.get(key)
+        records = [r for r in (record_from_legacy(m) for m in (json.loads(data) if data else [])) if r]
+        ttl = await self.redis_client.ttl(key)
+        meta_key = key.replace(f"{self.KEY_PREFIX}:", f"{self.META_PREFIX}:", 1)
+        now = datetime.now().isoformat()
+        ex = ttl if ttl and ttl > 0 else HISTORY_TTL_SECONDS
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        if records:
+            pipe.rpush(key, *[json.dumps(r, ensure_ascii=False) for r in records[-self.max_stored_messages:]])
+            pipe.expire(key, ex)
+        pipe.hset(meta_key, mapping={"created_at": now, "last_updated": now, "message_count": len(records)})
+        pipe.expire(meta_key, ex)
+        await pipe.execute()
+        self.migrated_keys += 1
+        logger.info(f"🔁 Migrated {key} từ JSON string sang Redis list ({len(records)} messages)")
+        return True
+
+    async def _fan_out_mysql(self, session_id: str, user_id: Optional[str], records: List[Dict[str, Any]]):
+        """Ghi records sang MySQL message_history (background)"""
+        # Convert user_id to int for MySQL (safe conversion)
+        mysql_user_id = None
+        if user_id:
+            try:
+                mysql_user_id = int(user_id)
+            except (ValueError, TypeError):
+                logger.warning(f"⚠️ Invalid user_id format: {user_id}, treating as None")
+
+        try:
+            for record in records:
+                if record["role"] == "user":
+                    await self.mysql_history.save_user_message(
+                        session_id=session_id,
+                        message_content=record["content"],
+                        user_id=mysql_user_id,
+                        clarified_content=record.get("clarified_content"),
+                        files=record.get("files")
+                    )
+                else:
+                    await self.mysql_history.save_agent_message(
+                        session_id=session_id,
+                        message_content=record["content"],
+                        agent_name=record.get("agent_used") or "Host Agent",
+                        user_id=mysql_user_id,
+                        response_data=record.get("response_data"),
+                        analysis=record.get("analysis")
+                    )
+            self.mysql_fanouts += 1
+        except Exception as e:
+            self.mysql_errors += 1
+            logger.error(f"❌ Lỗi khi lưu messages vào MySQL: {e}")
+
+    async def aclose(self, timeout: Optional[float] = 10.0):
+        """Chờ Redis flushes và MySQL fan-out in-flight (dùng khi shutdown)"""
+        await self.flush_coordinator.drain(timeout)
+        if self._background_tasks:
+            await asyncio.wait(set(self._background_tasks), timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê writes của conversation store"""
+        return {
+            "backend": "redis" if self.redis_client else "memory",
+            "appended_records": self.appended_records,
+            "redis": self.flush_coordinator.get_stats(),
+            "mysql_fanouts": self.mysql_fanouts,
+            "mysql_errors": self.mysql_errors,
+            "mysql_in_flight": len(self._background_tasks),
+            "migrated_keys": self.migrated_keys
+        }
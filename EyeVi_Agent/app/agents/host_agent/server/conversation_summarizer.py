@@ -0,0 +1,208 @@
+"""
+Conversation Summarizer - Tóm tắt cuốn chiếu (rolling) các turn cũ của session ở background,
+giữ orchestrator prompt ở kích thước giới hạn dù session dài bao nhiêu
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .conversation_store import ConversationStore, HISTORY_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Bạn đang duy trì bản tóm tắt của cuộc hội thoại giữa khách hàng và trợ lý của cửa hàng kính mắt.
+
+Tóm tắt hiện tại:
+{summary}
+
+Các tin nhắn mới (theo thứ tự thời gian):
+{messages}
+
+Viết lại bản tóm tắt bằng tiếng Việt, gộp thông tin từ các tin nhắn mới vào tóm tắt hiện tại, tối đa {max_words} từ.
+Giữ lại: nhu cầu và sở thích của khách, sản phẩm đã xem/quan tâm (kèm ID nếu có), thông tin cá nhân/đơn hàng khách đã cung cấp, các quyết định đã chốt.
+Bỏ qua lời chào và nội dung lặp lại. Chỉ trả về bản tóm tắt."""
+
+class ConversationSummarizer:
+    """
+    Rolling summary theo session
+
+    Storage layout:
+        conversation_summary:{user}:{session} -> HASH (summary, covered, updated_at)
+    - covered = số messages (đếm tuyệt đối theo message_count của ConversationStore) đã được gộp vào summary
+    - Khi số messages chưa tóm tắt vượt trigger_messages: gộp phần delta (trừ keep_recent messages mới nhất)
+      vào summary bằng một LLM call, không tóm tắt lại toàn bộ history
+    - Context cho orchestrator = summary + các messages chưa tóm tắt (tối đa max_window)
+    - Không có Redis: fallback lưu in-memory
+    """
+
+    KEY_PREFIX = "conversation_summary"
+
+    def __init__(
+        self,
+        conversation_store: ConversationStore,
+        llm: Any,
+        trigger_messages: Optional[int] = None,
+        keep_recent: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.conversation_store = conversation_store
+        self.llm = llm
+        self.trigger_messages = trigger_messages if trigger_messages is not None else int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "8"))
+        self.keep_recent = keep_recent if keep_recent is not None else int(os.getenv("SUMMARY_KEEP_RECENT", "4"))
+        self.max_chars = max_chars if max_chars is not None else int(os.getenv("SUMMARY_MAX_CHARS", "1200"))
+        self.enabled = enabled if enabled is not None else os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+        # Messages verbatim tối đa trong context (có dư cho các turn đến trong lúc đang tóm tắt)
+        self.max_window = self.trigger_messages + self.keep_recent
+        self._local: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._rerun: Set[str] = set()
+
+        # Metrics
+        self.runs = 0
+        self.folded_messages = 0
+        self.errors = 0
+        self.summary_latency_total = 0.0
+
+    @property
+    def redis_client(self):
+        return self.conversation_store.redis_client
+
+    def _get_key(self, session_id: str, user_id: Optional[str] = None) -> str:
+        return f"{self.KEY_PREFIX}:{user_id or 'anonymous'}:{session_id}"
+
+    async def _load_state(self, key: str) -> Tuple[str, int]:
+        if self.redis_client:
+            state = await self.redis_client.hgetall(key) or {}
+        else:
+            state = self._local.get(key, {})
+        return state.get("summary", ""), int(state.get("covered", 0))
+
+    async def _save_state(self, key: str, summary: str, covered: int):
+        state = {"summary": summary, "covered": covered, "updated_at": time.time()}
+        if self.redis_client:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(key, mapping=state)
+            pipe.expire(key, HISTORY_TTL_SECONDS)
+            await pipe.execute()
+        else:
+            self._local[key] = state
+
+    async def get_context_state(self, session_id: str, user_id: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Returns:
+            (summary, số messages gần nhất cần đưa nguyên văn vào context)
+        """
+        total = await self.conversation_store.get_message_count(session_id, user_id)
+        summary, covered = await self._load_state(self._get_key(session_id, user_id))
+        if covered > total:
+            # History đã bị xóa/tạo lại sau khi tóm tắt -> summary không còn hợp lệ
+            summary, covered = "", 0
+        return summary, min(total - covered, self.max_window)
+
+    def schedule(self, session_id: str, user_id: Optional[str] = None):
+        """Gọi sau mỗi turn: chạy tóm tắt ở background nếu cần (tối đa một task mỗi session)"""
+        if not self.enabled or not self.llm or not session_id:
+            return
+        key = self._get_key(session_id, user_id)
+        if key in self._running:
+            # Turn mới đến trong lúc đang tóm tắt -> kiểm tra lại khi task hiện tại xong
+            self._rerun.add(key)
+            return
+        task = asyncio.create_task(self._run(key, session_id, user_id))
+        self._running[key] = task
+        task.add_done_callback(lambda done: self._running.pop(key) if self._running.get(key) is done else None)
+
+    async def _run(self, key: str, session_id: str, user_id: Optional[str]):
+        try:
+            while True:
+                self._rerun.discard(key)
+                await self.summarize(session_id, user_id)
+                if key not in self._rerun:
+                    break
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Lỗi khi tóm tắt hội thoại session {session_id}: {e}")
+
+    async def summarize(self, session_id: str, user_id: Optional[str] = None) -> bool:
+        """Gộp delta messages (ngoài keep_recent) vào summary nếu vượt trigger_messages. Trả về True nếu đã cập nhật"""
+        key = self._get_key(session_id, user_id)
+        summary, covered = await self._load_state(key)
+        total = await self.conversation_store.get_message_count(session_id, user_id)
+        if covered > total:
+            summary, covered = "", 0
+        if total - covered <= self.trigger_messages:
+            return False
+
+        # Records + total trong cùng snapshot: record cuối cùng là message thứ `total`
+        records, total = await self.conversation_store.get_window(session_id, user_id, total - covered)
+        first_index = total - len(records)
+        delta = records[max(covered - first_index, 0):len(records) - self.keep_recent]
+        if not delta:
+            return False
+
+        start = time.monotonic()
+        new_summary = await self._summarize(summary, delta)
+        self.summary_latency_total += time.monotonic() - start
+
+        await self._save_state(key, new_summary, total - self.keep_recent)
+        self.runs += 1
+        self.folded_messages += len(delta)
+        logger.info(f"📝 Đã gộp {len(delta)} messages vào summary của session {session_id} (covered={total - self.keep_recent})")
+        return True
+
+    async def _summarize(self, summary: str, records: List[Dict[str, Any]]) -> str:
+        lines = []
+        for record in records:
+            if record.get("role") == "user":
+                lines.append(f"User: {record.get('clarified_content') or record.get('content', '')}")
+            else:
+                agent_used = record.get("agent_used")
+                content = record.get("content", "")
+                if len(content) > 1000:
+                    content = content[:1000] + "..."
+                lines.append(f"Assistant{f' ({agent_used})' if agent_used else ''}: {content}")
+
+        response = await self.llm.ainvoke(SUMMARY_PROMPT.format(
+            summary=summary or "(chưa có)",
+            messages="\n".join(lines),
+            max_words=self.max_chars // 6
+        ))
+        content = getattr(response, "content", response)
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+        content = str(content).strip()
+        return content[:self.max_chars]
+
+    async def clear(self, session_id: str, user_id: Optional[str] = None):
+        key = self._get_key(session_id, user_id)
+        task = self._running.pop(key, None)
+        if task:
+            task.cancel()
+        self._local.pop(key, None)
+        if self.redis_client:
+            await self.redis_client.delete(key)
+
+    async def aclose(self):
+        """Hủy các task tóm tắt đang chạy (dùng khi shutdown, summary sẽ được tính lại ở turn sau)"""
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "trigger_messages": self.trigger_messages,
+            "keep_recent": self.keep_recent,
+            "max_window": self.max_window,
+            "runs": self.runs,
+            "folded_messages": self.folded_messages,
+            "errors": self.errors,
+            "in_flight": len(self._running),
+            "avg_summary_latency_ms": (self.summary_latency_total / self.runs * 1000) if self.runs else 0.0
+        }
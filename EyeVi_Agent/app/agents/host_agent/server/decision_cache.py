@@ -0,0 +1,150 @@
+"""
+Orchestrator Decision Cache - Cache 2 tầng (in-process LRU + Redis) cho decision của orchestrator LLM
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+import redis.asyncio as aioredis
+
+from .text_utils import normalize_message
+
+logger = logging.getLogger(__name__)
+
+class OrchestratorDecisionCache:
+    """
+    Cache decision của orchestrator theo (message đã bỏ dấu, fingerprint của context)
+
+    - Tầng 1: LRU trong process, giới hạn số entries và TTL
+    - Tầng 2: Redis, chia sẻ giữa các host instances
+    - Không cache decision có extracted_product_ids (routing mua hàng phụ thuộc context cụ thể)
+    """
+
+    KEY_PREFIX = "orchestrator_decision"
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        max_entries: Optional[int] = None,
+        local_ttl: Optional[int] = None,
+        redis_ttl: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.redis_client = redis_client
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("DECISION_CACHE_MAX_ENTRIES", "1000"))
+        self.local_ttl = local_ttl if local_ttl is not None else int(os.getenv("DECISION_CACHE_TTL", "600"))
+        self.redis_ttl = redis_ttl if redis_ttl is not None else int(os.getenv("DECISION_CACHE_REDIS_TTL", "3600"))
+        self.enabled = enabled if enabled is not None else os.getenv("DECISION_CACHE_ENABLED", "true").lower() == "true"
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+        # Metrics
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def make_key(self, message: str, context: str, available_agents: Optional[List[str]] = None) -> str:
+        """Tạo cache key từ message đã bỏ dấu + hash của context window + danh sách agents khả dụng"""
+        normalized = normalize_message(message)
+        context_hash = hashlib.sha256((context or "").encode("utf-8")).hexdigest()[:16]
+        agents = ",".join(sorted(available_agents or []))
+        digest = hashlib.sha256(f"{normalized}|{context_hash}|{agents}".encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{digest}"
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, decision = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return decision
+
+    def _put_local(self, key: str, decision: Dict[str, Any]):
+        self._local[key] = (time.monotonic() + self.local_ttl, decision)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lấy decision từ cache (LRU trước, sau đó Redis)"""
+        if not self.enabled:
+            return None
+
+        decision = self._get_local(key)
+        if decision is not None:
+            self.local_hits += 1
+            return copy.deepcopy(decision)
+
+        if self.redis_client:
+            try:
+                data = await self.redis_client.get(key)
+                if data:
+                    decision = json.loads(data)
+                    self._put_local(key, decision)
+                    self.redis_hits += 1
+                    return copy.deepcopy(decision)
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi khi đọc decision cache từ Redis: {e}")
+
+        self.misses += 1
+        return None
+
+    def is_cacheable(self, decision: Dict[str, Any]) -> bool:
+        """Decision có thể cache được hay không"""
+        if decision.get("extracted_product_ids"):
+            return False
+        # Không cache kết quả parse lỗi
+        if decision.get("analysis") in ("Parse error", "Unable to parse orchestrator response"):
+            return False
+        return True
+
+    async def put(self, key: str, decision: Dict[str, Any]):
+        """Lưu decision vào cả 2 tầng cache"""
+        if not self.enabled:
+            return
+        if not self.is_cacheable(decision):
+            self.skipped += 1
+            return
+
+        self._put_local(key, copy.deepcopy(decision))
+        self.stores += 1
+
+        if self.redis_client:
+            try:
+                await self.redis_client.set(key, json.dumps(decision, ensure_ascii=False), ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi khi lưu decision cache vào Redis: {e}")
+
+    def clear_local(self):
+        """Xóa tầng cache trong process"""
+        self._local.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê hit/miss của decision cache"""
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "local_entries": len(self._local),
+            "max_entries": self.max_entries,
+            "local_ttl": self.local_ttl,
+            "redis_ttl": self.redis_ttl,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.local_hits + self.redis_hits) / lookups) if lookups else 0.0,
+            "stores": self.stores,
+            "skipped_uncacheable": self.skipped,
+            "evictions": self.evictions
+        }
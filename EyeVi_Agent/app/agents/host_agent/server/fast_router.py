@@ -0,0 +1,292 @@
+"""
+Fast-Path Router - Điều phối deterministic cho các message rõ ràng, bỏ qua orchestrator LLM
+"""
+
+import logging
+import os
+import re
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+from .text_utils import normalize_message
+
+logger = logging.getLogger(__name__)
+
+# Vocabulary đồng bộ với search_agent/data/filter_constants.py (host image không chứa search_agent)
+AVAILABLE_BRANDS = [
+    "BOLON", "MOLSION", "RAYBAN", "ANCCI", "AMO", "PUMA", "GUCCI", "BURBERRY", "TOMMY HILFIGER",
+    "PRADA", "FLYER", "VERSACE", "SWAROVSKI", "ARMANI EXCHANGE", "MONTBLANC", "ZIOZIA", "OAKLEY",
+    "EMPORIO ARMANI", "DOLCE & GABBANA", "REVLON", "TIFFANY & CO.", "YVES SAINT LAURENT", "FOSSIL",
+    "VALENTINO RUDY", "HANGTEN", "CARTIER", "BOTTEGA VENETA", "TOMMY JEANS", "GUY LAROCHE",
+    "COACH", "BALENCIAGA", "VOGUE", "REEBOK", "GIORGIO FERRI", "ALAIN DELON", "BVLGARI", "NIKON",
+    "MICHAEL KORS", "VUILLET VEGA"
+]
+
+BRAND_ALIASES = ["ray ban", "ray-ban", "d&g", "ysl", "tiffany"]
+
+CATEGORY_TERMS = [
+    "kinh mat", "kinh ram", "gong kinh", "gong", "kinh can", "kinh thoi trang", "kinh",
+    "sunglasses", "glasses", "eyeglasses", "frame", "frames"
+]
+
+# Các từ tham chiếu tới context trước đó -> cần LLM để làm rõ, không đi fast-path
+ANAPHORA_TERMS = [
+    "no", "cai do", "cai nay", "cai kia", "san pham do", "san pham nay", "mau do", "mau nay",
+    "thu nhat", "thu hai", "thu ba", "dau tien", "cuoi cung", "nhu vay", "nhu tren", "o tren",
+    "vua roi", "luc nay", "it", "that one", "this one"
+]
+
+# Liên từ nối nhiều yêu cầu trong một message (compound request)
+CONJUNCTION_TERMS = ["va", "dong thoi", "sau do", "roi", "and", "then", "also"]
+
+def _alternation(terms: List[str]) -> str:
+    """Tạo regex alternation, ưu tiên term dài trước"""
+    return "|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+
+class RoutingRule:
+    """Một rule fast-path: regex trên message đã chuẩn hóa -> agent + confidence"""
+
+    def __init__(
+        self,
+        name: str,
+        agent: str,
+        pattern: str,
+        confidence: float,
+        extract_product_ids: bool = False,
+        message_builder: Optional[Callable[[str, "re.Match"], str]] = None
+    ):
+        self.name = name
+        self.agent = agent
+        self.pattern = re.compile(pattern)
+        self.confidence = confidence
+        self.extract_product_ids = extract_product_ids
+        self.message_builder = message_builder
+
+    def match(self, normalized_message: str) -> Optional["re.Match"]:
+        return self.pattern.search(normalized_message)
+
+_BRAND_RE = _alternation([b.lower() for b in AVAILABLE_BRANDS] + BRAND_ALIASES)
+_CATEGORY_RE = _alternation(CATEGORY_TERMS)
+_PRODUCT_ID_RE = r"(?:san pham|sp|product|ma san pham|ma sp)\s*(?:id|ma|so)?\s*[:#]?\s*(\d+)|\bid\s*[:#]?\s*(\d+)"
+_PRODUCT_ID_PATTERN = re.compile(_PRODUCT_ID_RE)
+
+def default_rules() -> List[RoutingRule]:
+    """Bộ rules mặc định cho tiếng Việt/tiếng Anh"""
+    return [
+        RoutingRule(
+            name="purchase_with_product_id",
+            agent="Order Agent",
+            pattern=rf"\b(?:mua|dat hang|dat mua|order|them vao gio|buy)\b.*(?:{_PRODUCT_ID_RE})",
+            confidence=0.95,
+            extract_product_ids=True
+        ),
+        RoutingRule(
+            name="product_detail_by_id",
+            agent="Order Agent",
+            pattern=rf"\b(?:xem|thong tin|chi tiet|tim|kiem tra|show|view|detail|details)\b.*(?:{_PRODUCT_ID_RE})",
+            confidence=0.95,
+            extract_product_ids=True
+        ),
+        RoutingRule(
+            name="order_history",
+            agent="Order Agent",
+            pattern=r"\b(?:don hang|lich su mua|lich su dat|my orders?|order history|order status|trang thai don)\b",
+            confidence=0.92
+        ),
+        RoutingRule(
+            name="user_profile",
+            agent="Order Agent",
+            pattern=r"\b(?:thong tin ca nhan|thong tin cua toi|tai khoan cua toi|dia chi cua toi|my profile|my account)\b",
+            confidence=0.9
+        ),
+        RoutingRule(
+            name="brand_search",
+            agent="Search Agent",
+            pattern=rf"(?:^|\s)(?:{_BRAND_RE})(?=\s|$)",
+            confidence=0.9
+        ),
+        RoutingRule(
+            name="category_search",
+            agent="Search Agent",
+            pattern=rf"\b(?:tim|kiem|tim kiem|search|find|goi y|co ban|co mau|cho xem|show me)\b.*\b(?:{_CATEGORY_RE})\b",
+            confidence=0.88
+        ),
+        RoutingRule(
+            name="eye_health_advice",
+            agent="Advisor Agent",
+            pattern=r"\b(?:can thi|loan thi|vien thi|lao thi|kho mat|suc khoe mat|moi mat|anh sang xanh|trong kinh|chong choi|doi mat|nhuc mat)\b",
+            confidence=0.88
+        ),
+        RoutingRule(
+            name="style_advice",
+            agent="Advisor Agent",
+            pattern=r"^(?:tu van|cho (?:minh|toi) (?:hoi|xin loi khuyen)|nen chon|nen deo|advice|recommend)\b",
+            confidence=0.86
+        ),
+        # Rules confidence thấp: không đủ cho fast-path, chỉ dùng để dự đoán agent cho speculative dispatch
+        RoutingRule(
+            name="category_with_attributes",
+            agent="Search Agent",
+            pattern=rf"\b(?:{_CATEGORY_RE})\b.*\b(?:mau|den|trang|nau|vang|bac|nam|nu|tre em|gia|duoi|tren|trieu|tron|vuong|oval|titan|nhua|kim loai)\b",
+            confidence=0.72
+        ),
+        RoutingRule(
+            name="face_shape_advice",
+            agent="Advisor Agent",
+            pattern=r"\b(?:khuon mat|mat tron|mat vuong|mat dai|mat trai xoan|hop voi|phu hop voi|nen mua loai nao)\b",
+            confidence=0.72
+        ),
+    ]
+
+class FastPathRouter:
+    """
+    Pre-router chạy trước orchestrator LLM
+
+    - Áp dụng bảng rules đã compile trên message đã bỏ dấu
+    - Chỉ trả về decision khi confidence >= ngưỡng và các rule khớp không mâu thuẫn nhau
+    - Đếm hit theo từng rule để đo số LLM call tiết kiệm được
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[RoutingRule]] = None,
+        min_confidence: Optional[float] = None,
+        max_message_length: int = 160,
+        ambiguity_margin: float = 0.04,
+        enabled: Optional[bool] = None
+    ):
+        self.rules: List[RoutingRule] = rules if rules is not None else default_rules()
+        self.min_confidence = min_confidence if min_confidence is not None else float(os.getenv("FAST_ROUTER_MIN_CONFIDENCE", "0.85"))
+        self.max_message_length = max_message_length
+        self.ambiguity_margin = ambiguity_margin
+        self.enabled = enabled if enabled is not None else os.getenv("FAST_ROUTER_ENABLED", "true").lower() == "true"
+        self._anaphora_re = re.compile(rf"(?:^|\s)(?:{_alternation(ANAPHORA_TERMS)})(?=\s|$)")
+        self._conjunction_re = re.compile(rf"(?:^|\s)(?:{_alternation(CONJUNCTION_TERMS)})(?=\s|$)")
+
+        # Metrics
+        self.rule_hits: Dict[str, int] = {rule.name: 0 for rule in self.rules}
+        self.total_requests = 0
+        self.fast_path_hits = 0
+        self.fallbacks: Dict[str, int] = {"low_confidence": 0, "ambiguous": 0, "context_reference": 0, "too_long": 0, "agent_unavailable": 0}
+
+    def register_rule(self, rule: RoutingRule):
+        """Thêm rule mới (pluggable)"""
+        self.rules.append(rule)
+        self.rule_hits.setdefault(rule.name, 0)
+
+    def route(self, message: str, available_agents: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Thử điều phối message không cần LLM
+
+        Returns:
+            Decision dict cùng format với orchestrator, hoặc None nếu cần fallback về LLM
+        """
+        if not self.enabled or not message:
+            return None
+
+        self.total_requests += 1
+        normalized = normalize_message(message)
+
+        if len(normalized) > self.max_message_length:
+            self.fallbacks["too_long"] += 1
+            return None
+
+        if self._anaphora_re.search(normalized):
+            self.fallbacks["context_reference"] += 1
+            return None
+
+        matches = []
+        for rule in self.rules:
+            match = rule.match(normalized)
+            if match:
+                matches.append((rule, match))
+
+        if not matches:
+            self.fallbacks["low_confidence"] += 1
+            return None
+
+        rule, match = max(matches, key=lambda item: item[0].confidence)
+
+        # Rule của agent khác cũng khớp: ambiguous nếu confidence gần bằng hoặc message có liên từ (compound request)
+        is_compound = bool(self._conjunction_re.search(normalized))
+        for other_rule, _ in matches:
+            if other_rule.agent != rule.agent and (is_compound or rule.confidence - other_rule.confidence < self.ambiguity_margin):
+                self.fallbacks["ambiguous"] += 1
+                return None
+
+        if rule.confidence < self.min_confidence:
+            self.fallbacks["low_confidence"] += 1
+            return None
+
+        if available_agents is not None and rule.agent not in available_agents:
+            self.fallbacks["agent_unavailable"] += 1
+            return None
+
+        product_ids = []
+        if rule.extract_product_ids:
+            # Quét toàn bộ message: match của rule (greedy .*) chỉ giữ ID cuối cùng
+            for id_match in _PRODUCT_ID_PATTERN.finditer(normalized):
+                product_id = next(group for group in id_match.groups() if group)
+                if product_id not in product_ids:
+                    product_ids.append(product_id)
+
+        message_to_agent = rule.message_builder(message, match) if rule.message_builder else message
+
+        self.rule_hits[rule.name] += 1
+        self.fast_path_hits += 1
+        logger.info(f"⚡ Fast-path route: rule={rule.name} -> {rule.agent} (confidence={rule.confidence})")
+
+        return {
+            "analysis": f"Fast-path rule '{rule.name}'",
+            "clarified_message": message,
+            "selected_agent": rule.agent,
+            "message_to_agent": message_to_agent,
+            "extracted_product_ids": product_ids,
+            "direct_response": None,
+            "routing_source": "fast_path",
+            "routing_rule": rule.name,
+            "routing_confidence": rule.confidence
+        }
+
+    def predict(self, message: str, available_agents: Optional[List[str]] = None) -> Optional[Tuple[str, float, str]]:
+        """
+        Dự đoán agent cho speculative dispatch (không cập nhật metrics của fast-path)
+
+        Khác route(): chấp nhận confidence thấp và message dài, nhưng vẫn bỏ qua message tham chiếu context
+        hoặc khớp rules của nhiều agents (orchestrator có thể viết lại message / tách thành nhiều tasks)
+
+        Returns:
+            (agent, confidence, rule name) hoặc None
+        """
+        if not message:
+            return None
+        normalized = normalize_message(message)
+        if self._anaphora_re.search(normalized):
+            return None
+
+        matches = [rule for rule in self.rules if rule.match(normalized)]
+        if not matches or len({rule.agent for rule in matches}) > 1:
+            return None
+
+        rule = max(matches, key=lambda r: r.confidence)
+        if available_agents is not None and rule.agent not in available_agents:
+            return None
+        return rule.agent, rule.confidence, rule.name
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê hit-rate theo từng rule và số LLM call tiết kiệm được"""
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "total_requests": self.total_requests,
+            "fast_path_hits": self.fast_path_hits,
+            "llm_calls_saved": self.fast_path_hits,
+            "hit_rate": (self.fast_path_hits / self.total_requests) if self.total_requests else 0.0,
+            "rule_hits": {
+                name: {
+                    "hits": hits,
+                    "hit_rate": (hits / self.total_requests) if self.total_requests else 0.0
+                }
+                for name, hits in self.rule_hits.items()
+            },
+            "fallbacks": dict(self.fallbacks)
+        }
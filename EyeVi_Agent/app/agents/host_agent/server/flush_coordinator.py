@@ -0,0 +1,91 @@
+"""
+Flush Coordinator - Gộp và ghi tuần tự các writes theo từng session (tránh race giữa các orphan tasks)
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class SessionFlushCoordinator:
+    """
+    Điều phối persistence theo key (mỗi key là một session)
+
+    - Mỗi key có tối đa một flush task in-flight -> các writes được ghi đúng thứ tự
+    - Items submit trong lúc chờ được gộp (coalesce) thành một lần ghi
+    - Theo dõi các tasks in-flight để shutdown có thể await
+    - Exception của writer được log và đếm thay vì bị nuốt trong orphan task
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, List[Any]] = {}
+        self._writers: Dict[str, Callable[[List[Any]], Awaitable[None]]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._all_tasks: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.submitted_items = 0
+        self.issued_writes = 0
+        self.coalesced_items = 0
+        self.failed_writes = 0
+        self.last_error: Optional[str] = None
+
+    def submit(self, key: str, item: Any, writer: Callable[[List[Any]], Awaitable[None]]):
+        """Đưa một item vào hàng đợi của key, tạo flush task nếu chưa có"""
+        self._pending.setdefault(key, []).append(item)
+        self._writers[key] = writer
+        self.submitted_items += 1
+
+        if key not in self._tasks:
+            task = asyncio.create_task(self._flush_key(key))
+            self._tasks[key] = task
+            self._all_tasks.add(task)
+            task.add_done_callback(self._all_tasks.discard)
+
+    async def _flush_key(self, key: str):
+        try:
+            while self._pending.get(key):
+                batch = self._pending.pop(key)
+                writer = self._writers[key]
+                self.issued_writes += 1
+                self.coalesced_items += len(batch) - 1
+                try:
+                    await writer(batch)
+                except Exception as e:
+                    self.failed_writes += 1
+                    self.last_error = str(e)
+                    logger.error(f"❌ Lỗi khi flush writes cho {key} ({len(batch)} items): {e}")
+        finally:
+            self._tasks.pop(key, None)
+            if key not in self._pending:
+                self._writers.pop(key, None)
+
+    async def flush(self, key: str):
+        """Chờ tất cả writes đang pending/in-flight của key hoàn tất"""
+        while key in self._tasks:
+            await asyncio.shield(self._tasks[key])
+
+    async def drain(self, timeout: Optional[float] = 10.0):
+        """Chờ tất cả flush tasks in-flight (dùng khi shutdown)"""
+        if not self._all_tasks:
+            return
+        pending_count = len(self._all_tasks)
+        done, not_done = await asyncio.wait(set(self._all_tasks), timeout=timeout)
+        if not_done:
+            logger.warning(f"⚠️ {len(not_done)}/{pending_count} flush tasks chưa hoàn tất sau {timeout}s")
+        else:
+            logger.info(f"✅ Đã flush {pending_count} session writes")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters cho số items submit, số writes thực sự gửi đi và số items được coalesce"""
+        return {
+            "submitted_items": self.submitted_items,
+            "issued_writes": self.issued_writes,
+            "coalesced_items": self.coalesced_items,
+            "writes_per_item": (self.issued_writes / self.submitted_items) if self.submitted_items else 0.0,
+            "failed_writes": self.failed_writes,
+            "in_flight_sessions": len(self._tasks),
+            "pending_items": sum(len(items) for items in self._pending.values()),
+            "last_error": self.last_error
+        }
@@ -0,0 +1,164 @@
+"""
+Health Prober - Background probe tất cả agents, giữ availability snapshot bất biến cho request path
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from bisect import bisect_left
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds (ms) cho probe latency histogram
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+class AgentAvailability(NamedTuple):
+    """Kết quả probe gần nhất của một agent"""
+    healthy: bool
+    latency_ms: float
+    checked_at: str
+    consecutive_failures: int
+
+class LatencyHistogram:
+    """Histogram cumulative-style (Prometheus-like) cho probe latency"""
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = buckets or LATENCY_BUCKETS_MS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.total += value_ms
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "sum_ms": self.total, "count": self.count}
+
+class AgentHealthProber:
+    """
+    Probe định kỳ (có jitter) tất cả agents song song
+
+    - Snapshot availability là MappingProxyType được thay thế nguyên khối sau mỗi vòng probe,
+      request path chỉ đọc reference (không await, không network)
+    - Agent chưa khởi tạo, vừa hồi phục hoặc đang dùng card cache được chạy lại initialize() để refresh agent card
+    """
+
+    def __init__(
+        self,
+        client_manager: Any,
+        interval: Optional[float] = None,
+        jitter: Optional[float] = None,
+        probe_timeout: Optional[float] = None
+    ):
+        self.client_manager = client_manager
+        self.interval = interval if interval is not None else float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("HEALTH_PROBE_JITTER", "0.2"))
+        self.probe_timeout = probe_timeout if probe_timeout is not None else float(os.getenv("HEALTH_PROBE_TIMEOUT", "3"))
+        self._snapshot: Mapping[str, AgentAvailability] = MappingProxyType({})
+        self._task: Optional[asyncio.Task] = None
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+        # Metrics
+        self.rounds = 0
+        self.recoveries = 0
+
+    @property
+    def snapshot(self) -> Mapping[str, AgentAvailability]:
+        """Availability snapshot hiện tại (read-only)"""
+        return self._snapshot
+
+    @property
+    def has_snapshot(self) -> bool:
+        return bool(self._snapshot)
+
+    def start(self):
+        """Chạy prober trong background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🩺 Agent health prober started (interval={self.interval}s, jitter={self.jitter:.0%})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"❌ Lỗi trong health probe round: {e}")
+            # Jitter để các host instances không probe đồng loạt
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            await asyncio.sleep(max(delay, 0.1))
+
+    async def probe_all(self) -> Mapping[str, AgentAvailability]:
+        """Probe tất cả agents song song và publish snapshot mới"""
+        agents = dict(self.client_manager.agents)
+        results = await asyncio.gather(*(self._probe(name, client) for name, client in agents.items()))
+        self._snapshot = MappingProxyType(dict(zip(agents.keys(), results)))
+        self.rounds += 1
+        return self._snapshot
+
+    async def _probe(self, agent_name: str, agent_client: Any) -> AgentAvailability:
+        previous = self._snapshot.get(agent_name)
+        start = time.perf_counter()
+        was_initialized = agent_client.is_initialized
+        try:
+            if was_initialized:
+                healthy = await asyncio.wait_for(agent_client.health_check(), timeout=self.probe_timeout)
+            else:
+                # initialize() có thể thành công từ card cache trên disk -> healthy theo is_healthy
+                healthy = bool(await asyncio.wait_for(agent_client.initialize(), timeout=self.probe_timeout)) and agent_client.is_healthy
+        except Exception as e:
+            logger.debug(f"Health probe {agent_name} failed: {e}")
+            healthy = False
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.histograms.setdefault(agent_name, LatencyHistogram()).observe(latency_ms)
+
+        # Agent vừa hồi phục hoặc đang chạy bằng card cache: initialize lại để lấy agent card mới
+        # (agent có thể đã redeploy)
+        recovered = previous is not None and not previous.healthy
+        if healthy and was_initialized and (recovered or agent_client.card_source == "cache"):
+            self.recoveries += 1
+            logger.info(f"💚 {agent_name} đã hồi phục, khởi tạo lại A2A client")
+            agent_client.is_initialized = False
+            try:
+                healthy = bool(await asyncio.wait_for(agent_client.initialize(), timeout=self.probe_timeout)) and agent_client.is_healthy
+            except Exception as e:
+                logger.warning(f"⚠️ Không thể khởi tạo lại {agent_name}: {e}")
+                healthy = False
+
+        agent_client.is_healthy = healthy
+        return AgentAvailability(
+            healthy=healthy,
+            latency_ms=latency_ms,
+            checked_at=datetime.now().isoformat(),
+            consecutive_failures=0 if healthy else (previous.consecutive_failures + 1 if previous else 1)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot hiện tại và probe latency histograms"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "rounds": self.rounds,
+            "recoveries": self.recoveries,
+            "snapshot": {name: availability._asdict() for name, availability in self._snapshot.items()},
+            "latency_histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+        }
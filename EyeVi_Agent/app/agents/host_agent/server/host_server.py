@@ -5,7 +5,9 @@ Host Server - Core logic cho việc điều phối message tới các agent
 import asyncio
 import logging
 import os
-from typing import Dict, Any, Optional, List
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 from datetime import datetime
 import re
 import json
@@ -18,6 +20,15 @@ from prompt.root_prompt import ROOT_INSTRUCTION
 from .a2a_client_manager import A2AClientManager
 from .langchain_memory_adapter import EnhancedMemoryManager
 from .mysql_message_history import MySQLMessageHistory
+from .conversation_store import ConversationStore, make_record
+from .fast_router import FastPathRouter
+from .decision_cache import OrchestratorDecisionCache
+from .blob_store import create_blob_store
+from .speculative_dispatch import SpeculativeDispatcher, SpeculativeCall
+from .incremental_json import IncrementalJsonFieldExtractor
+from .product_index import SessionProductIndex
+from .text_utils import estimate_tokens
+from .session_index import UserSessionIndex
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +47,40 @@ class HostServer:
         
         # MySQL Message History cho real-time logging
         self.mysql_history = MySQLMessageHistory()
+        
+        # Conversation Store: nguồn lưu trữ duy nhất cho history (Redis + fan-out MySQL)
+        self.conversation_store = None
+        
+        # Fast-path router: điều phối các message rõ ràng không cần orchestrator LLM
+        self.fast_router = FastPathRouter()
+        
+        # Cache decision của orchestrator (LRU + Redis, Redis client được gán khi initialize)
+        self.decision_cache = OrchestratorDecisionCache()
+        
+        # Speculative dispatch: gọi trước agent được dự đoán trong lúc chờ orchestrator LLM
+        self.speculative_dispatcher = SpeculativeDispatcher(self.a2a_client_manager, self.fast_router)
+        
+        # Early dispatch: stream output của orchestrator, gửi request tới agent ngay khi routing fields hoàn tất
+        self.early_dispatch_enabled = os.getenv("ORCHESTRATOR_EARLY_DISPATCH", "true").lower() == "true"
+        self.early_dispatch_stats = {
+            "streamed_decisions": 0,
+            "early_dispatches": 0,
+            "head_start_total": 0.0
+        }
+        
+        # Blob store cho file upload (content-addressed, agents nhận reference thay vì base64)
+        self.blob_store = create_blob_store()
+        
+        # Index products agents đã trả về theo session (bảng sản phẩm cho orchestrator, resolve "cái thứ hai")
+        self.product_index = SessionProductIndex()
+        
+        # Index sessions theo user (ZSET), thay cho SCAN khi liệt kê sessions
+        self.session_index = UserSessionIndex()
+        self.a2a_client_manager.session_index = self.session_index
+        self._session_backfill_task: Optional[asyncio.Task] = None
+        
+        # Kích thước (tokens ước lượng) của các orchestrator prompts gần nhất, để kiểm chứng context có giới hạn
+        self.prompt_tokens = deque(maxlen=int(os.getenv("PROMPT_TOKENS_WINDOW", "1000")))
 
     async def initialize(self):
         """Khởi tạo các components cần thiết"""
@@ -57,10 +102,36 @@ class HostServer:
             # Khởi tạo A2A Client Manager
             await self.a2a_client_manager.initialize()
             
+            # Decision cache dùng chung Redis connection với A2A Client Manager
+            self.decision_cache.redis_client = self.a2a_client_manager.redis_client
+            self.product_index.redis_client = self.a2a_client_manager.redis_client
+            self.session_index.redis_client = self.a2a_client_manager.redis_client
+            
+            # Retention cho blob store (local: sweep theo mtime, redis: TTL của key)
+            if self.blob_store:
+                self.blob_store.start()
+            
+            # Conversation Store dùng chung cho Memory Manager và A2A Client Manager
+            self.conversation_store = ConversationStore(
+                redis_client=self.a2a_client_manager.redis_client,
+                mysql_history=self.mysql_history,
+                session_index=self.session_index
+            )
+            self.a2a_client_manager.conversation_store = self.conversation_store
+            
+            # Backfill session index từ keys hiện có (một lần, chạy nền)
+            if (
+                self.session_index.redis_client
+                and os.getenv("SESSION_INDEX_BACKFILL_ON_STARTUP", "true").lower() == "true"
+                and not await self.session_index.is_ready()
+            ):
+                self._session_backfill_task = asyncio.create_task(self._backfill_session_index())
+            
             # Khởi tạo Enhanced Memory Manager
             self.memory_manager = EnhancedMemoryManager(
                 redis_client=self.a2a_client_manager.redis_client,
-                llm=self.llm
+                llm=self.llm,
+                conversation_store=self.conversation_store
             )
             
             # Khởi tạo MySQL Message History
@@ -94,7 +165,7 @@ class HostServer:
 1. Phân tích và làm rõ message của user dựa vào context từ lịch sử hội thoại
 2. **QUAN TRỌNG - Xử lý yêu cầu mua hàng:**
    - Nếu user muốn mua/đặt hàng sản phẩm nào đó, PHẢI tìm ID sản phẩm từ context
-   - Tìm kiếm trong lịch sử các sản phẩm đã được search agent gợi ý (có chứa ID: xxx)
+   - Tra ID trong bảng "Sản phẩm trong phiên" (nếu có) - #1, #2, ... là vị trí trong kết quả gần nhất
    - Xác định chính xác sản phẩm nào user muốn mua dựa vào mô tả/tên sản phẩm
    - Đính kèm product ID vào message gửi tới order agent
 3. Viết lại message một cách rõ ràng hơn, thay thế các đại từ chỉ định bằng tên cụ thể
@@ -102,18 +173,21 @@ class HostServer:
 5. Trả về response theo format JSON:
 
 {{{{
-    "analysis": "Phân tích ngắn gọn về yêu cầu của user",
-    "clarified_message": "Message đã được viết lại rõ ràng hơn, thay thế các đại từ bằng tên cụ thể",
     "selected_agent": "Tên agent được chọn (hoặc null nếu có thể trả lời trực tiếp)",
     "message_to_agent": "Message đã được làm rõ để gửi tới agent (nếu có) - PHẢI chứa product ID nếu là yêu cầu mua hàng",
+    "agent_tasks": [{{{{"agent": "Tên agent", "message": "Phần yêu cầu dành cho agent này"}}}}] (chỉ khi yêu cầu gồm nhiều phần cần NHIỀU agent khác nhau, ngược lại để []),
     "extracted_product_ids": ["ID1", "ID2"] (nếu có - danh sách ID sản phẩm user muốn mua),
+    "analysis": "Phân tích ngắn gọn về yêu cầu của user",
+    "clarified_message": "Message đã được viết lại rõ ràng hơn, thay thế các đại từ bằng tên cụ thể",
     "direct_response": "Response trực tiếp (nếu không cần agent nào khác)"
 }}}}
 
+**QUAN TRỌNG - Thứ tự field:** giữ đúng thứ tự các field như trên (selected_agent, message_to_agent, agent_tasks trước tiên), host gửi request tới agent ngay khi các field này hoàn tất
+
 **Hướng dẫn xử lý yêu cầu mua hàng:**
 - Các từ khóa mua hàng: "mua", "đặt hàng", "order", "thêm vào giỏ", "tôi cần", "tôi muốn lấy"
 - Khi phát hiện yêu cầu mua hàng:
-  1. Quét lại context để tìm các sản phẩm có ID (định dạng: "ID: xxx" hoặc "id: xxx")
+  1. Tìm sản phẩm trong bảng "Sản phẩm trong phiên"; chỉ quét lịch sử hội thoại (định dạng: "ID: xxx" hoặc "id: xxx") khi bảng không có
   2. So khớp mô tả sản phẩm với yêu cầu của user
   3. Trích xuất chính xác product ID và đính kèm vào message_to_agent
   4. Format: "Tôi muốn mua [tên sản phẩm] với ID: [ID]"
@@ -125,10 +199,16 @@ class HostServer:
 - Nếu user nói "địa chỉ đó" → thay bằng địa chỉ cụ thể từ context
 - Luôn đảm bảo clarified_message có thể hiểu được mà không cần context bổ sung
 
+**Hướng dẫn yêu cầu gộp nhiều agent:**
+- Nếu message chứa nhiều yêu cầu độc lập thuộc các agent khác nhau (ví dụ: "tư vấn kính cho mặt tròn và tìm vài mẫu Gucci"), tách thành agent_tasks, mỗi agent một task
+- Mỗi message trong agent_tasks phải tự đủ (đã làm rõ, không phụ thuộc vào kết quả của task khác)
+- Không tách nếu phần sau phụ thuộc kết quả phần trước (ví dụ: "tìm kính Gucci rồi đặt mua cái rẻ nhất") → chỉ chọn agent cho bước đầu
+- Khi dùng agent_tasks, đặt selected_agent là agent của task đầu tiên
+
 **Lưu ý:**
 - Chỉ chọn agent khi thực sự cần thiết
 - Nếu có thể trả lời trực tiếp, đặt selected_agent = null
-- Message_to_agent phải sử dụng clarified_message và chứa đủ context
+- Message_to_agent phải là message đã được làm rõ (cùng nội dung với clarified_message) và chứa đủ context
 - **ĐẶC BIỆT QUAN TRỌNG**: Nếu là yêu cầu mua hàng, message_to_agent PHẢI chứa product ID
 - **TUYỆT ĐỐI KHÔNG nhắc đến tên agent** trong direct_response hoặc khi tham khảo thông tin từ context
 - **KHÔNG bao giờ nói**: "Search Agent đã tìm", "theo Advisor Agent", "như đã trả lời trước đó bởi..."
@@ -198,56 +278,236 @@ class HostServer:
         )
         
         # Tạo các chains
+        self.orchestrator_prompt = prompt_template
         self.orchestrator_chain = prompt_template | self.llm | StrOutputParser()
         self.file_clarification_chain = file_clarification_template | self.llm | StrOutputParser()
 
-    async def process_message(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+    async def _build_context_info(self, user_id: Optional[str], session_id: Optional[str], product_table: str = "") -> str:
         """
-        Xử lý message từ user và điều phối tới agent phù hợp
+        Lấy context từ LangChain memory (fallback về chat history cũ) để đưa vào orchestrator prompt
+        
+        Có product_table: products/ID đã nằm trong bảng nên response của agents trong history được rút gọn
         """
-        try:
-            # Chuẩn bị thông tin cho orchestrator
-            available_agents = await self.a2a_client_manager.get_available_agents()
+        context_info = ""
+        if session_id and self.memory_manager:
+            try:
+                context = await self.memory_manager.get_conversation_context(
+                    session_id,
+                    user_id,
+                    max_messages=5,
+                    max_chars_per_message=self.product_index.assistant_context_chars if product_table else None
+                )
+                if context:
+                    context_info = f"\nContext từ cuộc hội thoại trước:\n{context}"
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi khi lấy context từ memory: {e}")
+                # Fallback to old method
+                if user_id:
+                    chat_history = await self.a2a_client_manager.get_chat_history(user_id, session_id)
+                else:
+                    chat_history = self.a2a_client_manager.get_chat_history_fallback(session_id)
+                if chat_history:
+                    context_info = f"\nContext từ cuộc hội thoại trước:\n{chat_history.get_context_string()}"
+        if product_table:
+            context_info += f"\n\nSản phẩm trong phiên:\n{product_table}"
+        return context_info
 
-            # Lấy context từ LangChain memory nếu có session_id
-            context_info = ""
-            if session_id and self.memory_manager:
-                try:
-                    context = await self.memory_manager.get_conversation_context(session_id, user_id, max_messages=5)
-                    if context:
-                        context_info = f"\nContext từ cuộc hội thoại trước:\n{context}"
-                except Exception as e:
-                    logger.warning(f"⚠️ Lỗi khi lấy context từ memory: {e}")
-                    # Fallback to old method
-                    if user_id:
-                        chat_history = await self.a2a_client_manager.get_chat_history(user_id, session_id)
-                    else:
-                        chat_history = self.a2a_client_manager.get_chat_history_fallback(session_id)
-                    if chat_history:
-                        context_info = f"\nContext từ cuộc hội thoại trước:\n{chat_history.get_context_string()}"
-            
+    async def _get_orchestrator_decision(self, message: str, user_id: Optional[str], session_id: Optional[str]) -> Dict[str, Any]:
+        """Gọi orchestrator chain để phân tích message và trả về decision đã parse"""
+        decision, _ = await self._decide(message, user_id, session_id)
+        return decision
+
+    async def _decide(
+        self,
+        message: str,
+        user_id: Optional[str],
+        session_id: Optional[str],
+        dispatch: bool = False
+    ) -> Tuple[Dict[str, Any], Optional[asyncio.Task]]:
+        """
+        Lấy decision (fast-path -> decision cache -> orchestrator LLM)
+        
+        dispatch=True: host tự gửi request tới agent(s), trả về task cho kết quả (agent_tasks, response):
+            - Khi phải gọi orchestrator LLM, speculative request tới agent được dự đoán chạy song song
+            - Orchestrator output được stream, request được gửi ngay khi selected_agent, message_to_agent
+              và agent_tasks hoàn tất, trong lúc analysis/clarified_message/direct_response vẫn đang sinh
+        """
+        # Chuẩn bị thông tin cho orchestrator
+        available_agents = await self.a2a_client_manager.get_available_agents()
+        
+        # Thay tham chiếu thứ tự ("cái thứ hai") bằng sản phẩm + ID từ product index, không cần LLM
+        last_results, earlier_products = await self.product_index.get_products(session_id, user_id)
+        message, resolved_products = self.product_index.resolve_ordinals(message, last_results)
+        if resolved_products:
+            logger.info(f"🔢 Resolve tham chiếu thứ tự -> {[product['id'] for product in resolved_products]}: {message}")
+        
+        # Thử fast-path router trước, chỉ fallback về LLM khi confidence thấp
+        fast_decision = self.fast_router.route(message, available_agents)
+        if fast_decision:
+            return fast_decision, self._start_dispatch(message, fast_decision, None, user_id, session_id) if dispatch else None
+        
+        # Lấy context từ LangChain memory nếu có session_id
+        product_table = self.product_index.format_table(last_results, earlier_products)
+        context_info = await self._build_context_info(user_id, session_id, product_table)
+        
+        # Tra decision cache theo message đã chuẩn hóa + fingerprint của context
+        cache_key = self.decision_cache.make_key(message, context_info, available_agents)
+        cached_decision = await self.decision_cache.get(cache_key)
+        if cached_decision:
+            logger.info("🎯 Sử dụng orchestrator decision từ cache")
+            return cached_decision, self._start_dispatch(message, cached_decision, None, user_id, session_id) if dispatch else None
+        
+        inputs = {
+            "user_message": message + context_info,
+            "available_agents": ", ".join(available_agents)
+        }
+        self.prompt_tokens.append(estimate_tokens(self.orchestrator_prompt.format(**inputs)))
+        if not dispatch:
             # Gọi orchestrator chain để phân tích
-            orchestrator_response = await self.orchestrator_chain.ainvoke({
-                "user_message": message + context_info,
-                "available_agents": ", ".join(available_agents)
-            })
-            
+            orchestrator_response = await self.orchestrator_chain.ainvoke(inputs)
             logger.info(f"🤖 Orchestrator response: {orchestrator_response}")
-            
-            # Parse response từ orchestrator
             decision = await self._parse_orchestrator_response(orchestrator_response)
+            await self.decision_cache.put(cache_key, decision)
+            return decision, None
+        
+        speculative = self.speculative_dispatcher.maybe_start(message, available_agents, user_id)
+        try:
+            if self.early_dispatch_enabled:
+                orchestrator_response, dispatch_task, early_fields = await self._stream_orchestrator(
+                    inputs, message, speculative, user_id, session_id
+                )
+            else:
+                orchestrator_response, dispatch_task, early_fields = await self.orchestrator_chain.ainvoke(inputs), None, None
+        except BaseException:
+            if speculative and not speculative.task.done():
+                await self.speculative_dispatcher.cancel(speculative)
+            raise
+        
+        logger.info(f"🤖 Orchestrator response: {orchestrator_response}")
+        
+        # Parse response từ orchestrator
+        decision = await self._parse_orchestrator_response(orchestrator_response)
+        if early_fields and decision.get("selected_agent") != early_fields.get("selected_agent"):
+            # Output cuối không parse được: giữ routing đã dùng để gửi request
+            decision = {**decision, **early_fields}
+        await self.decision_cache.put(cache_key, decision)
+        
+        if dispatch_task is None:
+            dispatch_task = self._start_dispatch(message, decision, speculative, user_id, session_id)
+        return decision, dispatch_task
+
+    async def _stream_orchestrator(
+        self,
+        inputs: Dict[str, Any],
+        message: str,
+        speculative: Optional[SpeculativeCall],
+        user_id: Optional[str],
+        session_id: Optional[str]
+    ) -> Tuple[str, Optional[asyncio.Task], Optional[Dict[str, Any]]]:
+        """
+        Stream output của orchestrator qua IncrementalJsonFieldExtractor
+        
+        Returns:
+            (toàn bộ output, dispatch task nếu đã gửi sớm, routing fields đã dùng để gửi sớm)
+        """
+        extractor = IncrementalJsonFieldExtractor()
+        dispatch_task = None
+        early_fields = None
+        dispatched_at = None
+        
+        try:
+            async for chunk in self.orchestrator_chain.astream(inputs):
+                completed = extractor.feed(chunk)
+                if dispatch_task is not None or not completed:
+                    continue
+                
+                fields = extractor.fields
+                if "selected_agent" not in fields or "agent_tasks" not in fields:
+                    continue
+                selected_agent = fields["selected_agent"]
+                if selected_agent and selected_agent != "null" and "message_to_agent" not in fields:
+                    continue
+                
+                # Routing đã chốt (giá trị của field hoàn tất không thay đổi nữa) -> gửi request ngay
+                early_fields = {key: fields[key] for key in ("selected_agent", "message_to_agent", "agent_tasks") if key in fields}
+                dispatch_task = self._start_dispatch(message, early_fields, speculative, user_id, session_id)
+                dispatched_at = time.monotonic()
+                logger.info(f"⚡ Early dispatch theo orchestrator stream: {selected_agent}")
+        except BaseException:
+            if dispatch_task:
+                dispatch_task.cancel()
+            raise
+        
+        self.early_dispatch_stats["streamed_decisions"] += 1
+        if dispatched_at is not None:
+            self.early_dispatch_stats["early_dispatches"] += 1
+            self.early_dispatch_stats["head_start_total"] += time.monotonic() - dispatched_at
+        return extractor.text, dispatch_task, early_fields
+
+    def _start_dispatch(
+        self,
+        message: str,
+        decision: Dict[str, Any],
+        speculative: Optional[SpeculativeCall],
+        user_id: Optional[str],
+        session_id: Optional[str]
+    ) -> asyncio.Task:
+        """Tạo task gửi request tới agent(s) theo decision (dùng kết quả speculative nếu trùng agent)"""
+        return asyncio.create_task(self._dispatch_agent_tasks(message, decision, speculative, user_id, session_id))
+
+    async def _dispatch_agent_tasks(
+        self,
+        message: str,
+        decision: Dict[str, Any],
+        speculative: Optional[SpeculativeCall],
+        user_id: Optional[str],
+        session_id: Optional[str]
+    ) -> Tuple[List[Dict[str, str]], Any]:
+        """
+        Gửi request theo agent tasks của decision
+        
+        Returns:
+            (agent_tasks, response): response của một agent, list kết quả khi fan-out, None khi trả lời trực tiếp
+        """
+        agent_tasks = self._resolve_agent_tasks(decision, decision.get("clarified_message", message))
+        
+        # Đối chiếu speculative request với decision: dùng kết quả nếu trùng agent, ngược lại hủy
+        if speculative:
+            speculative_response = await self.speculative_dispatcher.resolve(speculative, agent_tasks, user_id, session_id)
+            if speculative_response is not None:
+                return agent_tasks, speculative_response
+        
+        if len(agent_tasks) > 1:
+            return agent_tasks, await self.a2a_client_manager.send_message_to_agents(agent_tasks, user_id=user_id, session_id=session_id)
+        if agent_tasks:
+            return agent_tasks, await self.a2a_client_manager.send_message_to_agent(
+                agent_name=agent_tasks[0]["agent"],
+                message=agent_tasks[0]["message"],
+                user_id=user_id,
+                session_id=session_id
+            )
+        return agent_tasks, None
+
+    async def process_message(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Xử lý message từ user và điều phối tới agent phù hợp
+        """
+        try:
+            decision, dispatch_task = await self._decide(message, user_id, session_id, dispatch=True)
             
             # Xử lý theo decision
             clarified_message = decision.get("clarified_message", message)
             
+            # Request tới agent(s) đã được gửi trong _decide (early dispatch / speculative)
+            agent_tasks, agent_result = await dispatch_task
+            
+            if len(agent_tasks) > 1:
+                return await self._process_fan_out(message, decision, agent_tasks, user_id, session_id, results=agent_result)
+            if agent_tasks:
+                decision = {**decision, "selected_agent": agent_tasks[0]["agent"], "message_to_agent": agent_tasks[0]["message"]}
+            
             if decision.get("selected_agent") and decision["selected_agent"] != "null":
-                # Gửi message đã được làm rõ tới agent được chọn qua A2A
-                agent_response = await self.a2a_client_manager.send_message_to_agent(
-                    agent_name=decision["selected_agent"],
-                    message=decision.get("message_to_agent", clarified_message),
-                    user_id=user_id,
-                    session_id=session_id
-                )
+                agent_response = agent_result
                 
                 # agent_response_data = self.parse_agent_response(agent_response)
                 agent_response_data = agent_response
@@ -272,7 +532,7 @@ class HostServer:
                     "analysis": decision.get("analysis", ""),
                     "clarified_message": clarified_message,
                     "session_id": session_id,
-                    "data": agent_response_data["data"],
+                    "data": agent_response_data.get("data", []),
                     "user_info": agent_response_data.get("user_info", {}),
                     "orders": agent_response_data.get("orders", []),
                     "extracted_product_ids": decision.get("extracted_product_ids", [])
@@ -419,6 +679,196 @@ class HostServer:
                 "files_processed": 0
             }
 
+    async def process_message_stream(self, message: str, user_id: Optional[str] = None, session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Phiên bản streaming của process_message
+        
+        Yield lần lượt các event:
+            {"event": "decision", ...}    - ngay sau khi orchestrator quyết định
+            {"event": "agent_text", ...}  - text từng phần từ agent (qua A2A streaming)
+            {"event": "final", ...}       - kết quả cuối cùng, cùng format với process_message
+        Memory được lưu sau khi event final đã được gửi đi.
+        """
+        try:
+            decision = await self._get_orchestrator_decision(message, user_id, session_id)
+            clarified_message = decision.get("clarified_message", message)
+            
+            agent_tasks = self._resolve_agent_tasks(decision, clarified_message)
+            if len(agent_tasks) > 1:
+                # Nhiều agents: không stream text từng phần, gửi decision rồi kết quả đã gộp
+                yield {
+                    "event": "decision",
+                    "agent_used": ", ".join(task["agent"] for task in agent_tasks),
+                    "agents_used": [task["agent"] for task in agent_tasks],
+                    "analysis": decision.get("analysis", ""),
+                    "clarified_message": clarified_message,
+                    "session_id": session_id,
+                    "extracted_product_ids": decision.get("extracted_product_ids", [])
+                }
+                result = await self._process_fan_out(message, decision, agent_tasks, user_id, session_id)
+                yield {"event": "final", **result}
+                return
+            if agent_tasks:
+                decision = {**decision, "selected_agent": agent_tasks[0]["agent"], "message_to_agent": agent_tasks[0]["message"]}
+            selected_agent = decision.get("selected_agent")
+            if selected_agent == "null":
+                selected_agent = None
+            
+            yield {
+                "event": "decision",
+                "agent_used": selected_agent,
+                "analysis": decision.get("analysis", ""),
+                "clarified_message": clarified_message,
+                "session_id": session_id,
+                "extracted_product_ids": decision.get("extracted_product_ids", [])
+            }
+            
+            if selected_agent:
+                agent_response_data = None
+                async for agent_event in self.a2a_client_manager.send_message_to_agent_streaming(
+                    agent_name=selected_agent,
+                    message=decision.get("message_to_agent", clarified_message),
+                    user_id=user_id,
+                    session_id=session_id
+                ):
+                    if agent_event["type"] == "text":
+                        yield {"event": "agent_text", "agent_used": selected_agent, "text": agent_event["text"]}
+                    elif agent_event["type"] == "final":
+                        agent_response_data = agent_event["content"]
+                
+                # Lưu turn trước khi yield final: client SSE thường ngắt kết nối ngay khi nhận final,
+                # generator bị đóng tại yield và phần sau không được chạy
+                await self._save_messages_to_memory_with_agent(
+                    user_message=message,
+                    ai_response=agent_response_data.get("text", ""), 
+                    user_id=user_id, 
+                    session_id=session_id, 
+                    clarified_message=clarified_message,
+                    agent_name=selected_agent,
+                    response_data=agent_response_data.get("data"),
+                    analysis=decision.get("analysis")
+                )
+                
+                yield {
+                    "event": "final",
+                    "response": agent_response_data.get("text", ""),
+                    "agent_used": selected_agent,
+                    "analysis": decision.get("analysis", ""),
+                    "clarified_message": clarified_message,
+                    "session_id": session_id,
+                    "data": agent_response_data.get("data"),
+                    "user_info": agent_response_data.get("user_info", {}),
+                    "orders": agent_response_data.get("orders", []),
+                    "extracted_product_ids": decision.get("extracted_product_ids", [])
+                }
+            else:
+                direct_response = decision.get("direct_response", "Xin lỗi, tôi chưa hiểu yêu cầu của bạn.")
+                
+                # Lưu turn trước khi yield final (client có thể ngắt kết nối ngay sau đó)
+                await self._save_messages_to_memory_with_agent(
+                    user_message=message,
+                    ai_response=direct_response, 
+                    user_id=user_id, 
+                    session_id=session_id, 
+                    clarified_message=clarified_message,
+                    agent_name="Host Agent",
+                    analysis=decision.get("analysis")
+                )
+                
+                yield {
+                    "event": "final",
+                    "response": direct_response,
+                    "agent_used": None,
+                    "analysis": decision.get("analysis", ""),
+                    "clarified_message": clarified_message,
+                    "session_id": session_id,
+                    "extracted_product_ids": decision.get("extracted_product_ids", [])
+                }
+                
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi xử lý streaming message: {e}")
+            yield {
+                "event": "error",
+                "response": f"Xin lỗi, đã có lỗi xảy ra khi xử lý yêu cầu của bạn: {str(e)}",
+                "agent_used": None,
+                "analysis": "Error occurred",
+                "session_id": session_id
+            }
+
+    async def process_message_with_files_stream(
+        self, 
+        message: str, 
+        user_id: Optional[str] = None, 
+        session_id: Optional[str] = None,
+        files: Optional[List[Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Phiên bản streaming của process_message_with_files - gửi thẳng qua Search Agent"""
+        if not files:
+            async for event in self.process_message_stream(message, user_id, session_id):
+                yield event
+            return
+        
+        try:
+            yield {
+                "event": "decision",
+                "agent_used": "Search Agent",
+                "analysis": None,
+                "clarified_message": None,
+                "session_id": session_id,
+                "extracted_product_ids": None
+            }
+            
+            agent_response_data = None
+            async for agent_event in self.a2a_client_manager.send_message_to_agent_streaming(
+                agent_name="Search Agent",
+                message=message,
+                user_id=user_id,
+                session_id=session_id,
+                files=files
+            ):
+                if agent_event["type"] == "text":
+                    yield {"event": "agent_text", "agent_used": "Search Agent", "text": agent_event["text"]}
+                elif agent_event["type"] == "final":
+                    agent_response_data = agent_event["content"]
+            
+            # Lưu turn trước khi yield final (client có thể ngắt kết nối ngay sau đó)
+            await self._save_messages_to_memory_with_agent(
+                user_message=message,
+                ai_response=agent_response_data.get("text", ""), 
+                user_id=user_id, 
+                session_id=session_id, 
+                clarified_message=None,
+                agent_name="Search Agent",
+                files=files,
+                response_data=agent_response_data.get("data"),
+                analysis=None
+            )
+            
+            yield {
+                "event": "final",
+                "response": agent_response_data.get("text", ""),
+                "agent_used": "Search Agent",
+                "analysis": None,
+                "clarified_message": None,
+                "session_id": session_id,
+                "files_processed": len(files),
+                "data": agent_response_data.get("data", []),
+                "user_info": agent_response_data.get("user_info", {}),
+                "orders": agent_response_data.get("orders", []),
+                "extracted_product_ids": None
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi xử lý streaming message với files: {e}")
+            yield {
+                "event": "error",
+                "response": f"Xin lỗi, đã có lỗi xảy ra khi xử lý yêu cầu của bạn: {str(e)}",
+                "agent_used": None,
+                "analysis": "Error occurred",
+                "session_id": session_id,
+                "files_processed": 0
+            }
+
     def parse_agent_response(self, response: str) -> dict:
         """
         Parse agent response để tách text và data
@@ -460,69 +910,16 @@ class HostServer:
         clarified_message: Optional[str] = None,
         files: Optional[List[Any]] = None
     ):
-        """Helper method để lưu messages vào LangChain memory và MySQL"""
-        # Convert user_id to int for MySQL (safe conversion)
-        mysql_user_id = None
-        if user_id:
-            try:
-                mysql_user_id = int(user_id)
-            except (ValueError, TypeError):
-                logger.warning(f"⚠️ Invalid user_id format: {user_id}, treating as None")
-        
-        # Save to LangChain Memory (existing logic)
-        if session_id and self.memory_manager:
-            try:
-                # Tạo user message content bao gồm thông tin về files
-                user_message_content = user_message
-                if files:
-                    file_names = [f.name for f in files]
-                    user_message_content += f" [Đính kèm: {', '.join(file_names)}]"
-                
-                # Lưu user message (sử dụng clarified message nếu có)
-                message_to_save = clarified_message if clarified_message else user_message_content
-                await self.memory_manager.add_user_message(session_id, message_to_save, user_id)
-                
-                # Lưu AI response
-                await self.memory_manager.add_ai_message(session_id, ai_response, user_id)
-                
-                logger.debug(f"💾 Đã lưu messages vào LangChain memory cho session {session_id}")
-                
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi lưu messages vào LangChain memory: {e}")
-                # Fallback to old method
-                await self._save_user_message_to_history_fallback(user_message, clarified_message or user_message, user_id, session_id, files)
-        
-        # Save to MySQL (new real-time logging)
-        if self.mysql_history and session_id:
-            try:
-                # Prepare file names for metadata
-                file_names = [f.name for f in files] if files else None
-                
-                # Save user message
-                await self.mysql_history.save_user_message(
-                    session_id=session_id,
-                    message_content=user_message,
-                    user_id=mysql_user_id,
-                    clarified_content=clarified_message,
-                    files=file_names
-                )
-                
-                # Save AI response (determine agent name from context)
-                # Default to Host Agent if no specific agent was used
-                agent_name = "Host Agent"  # Will be updated below if agent was used
-                
-                await self.mysql_history.save_agent_message(
-                    session_id=session_id,
-                    message_content=ai_response,
-                    agent_name=agent_name,
-                    user_id=mysql_user_id
-                )
-                
-                logger.debug(f"💾 Đã lưu messages vào MySQL cho session {session_id}")
-                
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi lưu messages vào MySQL: {e}")
-                # MySQL failure không block user experience
+        """Helper method để lưu messages (response do Host Agent trả lời trực tiếp)"""
+        await self._save_messages_to_memory_with_agent(
+            user_message=user_message,
+            ai_response=ai_response,
+            user_id=user_id,
+            session_id=session_id,
+            agent_name="Host Agent",
+            clarified_message=clarified_message,
+            files=files
+        )
 
     async def _save_messages_to_memory_with_agent(
         self, 
@@ -536,104 +933,150 @@ class HostServer:
         response_data: Optional[Dict[str, Any]] = None,
         analysis: Optional[str] = None
     ):
-        """Enhanced method để lưu messages với agent information"""
-        # Convert user_id to int for MySQL (safe conversion)
-        mysql_user_id = None
-        if user_id:
-            try:
-                mysql_user_id = int(user_id)
-            except (ValueError, TypeError):
-                logger.warning(f"⚠️ Invalid user_id format: {user_id}, treating as None")
+        """
+        Lưu cả turn (user + agent response) qua ConversationStore:
+        một pipeline Redis, MySQL được ghi ở background
+        """
+        if not session_id:
+            return
         
-        # Save to LangChain Memory (existing logic)
-        if session_id and self.memory_manager:
-            try:
-                # Tạo user message content bao gồm thông tin về files
-                user_message_content = user_message
-                if files:
-                    file_names = [f.name for f in files]
-                    user_message_content += f" [Đính kèm: {', '.join(file_names)}]"
-                
-                # Lưu user message (sử dụng clarified message nếu có)
-                message_to_save = clarified_message if clarified_message else user_message_content
-                await self.memory_manager.add_user_message(session_id, message_to_save, user_id)
-                
-                # Lưu AI response với agent information
-                ai_message_content = ai_response
-                if agent_name and agent_name != "Host Agent":
-                    ai_message_content = f"[{agent_name}] {ai_response}"
-                
-                await self.memory_manager.add_ai_message(session_id, ai_message_content, user_id)
-                
-                logger.debug(f"💾 Đã lưu messages vào LangChain memory cho session {session_id}")
-                
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi lưu messages vào LangChain memory: {e}")
-                # Fallback to old method
-                await self._save_user_message_to_history_fallback(user_message, clarified_message or user_message, user_id, session_id, files)
+        records = [
+            make_record(
+                role="user",
+                content=user_message,
+                clarified_content=clarified_message,
+                user_id=user_id,
+                files=[f.name for f in files] if files else None
+            ),
+            make_record(
+                role="assistant",
+                content=ai_response,
+                agent_used=agent_name,
+                response_data=response_data,
+                analysis=analysis
+            )
+        ]
         
-        # Save to MySQL với agent information
-        if self.mysql_history and session_id:
-            try:
-                # Prepare file names for metadata
-                file_names = [f.name for f in files] if files else None
-                
-                # Save user message
-                await self.mysql_history.save_user_message(
-                    session_id=session_id,
-                    message_content=user_message,
-                    user_id=mysql_user_id,
-                    clarified_content=clarified_message,
-                    files=file_names
-                )
-                
-                # Save AI response với agent information
-                await self.mysql_history.save_agent_message(
-                    session_id=session_id,
-                    message_content=ai_response,
-                    agent_name=agent_name,
-                    user_id=mysql_user_id,
-                    response_data=response_data,
-                    analysis=analysis
-                )
-                
-                logger.debug(f"💾 Đã lưu messages vào MySQL cho session {session_id} (agent: {agent_name})")
-                
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi lưu messages vào MySQL: {e}")
-                # MySQL failure không block user experience
+        try:
+            if self.memory_manager:
+                await self.memory_manager.add_turn(session_id, records, user_id)
+            elif self.conversation_store:
+                self.conversation_store.append_records(session_id, user_id, records)
+            logger.debug(f"💾 Đã lưu turn vào conversation store cho session {session_id} (agent: {agent_name})")
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi lưu messages vào conversation store: {e}")
+        
+        if response_data:
+            # Chỉ kết quả của Search Agent là danh sách có thứ tự ("cái thứ hai")
+            await self.product_index.record_products(
+                session_id,
+                user_id,
+                response_data,
+                agent_name=agent_name,
+                list_result="Search Agent" in (agent_name or "")
+            )
 
-    async def _save_user_message_to_history_fallback(self, original_message: str, clarified_message: str, user_id: Optional[str], session_id: str, files: Optional[List[Any]] = None):
-        """Fallback method để lưu tin nhắn gốc và clarified message vào chat history cũ"""
-        if not session_id:
-            return
-            
-        if user_id:
-            chat_history = await self.a2a_client_manager._ensure_chat_history_with_redis(user_id, session_id)
-        else:
-            self.a2a_client_manager._ensure_chat_history(session_id)
-            chat_history = self.a2a_client_manager.get_chat_history_fallback(session_id)
+    def _resolve_agent_tasks(self, decision: Dict[str, Any], clarified_message: str) -> List[Dict[str, str]]:
+        """
+        Chuẩn hóa decision thành danh sách agent tasks ({"agent", "message"})
         
-        # Tạo original message content bao gồm thông tin về files
-        original_message_content = original_message
-        if files:
-            file_names = [f.name for f in files]
-            original_message_content += f" [Đính kèm: {', '.join(file_names)}]"
-        
-        # Lưu tin nhắn gốc trước
-        chat_history.add_message(
-            role="user", 
-            content=original_message_content, 
-            clarified_content=clarified_message, 
-            agent_used=None, 
-            user_id=user_id
-        )
+        - agent_tasks (yêu cầu gộp) được ưu tiên, bỏ qua agent không tồn tại và agent trùng lặp
+        - Decision cũ chỉ có selected_agent -> một task
+        """
+        tasks = []
+        seen = set()
+        for task in decision.get("agent_tasks") or []:
+            if not isinstance(task, dict):
+                continue
+            agent_name = task.get("agent")
+            if not agent_name or agent_name == "null" or agent_name in seen:
+                continue
+            if agent_name not in self.a2a_client_manager.agents:
+                logger.warning(f"⚠️ Orchestrator trả về agent không tồn tại trong agent_tasks: {agent_name}")
+                continue
+            seen.add(agent_name)
+            tasks.append({"agent": agent_name, "message": task.get("message") or clarified_message})
+        if tasks:
+            return tasks
+        
+        selected_agent = decision.get("selected_agent")
+        if selected_agent and selected_agent != "null":
+            return [{"agent": selected_agent, "message": decision.get("message_to_agent", clarified_message)}]
+        return []
+
+    def _merge_agent_responses(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Gộp text/data của nhiều agents thành một response (theo thứ tự agent_tasks)"""
+        texts, data, orders = [], [], []
+        user_info = {}
+        agents_used, failed_agents = [], []
+        for result in results:
+            response = result.get("response")
+            if response is None:
+                failed_agents.append(result["agent"])
+                continue
+            agents_used.append(result["agent"])
+            if response.get("text"):
+                texts.append(response["text"].strip())
+            if isinstance(response.get("data"), list):
+                data.extend(response["data"])
+            elif response.get("data"):
+                data.append(response["data"])
+            orders.extend(response.get("orders") or [])
+            user_info = user_info or response.get("user_info") or {}
         
-        # Lưu vào Redis nếu có user_id
-        if user_id:
-            await self.a2a_client_manager._save_chat_history_to_redis(user_id, session_id, chat_history)
+        if failed_agents:
+            # Không nhắc tên agent trong response tới user
+            texts.append("Xin lỗi, một phần yêu cầu của bạn chưa được xử lý kịp. Bạn vui lòng hỏi lại phần đó sau ít phút nhé.")
         
-        return chat_history
+        return {
+            "text": "\n\n---\n\n".join(texts),
+            "data": data or None,
+            "user_info": user_info,
+            "orders": orders,
+            "agents_used": agents_used,
+            "failed_agents": failed_agents
+        }
+
+    async def _process_fan_out(
+        self,
+        message: str,
+        decision: Dict[str, Any],
+        agent_tasks: List[Dict[str, str]],
+        user_id: Optional[str],
+        session_id: Optional[str],
+        results: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Gửi song song các agent tasks của một yêu cầu gộp (trừ khi đã có results), gộp kết quả và lưu một turn vào memory"""
+        clarified_message = decision.get("clarified_message", message)
+        if results is None:
+            logger.info(f"🔀 Fan-out tới {len(agent_tasks)} agents: {[task['agent'] for task in agent_tasks]}")
+            results = await self.a2a_client_manager.send_message_to_agents(agent_tasks, user_id=user_id, session_id=session_id)
+        merged = self._merge_agent_responses(results)
+        agent_used = ", ".join(merged["agents_used"]) or None
+        
+        await self._save_messages_to_memory_with_agent(
+            user_message=message,
+            ai_response=merged["text"],
+            user_id=user_id,
+            session_id=session_id,
+            clarified_message=clarified_message,
+            agent_name=agent_used or "Host Agent",
+            response_data=merged["data"],
+            analysis=decision.get("analysis")
+        )
+        
+        return {
+            "response": merged["text"],
+            "agent_used": agent_used,
+            "agents_used": merged["agents_used"],
+            "analysis": decision.get("analysis", ""),
+            "clarified_message": clarified_message,
+            "session_id": session_id,
+            "data": merged["data"],
+            "user_info": merged["user_info"],
+            "orders": merged["orders"],
+            "extracted_product_ids": decision.get("extracted_product_ids", [])
+        }
 
     async def _parse_orchestrator_response(self, response: str) -> Dict[str, Any]:
         """Parse response từ orchestrator để extract decision"""
@@ -668,6 +1111,53 @@ class HostServer:
         """
         return await self.a2a_client_manager.send_message_to_agent(agent_name, message, user_id, session_id, files)
 
+    def get_metrics(self) -> Dict[str, Any]:
+        """Thống kê performance của các components trong host"""
+        return {
+            "fast_router": self.fast_router.get_stats(),
+            "decision_cache": self.decision_cache.get_stats(),
+            "mysql_writer": self.mysql_history.get_stats(),
+            "memory_registry": self.memory_manager.get_stats() if self.memory_manager else {},
+            "conversation_store": self.conversation_store.get_stats() if self.conversation_store else {},
+            "agent_transport": self.a2a_client_manager.transport.get_stats(),
+            "agent_resilience": self.a2a_client_manager.get_resilience_stats(),
+            "health_prober": self.a2a_client_manager.health_prober.get_stats(),
+            "session_sweeper": self.a2a_client_manager.session_sweeper.get_stats(),
+            "agent_bootstrap": self.a2a_client_manager.get_bootstrap_stats(),
+            "blob_store": self.blob_store.get_stats() if self.blob_store else {},
+            "speculation": self.speculative_dispatcher.get_stats(),
+            "product_index": self.product_index.get_stats(),
+            "session_index": self.session_index.get_stats(),
+            "conversation_summarizer": self.memory_manager.summarizer.get_stats() if self.memory_manager and self.memory_manager.summarizer else {},
+            "orchestrator_prompt_tokens": self._get_prompt_token_stats(),
+            "orchestrator_early_dispatch": self._get_early_dispatch_stats()
+        }
+
+    def _get_prompt_token_stats(self) -> Dict[str, Any]:
+        """Phân bố số tokens (ước lượng ~4 ký tự/token) của các orchestrator prompts gần nhất"""
+        samples = sorted(self.prompt_tokens)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "last": self.prompt_tokens[-1],
+            "avg": sum(samples) / len(samples),
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1]
+        }
+
+    def _get_early_dispatch_stats(self) -> Dict[str, Any]:
+        stats = self.early_dispatch_stats
+        early = stats["early_dispatches"]
+        return {
+            "enabled": self.early_dispatch_enabled,
+            "streamed_decisions": stats["streamed_decisions"],
+            "early_dispatches": early,
+            "head_start_ms_total": stats["head_start_total"] * 1000,
+            "avg_head_start_ms": (stats["head_start_total"] / early * 1000) if early else 0.0
+        }
+
     async def check_agents_health(self) -> Dict[str, bool]:
         """Kiểm tra health của tất cả agents"""
         health_status = await self.a2a_client_manager.health_check_all()
@@ -732,13 +1222,12 @@ class HostServer:
     async def get_chat_history(self, user_id: str, session_id: str) -> List[Dict[str, Any]]:
         """Lấy chat history cho session (ưu tiên LangChain memory) - format chuẩn"""
         try:
-            if self.memory_manager:
+            if self.conversation_store:
                 try:
-                    memory = await self.memory_manager.get_memory(session_id, user_id)
-                    messages = memory.chat_memory.messages
-                    return self._normalize_chat_history(messages)
+                    records = await self.conversation_store.get_records(session_id, user_id)
+                    return self._normalize_chat_history(records)
                 except Exception as e:
-                    logger.warning(f"⚠️ Lỗi khi lấy history từ LangChain memory: {e}")
+                    logger.warning(f"⚠️ Lỗi khi lấy history từ conversation store: {e}")
             
             # Fallback to old method
             chat_history = await self.a2a_client_manager.get_chat_history(user_id, session_id)
@@ -768,13 +1257,32 @@ class HostServer:
         
         # Also clear old method for cleanup
         await self.a2a_client_manager.clear_chat_history(user_id, session_id)
+        
+        try:
+            await self.product_index.clear(session_id, user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Lỗi khi xóa product index: {e}")
     
     def clear_chat_history_fallback(self, session_id: str):
         """Xóa chat history từ memory (cho backward compatibility)"""
         self.a2a_client_manager.clear_chat_history_fallback(session_id)
     
+    async def _backfill_session_index(self):
+        try:
+            report = await self.session_index.backfill()
+            if report["errors"]:
+                logger.warning(f"⚠️ Backfill session index có {len(report['errors'])} lỗi: {report['errors'][:3]}")
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi backfill session index: {e}")
+
     async def get_user_sessions(self, user_id: str):
-        """Lấy danh sách tất cả sessions của user (ưu tiên LangChain memory)"""
+        """Lấy danh sách tất cả sessions của user (session index, fallback SCAN khi index chưa backfill)"""
+        try:
+            if await self.session_index.is_ready():
+                return await self.session_index.all_sessions(user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Lỗi khi đọc session index: {e}")
+        
         if self.memory_manager:
             try:
                 sessions = await self.memory_manager.get_all_user_sessions(user_id)
@@ -786,11 +1294,75 @@ class HostServer:
         # Fallback to old method
         return await self.a2a_client_manager.get_user_sessions(user_id)
 
+    async def list_user_sessions(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Một trang sessions của user kèm metadata (mới hoạt động nhất trước)
+        
+        Session index: ZREVRANGEBYSCORE + một pipeline đọc metadata cho cả trang.
+        Index chưa sẵn sàng: fallback SCAN, trả về toàn bộ sessions (không phân trang)
+        """
+        if not await self.session_index.is_ready():
+            session_ids = await self.get_user_sessions(user_id)
+            entries, next_cursor, total = [(session_id, None) for session_id in session_ids], None, len(session_ids)
+        else:
+            entries, next_cursor = await self.session_index.list_sessions(user_id, limit=limit, cursor=cursor)
+            total = await self.session_index.count(user_id)
+        
+        redis_client = self.a2a_client_manager.redis_client
+        sessions_info = []
+        if entries and redis_client:
+            # Metadata + message cuối của cả trang trong một round trip (history mới và chat_history:* cũ)
+            pipe = redis_client.pipeline(transaction=False)
+            for session_id, _ in entries:
+                for prefix in (ConversationStore.KEY_PREFIX, "chat_history"):
+                    pipe.hgetall(f"{prefix}_meta:{user_id}:{session_id}")
+                    pipe.lindex(f"{prefix}:{user_id}:{session_id}", -1)
+            # Key định dạng cũ (JSON string, chỉ migrate khi được truy cập) -> LINDEX trả WRONGTYPE:
+            # không làm hỏng cả trang, coi như không có preview
+            results = await pipe.execute(raise_on_error=False)
+            results = [None if isinstance(result, Exception) else result for result in results]
+            
+            for index, (session_id, last_activity) in enumerate(entries):
+                meta, last_entry, legacy_meta, legacy_last_entry = results[4 * index:4 * index + 4]
+                meta = meta or legacy_meta or {}
+                preview = ""
+                try:
+                    last_message = json.loads(last_entry or legacy_last_entry or "null")
+                    if isinstance(last_message, dict):
+                        content = last_message.get("content", "")
+                        preview = content[:100] + "..." if len(content) > 100 else content
+                except (TypeError, ValueError):
+                    pass
+                sessions_info.append({
+                    "session_id": session_id,
+                    "created_at": meta.get("created_at"),
+                    "last_updated": meta.get("last_updated") or (datetime.fromtimestamp(last_activity).isoformat() if last_activity else None),
+                    "message_count": int(meta["message_count"]) if meta.get("message_count") else None,
+                    "last_message_preview": preview
+                })
+        else:
+            sessions_info = [{"session_id": session_id} for session_id, _ in entries]
+        
+        return {"sessions": sessions_info, "next_cursor": next_cursor, "total_sessions": total}
+
     async def cleanup(self):
         """Cleanup resources"""
         try:
+            if self._session_backfill_task:
+                self._session_backfill_task.cancel()
+            
+            # Flush conversation writes in-flight trước khi Redis/MySQL connection bị đóng
+            if self.memory_manager and self.memory_manager.summarizer:
+                await self.memory_manager.summarizer.aclose()
+            
+            if self.conversation_store:
+                await self.conversation_store.aclose()
+            
             await self.a2a_client_manager.cleanup()
             
+            if self.blob_store:
+                await self.blob_store.aclose()
+            
             # Cleanup MySQL connections
             if self.mysql_history:
                 await self.mysql_history.cleanup()
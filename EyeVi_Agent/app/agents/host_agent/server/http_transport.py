@@ -0,0 +1,188 @@
+"""
+HTTP Transport - Connection pool dùng chung cho các A2A agent clients (limits, keep-alive, HTTP/2, deadlines)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+def _http2_available() -> bool:
+    """HTTP/2 của httpx cần package `h2` (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class AgentTransportConfig:
+    """Cấu hình transport cho một agent"""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        http2: Optional[bool] = None
+    ):
+        self.max_connections = max_connections if max_connections is not None else int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = max_keepalive_connections if max_keepalive_connections is not None else int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+        self.keepalive_expiry = keepalive_expiry if keepalive_expiry is not None else float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+        self.connect_timeout = connect_timeout if connect_timeout is not None else float(os.getenv("AGENT_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = read_timeout if read_timeout is not None else float(os.getenv("AGENT_READ_TIMEOUT", "60"))
+        self.deadline = deadline if deadline is not None else float(os.getenv("AGENT_REQUEST_DEADLINE", "90"))
+        self.http2 = http2 if http2 is not None else os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        """Timeout mặc định cho mỗi request (read timeout áp dụng giữa các chunk khi streaming)"""
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout, pool=self.connect_timeout)
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+class _AgentPoolStats:
+    __slots__ = ("in_flight", "max_in_flight", "requests", "timeouts", "errors", "total_latency")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+class AgentTransportPool:
+    """
+    Quản lý httpx.AsyncClient dùng chung theo từng agent
+
+    - Mỗi agent một client với connection limits/keep-alive riêng, dùng chung cho card resolver,
+      A2A client và health check
+    - HTTP/2 được bật nếu có package h2 (httpx chỉ dùng HTTP/2 khi agent hỗ trợ qua ALPN/TLS,
+      agent http:// vẫn dùng HTTP/1.1 keep-alive)
+    - Deadline tổng cho mỗi request thay vì timeout=None
+    """
+
+    def __init__(self, default_config: Optional[AgentTransportConfig] = None):
+        self.default_config = default_config or AgentTransportConfig()
+        self._configs: Dict[str, AgentTransportConfig] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _AgentPoolStats] = {}
+        self._http2_supported = _http2_available()
+        if not self._http2_supported:
+            logger.info("ℹ️ Package h2 không có sẵn, A2A transport dùng HTTP/1.1 keep-alive")
+
+    def configure(self, agent_name: str, config: AgentTransportConfig):
+        """Đăng ký cấu hình transport cho agent (trước khi client được tạo)"""
+        self._configs[agent_name] = config
+
+    def get_config(self, agent_name: str) -> AgentTransportConfig:
+        return self._configs.get(agent_name, self.default_config)
+
+    def get_client(self, agent_name: str) -> httpx.AsyncClient:
+        """Lấy (hoặc tạo) httpx client của agent"""
+        client = self._clients.get(agent_name)
+        if client is None or client.is_closed:
+            config = self.get_config(agent_name)
+            client = httpx.AsyncClient(
+                timeout=config.timeout,
+                limits=config.limits,
+                http2=config.http2 and self._http2_supported
+            )
+            self._clients[agent_name] = client
+            self._stats.setdefault(agent_name, _AgentPoolStats())
+        return client
+
+    def timeout_for(self, agent_name: str) -> httpx.Timeout:
+        """Timeout per-request của agent (dùng cho http_kwargs của A2AClient)"""
+        return self.get_config(agent_name).timeout
+
+    def deadline_for(self, agent_name: str) -> float:
+        """Deadline tổng (giây) cho một request tới agent"""
+        return self.get_config(agent_name).deadline
+
+    @asynccontextmanager
+    async def track(self, agent_name: str) -> AsyncIterator[None]:
+        """Đo in-flight/latency/timeouts của một request tới agent (không áp deadline)"""
+        stats = self._stats.setdefault(agent_name, _AgentPoolStats())
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        stats.requests += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except (TimeoutError, httpx.TimeoutException):
+            stats.timeouts += 1
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.total_latency += time.perf_counter() - start
+
+    @asynccontextmanager
+    async def request(self, agent_name: str, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Bọc một request (không streaming) tới agent: áp deadline tổng và đo metrics
+
+        Raises:
+            TimeoutError: khi request vượt quá deadline
+        """
+        async with self.track(agent_name):
+            async with asyncio.timeout(deadline if deadline is not None else self.deadline_for(agent_name)):
+                yield
+
+    def _pool_connections(self, client: httpx.AsyncClient) -> Dict[str, int]:
+        """Đọc trạng thái connection pool của httpcore (best-effort, không phải public API)"""
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+        return {"open_connections": len(connections), "idle_connections": idle, "active_connections": len(connections) - idle}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool utilization theo từng agent"""
+        result = {}
+        for agent_name, stats in self._stats.items():
+            config = self.get_config(agent_name)
+            client = self._clients.get(agent_name)
+            agent_stats = {
+                "in_flight": stats.in_flight,
+                "max_in_flight": stats.max_in_flight,
+                "utilization": stats.in_flight / config.max_connections if config.max_connections else 0.0,
+                "requests": stats.requests,
+                "timeouts": stats.timeouts,
+                "errors": stats.errors,
+                "avg_latency_ms": (stats.total_latency / stats.requests * 1000) if stats.requests else 0.0,
+                "max_connections": config.max_connections,
+                "http2": config.http2 and self._http2_supported,
+                "read_timeout": config.read_timeout,
+                "deadline": config.deadline
+            }
+            if client is not None and not client.is_closed:
+                agent_stats.update(self._pool_connections(client))
+            result[agent_name] = agent_stats
+        return result
+
+    async def aclose(self):
+        """Đóng tất cả httpx clients"""
+        for agent_name, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi đóng HTTP client cho {agent_name}: {e}")
+        self._clients.clear()
@@ -0,0 +1,94 @@
+"""
+Incremental JSON - Trích xuất từng field top-level của JSON object ngay khi value của field đó hoàn tất (LLM streaming)
+"""
+
+import json
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class IncrementalJsonFieldExtractor:
+    """
+    Đọc output LLM theo từng chunk và trả về các field top-level đã hoàn tất
+
+    - Bỏ qua text trước dấu "{" đầu tiên (ví dụ ```json)
+    - Theo dõi string/escape và độ sâu {} [] để biết khi nào value của một field kết thúc
+      (gặp "," hoặc "}" ở depth 1), value được json.loads riêng
+    - Field có value không hợp lệ bị bỏ qua, caller vẫn parse toàn bộ output khi stream kết thúc
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._key_start = -1
+        self._key = None
+        self._value_start = -1
+
+    @property
+    def text(self) -> str:
+        """Toàn bộ output đã nhận"""
+        return self._text
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Nạp thêm một chunk, trả về các fields vừa hoàn tất trong chunk này"""
+        completed: Dict[str, Any] = {}
+        if not chunk or self.done:
+            self._text += chunk or ""
+            return completed
+
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start >= 0:
+                        self._key = json.loads(text[self._key_start:self._pos + 1])
+                        self._key_start = -1
+            elif not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = self._pos
+            elif ch == ":" and self._depth == 1 and self._key is not None and self._value_start < 0:
+                self._value_start = self._pos + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_field(text, completed)
+                    self.done = True
+                    self._pos += 1
+                    break
+            elif ch == "," and self._depth == 1:
+                self._complete_field(text, completed)
+            self._pos += 1
+        return completed
+
+    def _complete_field(self, text: str, completed: Dict[str, Any]):
+        if self._key is not None and self._value_start >= 0:
+            raw_value = text[self._value_start:self._pos].strip()
+            try:
+                value = json.loads(raw_value)
+                self.fields[self._key] = value
+                completed[self._key] = value
+            except ValueError:
+                logger.debug(f"Bỏ qua field không hợp lệ trong orchestrator stream: {self._key}")
+        self._key = None
+        self._value_start = -1
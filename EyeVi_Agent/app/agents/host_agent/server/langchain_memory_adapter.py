@@ -2,11 +2,9 @@
 LangChain Memory Adapter - Tích hợp LangChain memory với Redis backend
 """
 
-import asyncio
-import json
 import logging
+import os
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 
 import redis.asyncio as aioredis
 from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
@@ -16,104 +14,118 @@ from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import BaseMessage as CoreBaseMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from .memory_registry import MemoryRegistry
+from .conversation_store import ConversationStore, make_record, record_from_legacy
+from .conversation_summarizer import ConversationSummarizer
+
 logger = logging.getLogger(__name__)
 
+def _record_to_message(record: Dict[str, Any]) -> Optional[CoreBaseMessage]:
+    """Chuyển canonical record của ConversationStore thành LangChain message"""
+    if record.get("role") == "user":
+        # Ưu tiên clarified message (đã được orchestrator làm rõ), nếu không thì kèm tên file đính kèm
+        content = record.get("clarified_content") or record.get("content", "")
+        if not record.get("clarified_content") and record.get("files"):
+            content += f" [Đính kèm: {', '.join(record['files'])}]"
+        return HumanMessage(content=content)
+    elif record.get("role") == "assistant":
+        agent_used = record.get("agent_used")
+        return AIMessage(
+            content=record.get("content", ""),
+            additional_kwargs={"agent_used": agent_used} if agent_used else {}
+        )
+    return None
+
 class RedisChatMessageHistory(BaseChatMessageHistory):
     """
     LangChain-compatible chat history với Redis backend
+    
+    Đọc/ghi qua ConversationStore (LIST các canonical records, một pipeline mỗi turn).
+    Chỉ `max_loaded_messages` messages gần nhất được giữ trong process.
     """
     
-    def __init__(self, session_id: str, user_id: Optional[str] = None, redis_client: Optional[aioredis.Redis] = None):
+    def __init__(
+        self,
+        session_id: str,
+        user_id: Optional[str] = None,
+        redis_client: Optional[aioredis.Redis] = None,
+        max_loaded_messages: Optional[int] = None,
+        conversation_store: Optional[ConversationStore] = None
+    ):
         self.session_id = session_id
         self.user_id = user_id
         self.redis_client = redis_client
+        self.conversation_store = conversation_store or ConversationStore(redis_client=redis_client)
+        self.max_loaded_messages = max_loaded_messages if max_loaded_messages is not None else int(os.getenv("CHAT_HISTORY_LOAD_LIMIT", "100"))
         self._messages: List[CoreBaseMessage] = []
-        
-    def _get_redis_key(self) -> str:
-        """Tạo Redis key cho chat history"""
-        if self.user_id:
-            return f"langchain_history:{self.user_id}:{self.session_id}"
-        return f"langchain_history:anonymous:{self.session_id}"
     
     async def _load_messages(self):
-        """Load messages từ Redis"""
-        if not self.redis_client:
-            return
-            
-        try:
-            redis_key = self._get_redis_key()
-            data = await self.redis_client.get(redis_key)
-            if data:
-                messages_data = json.loads(data)
-                self._messages = []
-                for msg_data in messages_data:
-                    if msg_data["type"] == "human":
-                        self._messages.append(HumanMessage(content=msg_data["content"]))
-                    elif msg_data["type"] == "ai":
-                        self._messages.append(AIMessage(content=msg_data["content"]))
-        except Exception as e:
-            logger.error(f"❌ Lỗi khi load messages từ Redis: {e}")
+        """Load messages từ store (chỉ `max_loaded_messages` messages gần nhất)"""
+        self._messages = await self.aget_recent_messages(self.max_loaded_messages)
     
-    async def _save_messages(self):
-        """Save messages vào Redis"""
-        if not self.redis_client:
-            return
-            
-        try:
-            redis_key = self._get_redis_key()
-            messages_data = []
-            for msg in self._messages:
-                if isinstance(msg, HumanMessage):
-                    messages_data.append({"type": "human", "content": msg.content})
-                elif isinstance(msg, AIMessage):
-                    messages_data.append({"type": "ai", "content": msg.content})
-            
-            data = json.dumps(messages_data)
-            await self.redis_client.set(redis_key, data, ex=86400*7)  # Expire sau 7 ngày
-        except Exception as e:
-            logger.error(f"❌ Lỗi khi save messages vào Redis: {e}")
+    async def aget_recent_messages(self, limit: int) -> List[CoreBaseMessage]:
+        """Lấy `limit` messages gần nhất (LRANGE), không load toàn bộ history"""
+        records = await self.conversation_store.get_records(self.session_id, self.user_id, limit)
+        return [msg for msg in (_record_to_message(r) for r in records) if msg is not None]
+    
+    async def aflush(self):
+        """Chờ tất cả writes pending của session này hoàn tất"""
+        await self.conversation_store.flush(self.session_id, self.user_id)
     
     @property
     def messages(self) -> List[CoreBaseMessage]:
         """Get messages (sync property required by LangChain)"""
         return self._messages
     
+    def _trim_resident(self) -> None:
+        """Giữ tối đa `max_loaded_messages` messages trong process (history đầy đủ nằm trong store)"""
+        if len(self._messages) > self.max_loaded_messages:
+            del self._messages[:-self.max_loaded_messages]
+    
+    def add_records(self, records: List[Dict[str, Any]]) -> None:
+        """Thêm canonical records (vd: cả turn user + assistant) - một lần ghi vào store"""
+        for record in records:
+            msg = _record_to_message(record)
+            if msg is not None:
+                self._messages.append(msg)
+        self._trim_resident()
+        self.conversation_store.append_records(self.session_id, self.user_id, records)
+    
     def add_user_message(self, message: str) -> None:
         """Thêm user message"""
-        self._messages.append(HumanMessage(content=message))
-        # Schedule async save
-        asyncio.create_task(self._save_messages())
+        self.add_records([make_record("user", message, user_id=self.user_id)])
     
     def add_ai_message(self, message: str) -> None:
         """Thêm AI message"""
-        self._messages.append(AIMessage(content=message))
-        # Schedule async save
-        asyncio.create_task(self._save_messages())
+        self.add_records([make_record("assistant", message)])
     
     def clear(self) -> None:
         """Xóa tất cả messages"""
         self._messages.clear()
-        # Schedule async delete from Redis
-        if self.redis_client:
-            asyncio.create_task(self._delete_from_redis())
-    
-    async def _delete_from_redis(self):
-        """Delete messages từ Redis"""
-        try:
-            redis_key = self._get_redis_key()
-            await self.redis_client.delete(redis_key)
-        except Exception as e:
-            logger.error(f"❌ Lỗi khi delete messages từ Redis: {e}")
+        self.conversation_store.clear(self.session_id, self.user_id)
 
 class EnhancedMemoryManager:
     """
     Memory Manager sử dụng LangChain với Redis backend
+    
+    Memories resident trong process được giữ trong MemoryRegistry có giới hạn (LRU + idle TTL + bytes),
+    session bị evict sẽ được load lại từ ConversationStore ở lần truy cập sau.
+    Có llm: các turn cũ được ConversationSummarizer gộp vào rolling summary ở background.
     """
     
-    def __init__(self, redis_client: Optional[aioredis.Redis] = None, llm: Optional[Any] = None):
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        llm: Optional[Any] = None,
+        memory_registry: Optional[MemoryRegistry] = None,
+        conversation_store: Optional[ConversationStore] = None,
+        summarizer: Optional[ConversationSummarizer] = None
+    ):
         self.redis_client = redis_client
         self.llm = llm
-        self._memories: Dict[str, BaseChatMemory] = {}
+        self._memories = memory_registry or MemoryRegistry()
+        self.conversation_store = conversation_store or ConversationStore(redis_client=redis_client)
+        self.summarizer = summarizer or (ConversationSummarizer(self.conversation_store, llm) if llm else None)
     
     def _get_memory_key(self, session_id: str, user_id: Optional[str] = None) -> str:
         """Tạo memory key"""
@@ -139,15 +151,17 @@ class EnhancedMemoryManager:
         """
         memory_key = self._get_memory_key(session_id, user_id)
         
-        if memory_key not in self._memories:
-            # Tạo chat history với Redis backend
+        memory = self._memories.get(memory_key)
+        if memory is None:
+            # Tạo chat history với Redis backend (hoặc reload sau khi bị evict)
             chat_history = RedisChatMessageHistory(
                 session_id=session_id,
                 user_id=user_id,
-                redis_client=self.redis_client
+                redis_client=self.redis_client,
+                conversation_store=self.conversation_store
             )
             
-            # Load existing messages
+            # Load existing messages (store tự chờ writes pending nếu session vừa bị evict)
             await chat_history._load_messages()
             
             # Tạo memory dựa trên type
@@ -164,34 +178,66 @@ class EnhancedMemoryManager:
                     return_messages=True
                 )
             
-            self._memories[memory_key] = memory
+            self._memories.put(memory_key, memory)
         
-        return self._memories[memory_key]
+        return memory
     
     async def add_user_message(self, session_id: str, message: str, user_id: Optional[str] = None):
         """Thêm user message vào memory"""
         memory = await self.get_memory(session_id, user_id)
         memory.chat_memory.add_user_message(message)
+        self._memories.refresh(self._get_memory_key(session_id, user_id))
     
     async def add_ai_message(self, session_id: str, message: str, user_id: Optional[str] = None):
         """Thêm AI message vào memory"""
         memory = await self.get_memory(session_id, user_id)
         memory.chat_memory.add_ai_message(message)
+        self._memories.refresh(self._get_memory_key(session_id, user_id))
+    
+    async def add_turn(self, session_id: str, records: List[Dict[str, Any]], user_id: Optional[str] = None):
+        """Thêm cả turn (canonical records user + assistant) vào memory - một lần ghi vào store"""
+        memory = await self.get_memory(session_id, user_id)
+        memory.chat_memory.add_records(records)
+        self._memories.refresh(self._get_memory_key(session_id, user_id))
+        if self.summarizer:
+            self.summarizer.schedule(session_id, user_id)
     
     async def get_conversation_context(
         self, 
         session_id: str, 
         user_id: Optional[str] = None,
-        max_messages: int = 10
+        max_messages: int = 10,
+        max_chars_per_message: Optional[int] = None
     ) -> str:
-        """Lấy context từ conversation history"""
+        """
+        Lấy context từ conversation history
+        
+        Có summarizer: context = rolling summary + các messages chưa được tóm tắt (bỏ qua max_messages),
+        kích thước không tăng theo độ dài session
+        max_chars_per_message: rút gọn response của assistant (ví dụ khi products đã có trong product index)
+        """
         try:
-            memory = await self.get_memory(session_id, user_id)
+            summary = ""
+            if self.summarizer and self.summarizer.enabled:
+                summary, max_messages = await self.summarizer.get_context_state(session_id, user_id)
+                if max_messages <= 0:
+                    return f"Tóm tắt hội thoại trước đó: {summary}" if summary else ""
             
-            # Lấy messages gần đây
-            messages = memory.chat_memory.messages[-max_messages:] if memory.chat_memory.messages else []
+            memory = self._memories.get(self._get_memory_key(session_id, user_id))
+            if memory is not None:
+                # Lấy messages gần đây từ memory đã load
+                messages = memory.chat_memory.messages[-max_messages:] if memory.chat_memory.messages else []
+            else:
+                # Chỉ đọc N entries cuối từ Redis list, không load toàn bộ history
+                chat_history = RedisChatMessageHistory(
+                    session_id=session_id,
+                    user_id=user_id,
+                    redis_client=self.redis_client,
+                    conversation_store=self.conversation_store
+                )
+                messages = await chat_history.aget_recent_messages(max_messages)
             
-            context_parts = []
+            context_parts = [f"Tóm tắt hội thoại trước đó: {summary}"] if summary else []
             for msg in messages:
                 if isinstance(msg, HumanMessage):
                     context_parts.append(f"User: {msg.content}")
@@ -202,7 +248,10 @@ class EnhancedMemoryManager:
                         agent_used = msg.additional_kwargs.get('agent_used')
                         if agent_used:
                             agent_info = f" ({agent_used})"
-                    context_parts.append(f"Assistant{agent_info}: {msg.content}")
+                    content = msg.content
+                    if max_chars_per_message and len(content) > max_chars_per_message:
+                        content = content[:max_chars_per_message] + "..."
+                    context_parts.append(f"Assistant{agent_info}: {content}")
             
             return "\n".join(context_parts)
             
@@ -217,10 +266,17 @@ class EnhancedMemoryManager:
     
     async def clear_memory(self, session_id: str, user_id: Optional[str] = None):
         """Xóa memory cho session"""
-        memory_key = self._get_memory_key(session_id, user_id)
-        if memory_key in self._memories:
-            self._memories[memory_key].clear()
-            del self._memories[memory_key]
+        if self.summarizer:
+            await self.summarizer.clear(session_id, user_id)
+        memory = self._memories.pop(self._get_memory_key(session_id, user_id))
+        if memory is not None:
+            memory.clear()
+        else:
+            self.conversation_store.clear(session_id, user_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Gauges của memory registry (resident sessions, bytes, evictions)"""
+        return self._memories.get_stats()
     
     async def get_all_user_sessions(self, user_id: str) -> List[str]:
         """Lấy tất cả sessions của user từ Redis"""
@@ -253,12 +309,55 @@ async def migrate_chat_history_to_langchain(
     """
     try:
         if hasattr(old_chat_history, 'messages'):
-            for msg in old_chat_history.messages:
-                if msg.get("role") == "user":
-                    await memory_manager.add_user_message(session_id, msg["content"], user_id)
-                elif msg.get("role") == "assistant":
-                    await memory_manager.add_ai_message(session_id, msg["content"], user_id)
+            records = [r for r in (record_from_legacy(msg) for msg in old_chat_history.messages) if r]
+            
+            # Append một lần (một pipeline round trip) thay vì từng message
+            await memory_manager.add_turn(session_id, records, user_id)
         
         logger.info(f"✅ Migrated chat history for session {session_id}")
     except Exception as e:
-        logger.error(f"❌ Error migrating chat history: {e}") 
\ No newline at end of file
+        logger.error(f"❌ Error migrating chat history: {e}")
+
+async def migrate_json_histories_to_lists(
+    redis_client: aioredis.Redis,
+    patterns: Optional[List[str]] = None,
+    dry_run: bool = True
+) -> Dict[str, Any]:
+    """
+    One-time migration: chuyển tất cả chat history dạng JSON string sang Redis list
+    
+    Args:
+        redis_client: Redis client (decode_responses=True)
+        patterns: Các key patterns cần migrate (mặc định langchain_history:* và chat_history:*)
+        dry_run: Chỉ đếm, không ghi
+    """
+    patterns = patterns or ["langchain_history:*", "chat_history:*"]
+    report = {"found_keys": 0, "migrated_keys": 0, "errors": [], "dry_run": dry_run}
+    
+    for pattern in patterns:
+        cursor = 0
+        while True:
+            cursor, keys = await redis_client.scan(cursor=cursor, match=pattern, count=1000)
+            for key in keys:
+                try:
+                    if await redis_client.type(key) != "string":
+                        continue
+                    report["found_keys"] += 1
+                    if dry_run:
+                        continue
+                    
+                    if key.startswith(f"{ConversationStore.KEY_PREFIX}:"):
+                        migrated = await ConversationStore(redis_client=redis_client).migrate_legacy_key(key)
+                    else:
+                        # chat_history:{user}:{session} - format ChatHistory của A2AClientManager
+                        from .a2a_client_manager import migrate_chat_history_key
+                        migrated = await migrate_chat_history_key(redis_client, key)
+                    
+                    if migrated:
+                        report["migrated_keys"] += 1
+                except Exception as e:
+                    report["errors"].append(f"Error migrating {key}: {str(e)}")
+            if cursor == 0:
+                break
+    
+    return report
@@ -0,0 +1,159 @@
+"""
+Memory Registry - LRU/TTL registry có giới hạn cho các session memory đang resident trong host
+"""
+
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Overhead ước lượng cho mỗi message object (BaseMessage + dict fields)
+MESSAGE_OVERHEAD_BYTES = 400
+
+def estimate_memory_bytes(memory: Any) -> int:
+    """Ước lượng số bytes của một ConversationBufferMemory (dựa trên message list)"""
+    chat_memory = getattr(memory, "chat_memory", None)
+    messages = getattr(chat_memory, "messages", None) or []
+    total = 0
+    for msg in messages:
+        content = getattr(msg, "content", "")
+        total += sys.getsizeof(content if isinstance(content, str) else str(content)) + MESSAGE_OVERHEAD_BYTES
+    return total
+
+class _MemoryEntry:
+    __slots__ = ("memory", "last_access", "size_bytes")
+
+    def __init__(self, memory: Any, size_bytes: int):
+        self.memory = memory
+        self.last_access = time.monotonic()
+        self.size_bytes = size_bytes
+
+class MemoryRegistry:
+    """
+    Registry session memory có giới hạn
+
+    - LRU theo số entries (max_entries)
+    - Evict các session idle quá idle_ttl giây
+    - Giới hạn tổng bytes ước lượng (max_bytes, 0 = không giới hạn)
+    Redis là source of truth: session bị evict sẽ được load lại qua _load_messages khi cần.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        idle_ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else int(os.getenv("MEMORY_IDLE_TTL", "1800"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("MEMORY_MAX_BYTES", str(128 * 1024 * 1024)))
+        self._entries: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self._total_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions: Dict[str, int] = {"capacity": 0, "idle": 0, "bytes": 0}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> Optional[_MemoryEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+        return entry
+
+    def _is_expired(self, entry: _MemoryEntry, now: float) -> bool:
+        return self.idle_ttl > 0 and now - entry.last_access > self.idle_ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """Lấy memory và đánh dấu vừa được truy cập (None nếu chưa có hoặc đã idle quá TTL)"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or self._is_expired(entry, now):
+            if entry is not None:
+                self._remove(key)
+                self.evictions["idle"] += 1
+            self.misses += 1
+            return None
+
+        entry.last_access = now
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.memory
+
+    def put(self, key: str, memory: Any):
+        """Thêm memory vào registry, evict các entries cũ nếu vượt giới hạn"""
+        self._remove(key)
+        entry = _MemoryEntry(memory, estimate_memory_bytes(memory))
+        self._entries[key] = entry
+        self._total_bytes += entry.size_bytes
+        self._enforce_limits()
+
+    def refresh(self, key: str):
+        """Cập nhật lại byte estimate sau khi memory có thêm messages"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        size_bytes = estimate_memory_bytes(entry.memory)
+        self._total_bytes += size_bytes - entry.size_bytes
+        entry.size_bytes = size_bytes
+        self._enforce_limits()
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Xóa memory khỏi registry"""
+        entry = self._remove(key)
+        return entry.memory if entry is not None else None
+
+    def evict_expired(self) -> int:
+        """Evict các sessions idle quá TTL (OrderedDict theo thứ tự truy cập nên chỉ cần duyệt từ đầu)"""
+        now = time.monotonic()
+        evicted = 0
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._remove(key)
+            evicted += 1
+        self.evictions["idle"] += evicted
+        return evicted
+
+    def _enforce_limits(self):
+        self.evict_expired()
+        # Luôn giữ lại entry vừa truy cập (cuối OrderedDict)
+        while len(self._entries) > max(self.max_entries, 1):
+            self._remove(next(iter(self._entries)))
+            self.evictions["capacity"] += 1
+        while self.max_bytes > 0 and self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions["bytes"] += 1
+
+    def clear(self):
+        """Xóa toàn bộ registry"""
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Gauges cho số session resident, bytes ước lượng và evictions"""
+        self.evict_expired()
+        lookups = self.hits + self.misses
+        return {
+            "resident_sessions": len(self._entries),
+            "resident_bytes_estimate": self._total_bytes,
+            "max_entries": self.max_entries,
+            "idle_ttl": self.idle_ttl,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "reloads": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": dict(self.evictions),
+            "total_evictions": sum(self.evictions.values())
+        }
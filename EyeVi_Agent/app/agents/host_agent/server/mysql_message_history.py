@@ -25,9 +25,18 @@ class SenderType(Enum):
     SEARCH_AGENT = "search_agent"
     ORDER_AGENT = "order_agent"
 
+INSERT_MESSAGE_QUERY = """
+    INSERT INTO message_history 
+    (session_id, user_id, sender_type, message_content, metadata)
+    VALUES (:session_id, :user_id, :sender_type, :message_content, :metadata)
+"""
+
 class MySQLMessageHistory:
     """
     Manager để save messages vào MySQL real-time
+    
+    Mặc định dùng write-behind queue: save_user_message/save_agent_message chỉ enqueue,
+    một background task flush thành multi-row INSERT khi đủ batch hoặc hết flush interval.
     """
     
     def __init__(self):
@@ -36,6 +45,24 @@ class MySQLMessageHistory:
         self.async_session = None
         self.connection_pool = None
         
+        # Write-behind config
+        self.write_behind_enabled = os.getenv("MYSQL_WRITE_BEHIND", "true").lower() == "true"
+        self.batch_size = int(os.getenv("MYSQL_WRITE_BATCH_SIZE", "50"))
+        self.flush_interval = float(os.getenv("MYSQL_WRITE_FLUSH_INTERVAL", "1.0"))
+        self.max_queue_size = int(os.getenv("MYSQL_WRITE_MAX_QUEUE", "10000"))
+        self.spill_file = os.getenv("MYSQL_SPILL_FILE") or None
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # Write-behind metrics
+        self.enqueued_count = 0
+        self.flushed_rows = 0
+        self.flush_batches = 0
+        self.spilled_rows = 0
+        self.replayed_rows = 0
+        self.dropped_rows = 0
+        
         # MySQL config từ environment
         self.mysql_config = {
             "host": os.getenv("MYSQL_HOST", "localhost"),
@@ -76,6 +103,15 @@ class MySQLMessageHistory:
             # Test connection
             await self._test_connection()
             
+            # Khởi động write-behind queue
+            if self.write_behind_enabled:
+                self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+                self._flush_task = asyncio.create_task(self._flush_loop())
+                logger.info(
+                    f"✅ MySQL write-behind enabled (batch={self.batch_size}, "
+                    f"interval={self.flush_interval}s, max_queue={self.max_queue_size})"
+                )
+            
             logger.info("✅ MySQL Message History initialized successfully")
             
         except Exception as e:
@@ -108,36 +144,22 @@ class MySQLMessageHistory:
             metadata: Thông tin bổ sung (optional)
             
         Returns:
-            ID của message đã save, hoặc None nếu fail
+            ID của message đã save, hoặc None nếu fail hoặc đang ở chế độ write-behind
         """
         if not self.async_session:
             logger.error("❌ MySQL not initialized")
             return None
         
         try:
-            # Validate sender_type
-            if sender_type not in [e.value for e in SenderType]:
-                logger.warning(f"⚠️ Invalid sender_type: {sender_type}, defaulting to host_agent")
-                sender_type = SenderType.HOST_AGENT.value
-            
-            # Prepare metadata JSON
-            metadata_json = json.dumps(metadata) if metadata else None
+            row = self._build_row(session_id, sender_type, message_content, user_id, metadata)
             
-            # Insert query
-            insert_query = text("""
-                INSERT INTO message_history 
-                (session_id, user_id, sender_type, message_content, metadata)
-                VALUES (:session_id, :user_id, :sender_type, :message_content, :metadata)
-            """)
+            # Write-behind: chỉ enqueue, không tốn round trip trên request path
+            if self._queue is not None:
+                self._enqueue(row)
+                return None
             
             async with self.async_session() as session:
-                result = await session.execute(insert_query, {
-                    "session_id": session_id,
-                    "user_id": user_id,
-                    "sender_type": sender_type,
-                    "message_content": message_content,
-                    "metadata": metadata_json
-                })
+                result = await session.execute(text(INSERT_MESSAGE_QUERY), row)
                 
                 await session.commit()
                 
@@ -155,6 +177,159 @@ class MySQLMessageHistory:
             logger.error(f"❌ Failed to save message to MySQL: {e}")
             return None
     
+    def _build_row(
+        self,
+        session_id: str,
+        sender_type: str,
+        message_content: str,
+        user_id: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Chuẩn bị params cho INSERT message_history"""
+        # Validate sender_type
+        if sender_type not in [e.value for e in SenderType]:
+            logger.warning(f"⚠️ Invalid sender_type: {sender_type}, defaulting to host_agent")
+            sender_type = SenderType.HOST_AGENT.value
+        
+        return {
+            "session_id": session_id,
+            "user_id": user_id,
+            "sender_type": sender_type,
+            "message_content": message_content,
+            # Prepare metadata JSON
+            "metadata": json.dumps(metadata) if metadata else None
+        }
+    
+    def _enqueue(self, row: Dict[str, Any]):
+        """Đưa row vào write-behind queue (bounded), spill/drop khi queue đầy"""
+        try:
+            self._queue.put_nowait(row)
+            self.enqueued_count += 1
+        except asyncio.QueueFull:
+            if self.spill_file:
+                self._spill([row])
+            else:
+                self.dropped_rows += 1
+                logger.warning("⚠️ MySQL write-behind queue đầy, bỏ qua message")
+    
+    async def _flush_loop(self):
+        """Background task: gom rows thành batch theo size hoặc thời gian rồi flush"""
+        loop = asyncio.get_running_loop()
+        while True:
+            row = await self._queue.get()
+            if row is None:
+                break
+            
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            closing = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    closing = True
+                    break
+                batch.append(row)
+            
+            await self._write_batch(batch)
+            if closing:
+                break
+        
+        # Drain phần còn lại khi shutdown
+        remaining = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                remaining.append(row)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._write_batch(remaining[i:i + self.batch_size])
+    
+    async def _write_batch(self, rows: List[Dict[str, Any]]) -> bool:
+        """Ghi một batch bằng multi-row INSERT trong một transaction"""
+        if not rows:
+            return True
+        
+        try:
+            async with self.async_session() as session:
+                # executemany -> aiomysql gộp thành một INSERT ... VALUES (...), (...)
+                await session.execute(text(INSERT_MESSAGE_QUERY), rows)
+                await session.commit()
+            
+            self.flushed_rows += len(rows)
+            self.flush_batches += 1
+            logger.debug(f"💾 Flushed {len(rows)} messages to MySQL")
+            
+            # MySQL đã hoạt động lại -> replay các rows đã spill
+            if self.spill_file and os.path.exists(self.spill_file) and os.path.getsize(self.spill_file) > 0:
+                await self._replay_spill()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to flush {len(rows)} messages to MySQL: {e}")
+            if self.spill_file:
+                self._spill(rows)
+            else:
+                self.dropped_rows += len(rows)
+            return False
+    
+    def _spill(self, rows: List[Dict[str, Any]]):
+        """Ghi rows ra file local (JSON lines) khi MySQL không khả dụng"""
+        try:
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.spilled_rows += len(rows)
+            logger.warning(f"📝 Spilled {len(rows)} messages to {self.spill_file}")
+        except Exception as e:
+            self.dropped_rows += len(rows)
+            logger.error(f"❌ Failed to spill messages to {self.spill_file}: {e}")
+    
+    async def _replay_spill(self):
+        """Đọc lại spill file và ghi vào MySQL"""
+        replay_path = f"{self.spill_file}.replay"
+        try:
+            os.replace(self.spill_file, replay_path)
+            with open(replay_path, "r", encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            os.remove(replay_path)
+        except Exception as e:
+            logger.error(f"❌ Failed to read spill file {self.spill_file}: {e}")
+            return
+        
+        logger.info(f"🔁 Replaying {len(rows)} spilled messages to MySQL")
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            try:
+                async with self.async_session() as session:
+                    await session.execute(text(INSERT_MESSAGE_QUERY), batch)
+                    await session.commit()
+                self.replayed_rows += len(batch)
+            except Exception as e:
+                logger.error(f"❌ Failed to replay spilled messages: {e}")
+                self._spill(rows[i:])
+                return
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê write-behind queue"""
+        return {
+            "write_behind": self._queue is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "enqueued": self.enqueued_count,
+            "flushed_rows": self.flushed_rows,
+            "flush_batches": self.flush_batches,
+            "spilled_rows": self.spilled_rows,
+            "replayed_rows": self.replayed_rows,
+            "dropped_rows": self.dropped_rows
+        }
+    
     async def save_user_message(
         self,
         session_id: str,
@@ -304,7 +479,19 @@ class MySQLMessageHistory:
             return []
     
     async def cleanup(self):
-        """Cleanup connections"""
+        """Cleanup connections (drain write-behind queue trước khi đóng)"""
+        if self._flush_task:
+            try:
+                # Sentinel để flush loop drain phần còn lại rồi dừng
+                await self._queue.put(None)
+                await self._flush_task
+                logger.info(f"✅ MySQL write-behind queue drained ({self.flushed_rows} rows flushed)")
+            except Exception as e:
+                logger.error(f"❌ Error draining MySQL write-behind queue: {e}")
+            finally:
+                self._flush_task = None
+                self._queue = None
+        
         try:
             if self.engine:
                 await self.engine.dispose()
@@ -0,0 +1,281 @@
+"""
+Session Product Index - Lưu products (structured data) mà agents đã trả về trong session,
+cung cấp bảng sản phẩm gọn cho orchestrator và resolve tham chiếu thứ tự ("cái thứ hai") không cần LLM
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, Any, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from .text_utils import fold_accents
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_INDEX_TTL_SECONDS = 86400 * 7  # Cùng TTL với conversation history
+
+# Field đặc biệt trong HASH: danh sách product ID theo thứ tự của kết quả gần nhất
+_LAST_RESULTS_FIELD = "__last__"
+
+_ORDINAL_WORDS = {
+    "nhat": 1, "mot": 1, "nhi": 2, "hai": 2, "ba": 3, "bon": 4, "tu": 4, "nam": 5,
+    "sau": 6, "bay": 7, "tam": 8, "chin": 9, "muoi": 10
+}
+
+_HEAD_NOUNS = r"(?:cai|chiec|mau|san pham|sp|kinh|gong|loai|lua chon)"
+
+# Chạy trên message đã bỏ dấu (cùng độ dài với message gốc, xem _fold_aligned)
+# Bắt buộc có danh từ đứng trước ("cái thứ hai", không phải "thử hai mẫu");
+# "sản phẩm số 5" là product ID theo quy ước của FastPathRouter nên không coi là thứ tự;
+# "cuối" đứng một mình không tính khi là mốc thời gian ("kính cuối tuần này có giảm giá không")
+_TIME_WORDS = r"(?:tuan|thang|nam|ngay|ky|gio)"
+_ORDINAL_RE = re.compile(
+    rf"\b{_HEAD_NOUNS}\s+thu\s+(?P<number>{'|'.join(_ORDINAL_WORDS)}|\d{{1,2}})\b"
+    rf"|\b{_HEAD_NOUNS}\s+(?P<edge>dau tien|cuoi cung|cuoi(?!\s+{_TIME_WORDS}\b))\b"
+)
+
+def _fold_aligned(text: str) -> str:
+    """Bỏ dấu + lowercase từng ký tự, giữ nguyên độ dài để map vị trí match về message gốc"""
+    return "".join((fold_accents(ch) or ch)[0] for ch in text)
+
+def _product_id(product: Dict[str, Any]) -> Optional[str]:
+    product_id = product.get("product_id", product.get("id"))
+    return str(product_id) if product_id not in (None, "") else None
+
+class SessionProductIndex:
+    """
+    Index sản phẩm theo session
+
+    Storage layout:
+        session_products:{user}:{session} -> HASH
+            {product_id} -> JSON {id, name, brand, price, agent, seen_at}
+            __last__     -> JSON list product ID theo thứ tự kết quả gần nhất (vị trí #1, #2, ...)
+    - Mỗi lần agent trả về products: một pipeline HSET + EXPIRE, giữ tối đa max_products sản phẩm mới nhất
+    - Không có Redis: fallback lưu in-memory
+    """
+
+    KEY_PREFIX = "session_products"
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        max_products: Optional[int] = None,
+        context_rows: Optional[int] = None,
+        assistant_context_chars: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.redis_client = redis_client
+        self.max_products = max_products if max_products is not None else int(os.getenv("PRODUCT_INDEX_MAX_PRODUCTS", "50"))
+        self.context_rows = context_rows if context_rows is not None else int(os.getenv("PRODUCT_INDEX_CONTEXT_ROWS", "15"))
+        self.assistant_context_chars = assistant_context_chars if assistant_context_chars is not None else int(os.getenv("PRODUCT_INDEX_ASSISTANT_CONTEXT_CHARS", "300"))
+        self.enabled = enabled if enabled is not None else os.getenv("PRODUCT_INDEX_ENABLED", "true").lower() == "true"
+        self._local: Dict[str, Dict[str, str]] = {}
+
+        # Metrics
+        self.recorded_results = 0
+        self.recorded_products = 0
+        self.ordinal_resolved = 0
+        self.ordinal_unresolved = 0
+        self.tables_rendered = 0
+        self.errors = 0
+
+    def _get_key(self, session_id: str, user_id: Optional[str] = None) -> str:
+        return f"{self.KEY_PREFIX}:{user_id or 'anonymous'}:{session_id}"
+
+    async def _load(self, key: str) -> Dict[str, str]:
+        if self.redis_client:
+            return await self.redis_client.hgetall(key) or {}
+        return dict(self._local.get(key, {}))
+
+    async def record_products(
+        self,
+        session_id: Optional[str],
+        user_id: Optional[str],
+        products: Any,
+        agent_name: Optional[str] = None,
+        list_result: bool = True
+    ):
+        """
+        Lưu danh sách products agent vừa trả về
+
+        list_result=True: đây là một danh sách kết quả (search), thứ tự trong list thành vị trí #1, #2, ...
+        của kết quả gần nhất; False (ví dụ chi tiết một sản phẩm) chỉ thêm products, giữ nguyên vị trí cũ
+        """
+        if not self.enabled or not session_id or not isinstance(products, list):
+            return
+
+        entries: Dict[str, str] = {}
+        ordered_ids: List[str] = []
+        now = time.time()
+        for product in products:
+            if not isinstance(product, dict):
+                continue
+            product_id = _product_id(product)
+            if not product_id or product_id in entries:
+                continue
+            entries[product_id] = json.dumps({
+                "id": product_id,
+                "name": product.get("name"),
+                "brand": product.get("brand"),
+                "price": product.get("price"),
+                "agent": agent_name,
+                "seen_at": now
+            }, ensure_ascii=False)
+            ordered_ids.append(product_id)
+        if not entries:
+            return
+
+        key = self._get_key(session_id, user_id)
+        mapping = {**entries, _LAST_RESULTS_FIELD: json.dumps(ordered_ids)} if list_result else entries
+        try:
+            if self.redis_client:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, PRODUCT_INDEX_TTL_SECONDS)
+                pipe.hlen(key)
+                _, _, size = await pipe.execute()
+            else:
+                self._local.setdefault(key, {}).update(mapping)
+                size = len(self._local[key])
+
+            # size có thể gồm cả field __last__
+            if size - 1 > self.max_products:
+                await self._trim(key)
+
+            self.recorded_results += 1
+            self.recorded_products += len(entries)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Lỗi khi lưu product index cho session {session_id}: {e}")
+
+    async def _trim(self, key: str):
+        """Giữ max_products sản phẩm mới nhất (không xóa sản phẩm của kết quả gần nhất)"""
+        stored = await self._load(key)
+        last_ids = set(json.loads(stored.get(_LAST_RESULTS_FIELD) or "[]"))
+        products = []
+        for field, value in stored.items():
+            if field == _LAST_RESULTS_FIELD or field in last_ids:
+                continue
+            products.append((json.loads(value).get("seen_at", 0), field))
+        keep = max(self.max_products - len(last_ids), 0)
+        stale = [field for _, field in sorted(products, reverse=True)[keep:]]
+        if not stale:
+            return
+        if self.redis_client:
+            await self.redis_client.hdel(key, *stale)
+        else:
+            for field in stale:
+                self._local[key].pop(field, None)
+
+    async def get_products(self, session_id: Optional[str], user_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Returns:
+            (products của kết quả gần nhất theo vị trí, các products đã xem trước đó - mới nhất trước)
+        """
+        if not self.enabled or not session_id:
+            return [], []
+        try:
+            stored = await self._load(self._get_key(session_id, user_id))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Lỗi khi đọc product index cho session {session_id}: {e}")
+            return [], []
+
+        last_ids = json.loads(stored.pop(_LAST_RESULTS_FIELD, None) or "[]")
+        products = {field: json.loads(value) for field, value in stored.items()}
+        last_results = [products[product_id] for product_id in last_ids if product_id in products]
+        earlier = sorted(
+            (product for product_id, product in products.items() if product_id not in set(last_ids)),
+            key=lambda product: product.get("seen_at", 0),
+            reverse=True
+        )
+        return last_results, earlier
+
+    def format_table(self, last_results: List[Dict[str, Any]], earlier: List[Dict[str, Any]]) -> str:
+        """Bảng sản phẩm gọn cho orchestrator prompt (tối đa context_rows dòng)"""
+        if not last_results and not earlier:
+            return ""
+
+        def _row(product: Dict[str, Any]) -> str:
+            columns = [f"ID: {product['id']}", product.get("name") or "?"]
+            if product.get("brand"):
+                columns.append(str(product["brand"]))
+            if product.get("price") not in (None, ""):
+                columns.append(f"Giá: {product['price']}")
+            return " | ".join(columns)
+
+        lines = []
+        rows = self.context_rows
+        if last_results:
+            lines.append("Kết quả gần nhất (theo thứ tự hiển thị):")
+            for position, product in enumerate(last_results[:rows], 1):
+                lines.append(f"#{position} | {_row(product)}")
+            rows -= min(len(last_results), rows)
+        if earlier and rows > 0:
+            lines.append("Đã xem trước đó:")
+            for product in earlier[:rows]:
+                lines.append(f"- {_row(product)}")
+        self.tables_rendered += 1
+        return "\n".join(lines)
+
+    def resolve_ordinals(self, message: str, last_results: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Thay tham chiếu thứ tự ("cái thứ hai", "mẫu thứ 3", "cái cuối cùng") bằng sản phẩm cụ thể
+        trong kết quả gần nhất
+
+        Returns:
+            (message đã thay thế, products đã resolve); message giữ nguyên nếu không có tham chiếu hợp lệ
+        """
+        if not self.enabled or not message:
+            return message, []
+
+        message = unicodedata.normalize("NFC", message)
+        folded = _fold_aligned(message)
+        resolved: List[Dict[str, Any]] = []
+        parts: List[str] = []
+        cursor = 0
+        for match in _ORDINAL_RE.finditer(folded):
+            if match.group("number"):
+                number = match.group("number")
+                position = int(number) if number.isdigit() else _ORDINAL_WORDS[number]
+            else:
+                position = 1 if match.group("edge") == "dau tien" else len(last_results)
+
+            if not 1 <= position <= len(last_results):
+                self.ordinal_unresolved += 1
+                continue
+
+            product = last_results[position - 1]
+            parts.append(message[cursor:match.start()])
+            parts.append(f"sản phẩm {product.get('name') or ''} (ID: {product['id']})".replace("  ", " "))
+            cursor = match.end()
+            resolved.append(product)
+
+        if not resolved:
+            return message, []
+        parts.append(message[cursor:])
+        self.ordinal_resolved += len(resolved)
+        return "".join(parts), resolved
+
+    async def clear(self, session_id: str, user_id: Optional[str] = None):
+        key = self._get_key(session_id, user_id)
+        if self.redis_client:
+            await self.redis_client.delete(key)
+        self._local.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": "redis" if self.redis_client else "memory",
+            "recorded_results": self.recorded_results,
+            "recorded_products": self.recorded_products,
+            "ordinal_resolved": self.ordinal_resolved,
+            "ordinal_unresolved": self.ordinal_unresolved,
+            "tables_rendered": self.tables_rendered,
+            "errors": self.errors
+        }
@@ -4,11 +4,31 @@ Redis Performance Optimizations - Cải thiện performance cho Redis operations
 
 import asyncio
 import logging
-from typing import List, Set, Optional, AsyncGenerator
+import time
+from typing import Dict, Any, List, Set, Optional, AsyncGenerator
 import redis.asyncio as aioredis
 
 logger = logging.getLogger(__name__)
 
+class OpsRateLimiter:
+    """
+    Giới hạn số Redis commands mỗi giây cho các background jobs (không ảnh hưởng latency của live chat)
+    """
+    
+    def __init__(self, ops_per_second: Optional[float] = None):
+        self.ops_per_second = ops_per_second or 0
+        self._next_slot = time.monotonic()
+    
+    async def acquire(self, ops: int):
+        """Chờ đến khi được phép gửi thêm `ops` commands"""
+        if self.ops_per_second <= 0 or ops <= 0:
+            return
+        now = time.monotonic()
+        start = max(self._next_slot, now)
+        self._next_slot = start + ops / self.ops_per_second
+        if start > now:
+            await asyncio.sleep(start - now)
+
 class OptimizedRedisClient:
     """
     Wrapper cho Redis client với các optimizations
@@ -115,33 +135,67 @@ class OptimizedRedisClient:
             logger.error(f"❌ Lỗi khi batch delete Redis keys: {e}")
             return 0
     
-    async def cleanup_expired_sessions(self, pattern: str, ttl_threshold: int = 86400) -> int:
+    async def cleanup_expired_sessions(
+        self,
+        pattern: str,
+        ttl_threshold: int = 86400,
+        max_ops_per_second: Optional[float] = None,
+        checkpoint_key: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> int:
         """
         Cleanup các sessions đã expired hoặc cũ
+        
+        - Mỗi trang SCAN (count=batch_size): TTL của cả trang trong một pipeline,
+          UNLINK (giải phóng memory ở background thread của Redis) + checkpoint trong pipeline thứ hai
+        - max_ops_per_second: trần số Redis commands mỗi giây (None/0 = không giới hạn)
+        - checkpoint_key: HASH lưu SCAN cursor sau mỗi trang, lần chạy sau (kể cả sau restart) tiếp tục từ cursor đó;
+          trang đang xử lý dở khi bị cancel được chạy lại (idempotent)
         """
+        batch_size = batch_size or self._pipeline_batch_size
+        limiter = OpsRateLimiter(max_ops_per_second)
+        stats = stats if stats is not None else {}
         cleaned_count = 0
-        keys_to_delete = []
         
-        async for key in self.scan_keys_by_pattern(pattern):
-            try:
-                ttl = await self.redis_client.ttl(key)
-                # Nếu key không có TTL hoặc TTL quá nhỏ, đánh dấu để xóa
-                if ttl == -1 or (ttl > 0 and ttl < ttl_threshold):
-                    keys_to_delete.append(key)
-                    
-                    # Batch delete when we have enough keys
-                    if len(keys_to_delete) >= self._pipeline_batch_size:
-                        deleted = await self.batch_delete(keys_to_delete)
-                        cleaned_count += deleted
-                        keys_to_delete.clear()
-                        
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi check TTL cho key {key}: {e}")
+        cursor = 0
+        if checkpoint_key:
+            checkpoint = await self.redis_client.hgetall(checkpoint_key) or {}
+            cursor = int(checkpoint.get("cursor", 0))
+            if cursor:
+                logger.info(f"🧹 Tiếp tục cleanup {pattern} từ checkpoint (cursor={cursor})")
         
-        # Delete remaining keys
-        if keys_to_delete:
-            deleted = await self.batch_delete(keys_to_delete)
-            cleaned_count += deleted
+        while True:
+            await limiter.acquire(1)
+            cursor, keys = await self.redis_client.scan(cursor=cursor, match=pattern, count=batch_size)
+            stats["scanned_keys"] = stats.get("scanned_keys", 0) + len(keys)
+            
+            keys_to_delete = []
+            if keys:
+                await limiter.acquire(len(keys))
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.ttl(key)
+                ttls = await pipe.execute(raise_on_error=False)
+                for key, ttl in zip(keys, ttls):
+                    # Nếu key không có TTL hoặc TTL quá nhỏ, đánh dấu để xóa (-2: key đã expire)
+                    if isinstance(ttl, int) and (ttl == -1 or 0 < ttl < ttl_threshold):
+                        keys_to_delete.append(key)
+            
+            if keys_to_delete or checkpoint_key:
+                await limiter.acquire(len(keys_to_delete) + (1 if checkpoint_key else 0))
+                pipe = self.redis_client.pipeline(transaction=False)
+                if keys_to_delete:
+                    pipe.unlink(*keys_to_delete)
+                if checkpoint_key:
+                    pipe.hset(checkpoint_key, mapping={"cursor": cursor, "updated_at": time.time()})
+                results = await pipe.execute()
+                if keys_to_delete:
+                    cleaned_count += results[0]
+                    stats["deleted_keys"] = stats.get("deleted_keys", 0) + results[0]
+            
+            if cursor == 0:
+                break
         
         logger.info(f"🧹 Đã cleanup {cleaned_count} expired Redis keys")
         return cleaned_count
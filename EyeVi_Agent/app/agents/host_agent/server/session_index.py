@@ -0,0 +1,208 @@
+"""
+User Session Index - Sorted set các sessions của mỗi user (score = thời điểm hoạt động cuối),
+thay cho SCAN chat_history:{user}:* / langchain_history:{user}:* trên toàn bộ keyspace
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+SESSION_INDEX_TTL_SECONDS = 86400 * 7  # Cùng TTL với conversation history
+
+# Số entries cùng score tối đa được xử lý ở ranh giới trang
+_TIE_WINDOW = 32
+
+def _parse_timestamp(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class UserSessionIndex:
+    """
+    Index sessions theo user
+
+    Storage layout:
+        user_sessions:{user}          -> ZSET member=session_id, score=last activity (epoch seconds)
+        user_sessions:__backfilled__  -> marker, index đã được backfill từ keys hiện có
+    - Được cập nhật trong cùng pipeline với mỗi lần ghi history (không thêm round trip)
+    - Sessions không hoạt động quá TTL của history (đã expire) bị trim khỏi index khi user ghi tiếp
+    - Liệt kê sessions: ZREVRANGEBYSCORE với cursor (score|session_id), O(log n + page)
+    """
+
+    KEY_PREFIX = "user_sessions"
+    BACKFILL_MARKER = "user_sessions:__backfilled__"
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        max_sessions: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.redis_client = redis_client
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.getenv("SESSION_INDEX_MAX_SESSIONS", "1000"))
+        self.enabled = enabled if enabled is not None else os.getenv("SESSION_INDEX_ENABLED", "true").lower() == "true"
+        self._ready = False
+
+        # Metrics
+        self.touches = 0
+        self.page_queries = 0
+        self.backfilled_sessions = 0
+
+    def _get_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}"
+
+    def add_to_pipeline(self, pipe: Any, user_id: Optional[str], session_id: str, timestamp: Optional[float] = None):
+        """Thêm lệnh cập nhật index vào pipeline ghi history có sẵn"""
+        if not self.enabled or not user_id or user_id == "anonymous":
+            return
+        now = timestamp or time.time()
+        key = self._get_key(user_id)
+        # GT: không lùi thời điểm hoạt động (backfill từ nhiều patterns, writes đến không theo thứ tự)
+        pipe.zadd(key, {session_id: now}, gt=True)
+        # Trim sessions đã expire và giới hạn số sessions mỗi user
+        pipe.zremrangebyscore(key, "-inf", now - SESSION_INDEX_TTL_SECONDS)
+        pipe.zremrangebyrank(key, 0, -(self.max_sessions + 1))
+        pipe.expire(key, SESSION_INDEX_TTL_SECONDS)
+        self.touches += 1
+
+    def remove_in_pipeline(self, pipe: Any, user_id: Optional[str], session_id: str):
+        if self.enabled and user_id:
+            pipe.zrem(self._get_key(user_id), session_id)
+
+    async def is_ready(self) -> bool:
+        """Index dùng được cho listing khi đã backfill (trước đó vẫn dùng SCAN)"""
+        if not self.enabled or not self.redis_client:
+            return False
+        if not self._ready:
+            self._ready = bool(await self.redis_client.exists(self.BACKFILL_MARKER))
+        return self._ready
+
+    async def count(self, user_id: str) -> int:
+        return await self.redis_client.zcard(self._get_key(user_id))
+
+    async def list_sessions(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+        """
+        Một trang sessions, mới hoạt động nhất trước
+
+        Returns:
+            ([(session_id, last_activity)], next_cursor) - next_cursor None khi hết
+        """
+        self.page_queries += 1
+        key = self._get_key(user_id)
+        max_score, cursor_member = "+inf", None
+        if cursor:
+            score, _, cursor_member = cursor.partition("|")
+            max_score = score
+
+        # Lấy cả các entries cùng score với cursor để không bỏ sót session ở ranh giới trang
+        entries = await self.redis_client.zrevrangebyscore(
+            key, max_score, "-inf", start=0, num=limit + 1 + (_TIE_WINDOW if cursor else 0), withscores=True
+        )
+        if cursor:
+            cursor_score = float(max_score)
+            # Cùng score: ZREVRANGEBYSCORE trả về theo thứ tự member giảm dần
+            entries = [
+                (member, score) for member, score in entries
+                if score < cursor_score or member < cursor_member
+            ]
+
+        page = entries[:limit]
+        next_cursor = None
+        if len(entries) > limit and page:
+            last_member, last_score = page[-1]
+            next_cursor = f"{last_score!r}|{last_member}"
+        return page, next_cursor
+
+    async def all_sessions(self, user_id: str) -> List[str]:
+        return await self.redis_client.zrevrange(self._get_key(user_id), 0, self.max_sessions - 1)
+
+    async def backfill(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Populate index từ keys history hiện có (SCAN một lần), sau đó đặt marker"""
+        report = await backfill_user_session_index(self.redis_client, self, dry_run=dry_run)
+        if not dry_run:
+            await self.redis_client.set(self.BACKFILL_MARKER, datetime.now().isoformat())
+            self._ready = True
+            self.backfilled_sessions += report["indexed_sessions"]
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": self._ready,
+            "touches": self.touches,
+            "page_queries": self.page_queries,
+            "backfilled_sessions": self.backfilled_sessions
+        }
+
+async def backfill_user_session_index(
+    redis_client: aioredis.Redis,
+    session_index: UserSessionIndex,
+    patterns: Optional[List[str]] = None,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    One-time backfill: thêm tất cả sessions hiện có vào user_sessions:{user}
+
+    Args:
+        redis_client: Redis client (decode_responses=True)
+        patterns: Các key patterns của history (mặc định langchain_history:* và chat_history:*)
+        dry_run: Chỉ đếm, không ghi
+    """
+    patterns = patterns or ["langchain_history:*", "chat_history:*"]
+    report = {"scanned_keys": 0, "indexed_sessions": 0, "errors": [], "dry_run": dry_run}
+
+    for pattern in patterns:
+        prefix = pattern.rstrip("*")
+        meta_prefix = prefix.replace(":", "_meta:", 1)
+        cursor = 0
+        while True:
+            cursor, keys = await redis_client.scan(cursor=cursor, match=pattern, count=1000)
+            sessions = []
+            for key in keys:
+                # Format: {prefix}{user_id}:{session_id} (session_id có thể chứa ":")
+                parts = key[len(prefix):].split(":", 1)
+                if len(parts) == 2 and parts[0] != "anonymous":
+                    sessions.append((key, parts[0], parts[1]))
+            report["scanned_keys"] += len(keys)
+
+            if sessions and not dry_run:
+                try:
+                    # Thời điểm hoạt động cuối lấy từ meta hash, fallback theo TTL còn lại
+                    pipe = redis_client.pipeline(transaction=False)
+                    for key, user_id, session_id in sessions:
+                        pipe.hget(f"{meta_prefix}{user_id}:{session_id}", "last_updated")
+                        pipe.ttl(key)
+                    results = await pipe.execute()
+
+                    now = time.time()
+                    pipe = redis_client.pipeline(transaction=False)
+                    for index, (key, user_id, session_id) in enumerate(sessions):
+                        last_updated, ttl = results[2 * index], results[2 * index + 1]
+                        timestamp = _parse_timestamp(last_updated)
+                        if timestamp is None:
+                            timestamp = now - (SESSION_INDEX_TTL_SECONDS - ttl) if ttl and ttl > 0 else now
+                        session_index.add_to_pipeline(pipe, user_id, session_id, timestamp)
+                    await pipe.execute()
+                except Exception as e:
+                    report["errors"].append(f"Error indexing batch of {pattern}: {str(e)}")
+                    sessions = []
+            report["indexed_sessions"] += len(sessions)
+            if cursor == 0:
+                break
+
+    logger.info(f"📇 Backfill user session index: {report['indexed_sessions']} sessions từ {report['scanned_keys']} keys")
+    return report
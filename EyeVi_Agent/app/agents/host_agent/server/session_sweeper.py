@@ -0,0 +1,134 @@
+"""
+Session Sweeper - Background job cleanup chat_history:* đã expired/cũ, pipelined + giới hạn ops/sec
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Chỉ xóa lock nếu vẫn là token của mình (lock có thể đã hết hạn và bị instance khác lấy)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+class SessionSweeper:
+    """
+    Sweep định kỳ các chat history keys (thay cho sweep toàn bộ keyspace lúc shutdown)
+
+    - Mỗi vòng gọi OptimizedRedisClient.cleanup_expired_sessions với trần max_ops_per_second
+    - SCAN cursor được checkpoint trong Redis sau mỗi trang: restart/shutdown giữa chừng thì vòng sau
+      tiếp tục từ checkpoint thay vì scan lại từ đầu
+    - Lock (SET NX EX, giá trị là token ngẫu nhiên) để chỉ một host instance sweep tại một thời điểm;
+      nhả lock bằng compare-and-delete nên không xóa nhầm lock của instance khác
+    """
+
+    CHECKPOINT_KEY_PREFIX = "session_sweep_checkpoint"
+    LOCK_KEY = "session_sweep_lock"
+
+    def __init__(
+        self,
+        client_manager: Any,
+        pattern: str = "chat_history:*",
+        interval: Optional[float] = None,
+        ttl_threshold: Optional[int] = None,
+        max_ops_per_second: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.client_manager = client_manager
+        self.pattern = pattern
+        self.interval = interval if interval is not None else float(os.getenv("SESSION_SWEEP_INTERVAL", "3600"))
+        self.ttl_threshold = ttl_threshold if ttl_threshold is not None else int(os.getenv("SESSION_SWEEP_TTL_THRESHOLD", "86400"))
+        self.max_ops_per_second = max_ops_per_second if max_ops_per_second is not None else float(os.getenv("SESSION_SWEEP_MAX_OPS_PER_SECOND", "500"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "200"))
+        self.checkpoint_key = f"{self.CHECKPOINT_KEY_PREFIX}:{pattern}"
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.stats: Dict[str, Any] = {"scanned_keys": 0, "deleted_keys": 0}
+        self.completed_sweeps = 0
+        self.skipped_sweeps = 0
+        self.errors = 0
+        self.last_completed_at: Optional[str] = None
+        self.last_duration = 0.0
+
+    def start(self):
+        """Chạy sweeper trong background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🧹 Session sweeper started (interval={self.interval}s, max_ops_per_second={self.max_ops_per_second})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        # Vòng đầu chạy sau một khoảng ngắn để không tranh tài nguyên lúc khởi động
+        await asyncio.sleep(min(self.interval, 60) * random.uniform(0.5, 1.0))
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Lỗi khi sweep expired sessions: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> int:
+        """Một vòng sweep (tiếp tục từ checkpoint nếu có). Trả về số keys đã xóa"""
+        optimized_client = self.client_manager.optimized_redis_client
+        if not optimized_client:
+            return 0
+        redis_client = optimized_client.redis_client
+
+        # Lock hết hạn sau một interval phòng khi instance giữ lock bị dừng đột ngột
+        lock_token = uuid.uuid4().hex
+        if not await redis_client.set(self.LOCK_KEY, lock_token, nx=True, ex=max(int(self.interval), 60)):
+            self.skipped_sweeps += 1
+            return 0
+
+        start = time.monotonic()
+        try:
+            cleaned_count = await optimized_client.cleanup_expired_sessions(
+                self.pattern,
+                self.ttl_threshold,
+                max_ops_per_second=self.max_ops_per_second,
+                checkpoint_key=self.checkpoint_key,
+                batch_size=self.batch_size,
+                stats=self.stats
+            )
+        finally:
+            await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, self.LOCK_KEY, lock_token)
+
+        self.completed_sweeps += 1
+        self.last_duration = time.monotonic() - start
+        self.last_completed_at = datetime.now().isoformat()
+        return cleaned_count
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "max_ops_per_second": self.max_ops_per_second,
+            "batch_size": self.batch_size,
+            "scanned_keys": self.stats["scanned_keys"],
+            "deleted_keys": self.stats["deleted_keys"],
+            "completed_sweeps": self.completed_sweeps,
+            "skipped_sweeps": self.skipped_sweeps,
+            "errors": self.errors,
+            "last_completed_at": self.last_completed_at,
+            "last_duration_s": self.last_duration
+        }
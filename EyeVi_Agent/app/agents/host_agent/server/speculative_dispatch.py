@@ -0,0 +1,160 @@
+"""
+Speculative Dispatch - Gọi trước agent được dự đoán, chạy song song với orchestrator LLM
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+from .fast_router import FastPathRouter
+from .text_utils import normalize_message
+
+logger = logging.getLogger(__name__)
+
+class SpeculativeCall:
+    """Một speculative request đang chạy tới agent được dự đoán"""
+
+    def __init__(self, agent_name: str, message: str, rule: str, confidence: float):
+        self.agent_name = agent_name
+        self.message = message
+        self.rule = rule
+        self.confidence = confidence
+        self.task_id: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def set_task_id(self, task_id: str):
+        self.task_id = self.task_id or task_id
+
+    def _on_done(self, _task: asyncio.Task):
+        self.finished_at = time.monotonic()
+
+class SpeculativeDispatcher:
+    """
+    Speculative execution cho process_message
+
+    - Predictor rẻ: FastPathRouter.predict (rules trên message đã bỏ dấu, không gọi LLM)
+    - Chỉ speculate tới agents dạng đọc (A2AClientManager.can_speculate) khi orchestrator LLM thực sự được gọi
+    - Orchestrator chọn đúng một agent trùng với dự đoán và giữ nguyên message (sau chuẩn hóa)
+      -> dùng kết quả speculative; ngược lại cancel request và gửi A2A tasks/cancel nếu đã biết task id
+    """
+
+    def __init__(
+        self,
+        client_manager: Any,
+        router: FastPathRouter,
+        min_confidence: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.client_manager = client_manager
+        self.router = router
+        self.min_confidence = min_confidence if min_confidence is not None else float(os.getenv("SPECULATION_MIN_CONFIDENCE", "0.7"))
+        self.enabled = enabled if enabled is not None else os.getenv("SPECULATION_ENABLED", "true").lower() == "true"
+
+        # Metrics
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.remote_cancels = 0
+        self.latency_saved_total = 0.0
+        self.wasted_agent_time_total = 0.0
+
+    def maybe_start(self, message: str, available_agents: Optional[List[str]] = None, user_id: Optional[str] = None) -> Optional[SpeculativeCall]:
+        """Dự đoán agent và bắt đầu speculative request nếu đủ tin cậy"""
+        if not self.enabled:
+            return None
+        prediction = self.router.predict(message, available_agents)
+        if prediction is None:
+            return None
+        agent_name, confidence, rule = prediction
+        if confidence < self.min_confidence or not self.client_manager.can_speculate(agent_name):
+            return None
+
+        call = SpeculativeCall(agent_name, message, rule, confidence)
+        call.task = asyncio.create_task(
+            self.client_manager.run_speculative(agent_name, message, user_id, on_task_id=call.set_task_id)
+        )
+        call.task.add_done_callback(call._on_done)
+        self.started += 1
+        logger.info(f"🔮 Speculative dispatch tới {agent_name} (rule={rule}, confidence={confidence})")
+        return call
+
+    async def resolve(
+        self,
+        call: SpeculativeCall,
+        agent_tasks: List[Dict[str, str]],
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Đối chiếu với decision của orchestrator (gọi ngay khi có decision)
+
+        Returns:
+            Response của agent nếu dự đoán đúng và request thành công, None nếu cần gửi request bình thường
+        """
+        decided_at = time.monotonic()
+        # Speculative request gửi message thô; orchestrator thường viết lại message kèm context
+        # (ví dụ khuôn mặt của user) -> chỉ là hit khi message gửi agent trùng với message đã speculate
+        if (
+            len(agent_tasks) != 1
+            or agent_tasks[0]["agent"] != call.agent_name
+            or normalize_message(agent_tasks[0]["message"]) != normalize_message(call.message)
+        ):
+            self.misses += 1
+            await self.cancel(call)
+            return None
+
+        try:
+            response = await call.task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Lỗi của speculative request -> caller gửi lại request bình thường
+            self.errors += 1
+            logger.warning(f"⚠️ Speculative request tới {call.agent_name} lỗi, gửi lại: {e}")
+            return None
+
+        self.hits += 1
+        saved = min(decided_at, call.finished_at or decided_at) - call.started_at
+        self.latency_saved_total += saved
+        logger.info(f"🔮 Speculation hit {call.agent_name}, tiết kiệm {saved * 1000:.0f}ms")
+        await self.client_manager.record_speculative_response(call.agent_name, call.message, response, user_id, session_id)
+        return response
+
+    async def cancel(self, call: SpeculativeCall):
+        """Hủy speculative request (local + A2A tasks/cancel nếu agent đã tạo task)"""
+        if call.task.done():
+            self.wasted_agent_time_total += (call.finished_at or time.monotonic()) - call.started_at
+            if not call.task.cancelled():
+                # Lấy exception (nếu có) để asyncio không log "exception was never retrieved"
+                call.task.exception()
+            return
+
+        call.task.cancel()
+        self.wasted_agent_time_total += time.monotonic() - call.started_at
+        if call.task_id:
+            agent_client = self.client_manager.agents.get(call.agent_name)
+            if agent_client and await agent_client.cancel_task(call.task_id):
+                self.remote_cancels += 1
+        logger.info(f"🔮 Speculation miss, đã hủy request tới {call.agent_name}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate và latency tiết kiệm được của speculative dispatch"""
+        resolved = self.hits + self.misses + self.errors
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": (self.hits / resolved) if resolved else 0.0,
+            "remote_cancels": self.remote_cancels,
+            "latency_saved_ms_total": self.latency_saved_total * 1000,
+            "avg_latency_saved_ms": (self.latency_saved_total / self.hits * 1000) if self.hits else 0.0,
+            "wasted_agent_time_ms_total": self.wasted_agent_time_total * 1000
+        }
@@ -0,0 +1,39 @@
+"""
+Text Utilities - Chuẩn hóa text tiếng Việt (bỏ dấu, lowercase) cho routing và caching
+"""
+
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"[^\w\s#:&./-]")
+
+def fold_accents(text: str) -> str:
+    """
+    Bỏ dấu tiếng Việt và lowercase
+    Ví dụ: "Tìm kính Rayban" -> "tim kinh rayban"
+    """
+    if not text:
+        return ""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.lower()
+
+def normalize_message(text: str) -> str:
+    """
+    Chuẩn hóa message: bỏ dấu, bỏ dấu câu thừa, gộp khoảng trắng
+    Dùng làm input cho fast-path router và key cho decision cache
+    """
+    folded = fold_accents(text)
+    folded = _PUNCTUATION_RE.sub(" ", folded)
+    return _WHITESPACE_RE.sub(" ", folded).strip()
+
+def estimate_tokens(text: str) -> int:
+    """
+    Ước lượng số tokens của prompt (~4 ký tự/token), không gọi API count_tokens
+    Dùng cho metrics kích thước prompt, không dùng để cắt chính xác theo context window
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
@@ -27,6 +27,7 @@ from a2a.utils import (
 from a2a.utils.errors import ServerError
 
 from agent.agent import SearchAgent
+from tools.blob_store import BlobReader
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,6 +38,7 @@ class SearchAgentExecutor(AgentExecutor):
     def __init__(self):
         """Initialize the SearchAgentExecutor."""
         self.agent = SearchAgent()
+        self.blob_reader = BlobReader()
 
     async def execute(
         self,
@@ -57,7 +59,7 @@ class SearchAgentExecutor(AgentExecutor):
 
         try:
             # Trích xuất dữ liệu từ message
-            query, image_data, analysis_result = self._extract_message_parts(context.message)
+            query, image_data, analysis_result = await self._extract_message_parts(context.message)
             
             # Process the search request
             result = await self.agent.search(
@@ -264,7 +266,7 @@ class SearchAgentExecutor(AgentExecutor):
                 "active_tasks": 0
             }
 
-    def _extract_message_parts(self, message: Message) -> Tuple[Optional[str], Optional[bytes], Optional[Dict]]:
+    async def _extract_message_parts(self, message: Message) -> Tuple[Optional[str], Optional[bytes], Optional[Dict]]:
         """Trích xuất query text, image data và analysis result từ message parts.
         
         Args:
@@ -287,10 +289,15 @@ class SearchAgentExecutor(AgentExecutor):
                     logger.info(f"Extracted text query: {query_text[:50]}...")
                 
                 # FilePart - Xử lý phần file (ảnh)
-                elif isinstance(part_root, FilePart) and part_root.file.mimeType.startswith("image/"):
+                elif isinstance(part_root, FilePart) and (part_root.file.mimeType or "").startswith("image/"):
                     try:
+                        # Blob reference từ host agent: đọc bytes trực tiếp từ blob store
+                        if getattr(part_root.file, "uri", None):
+                            image_data = await self.blob_reader.read(part_root.file.uri)
+                            if image_data:
+                                logger.info(f"Loaded image from blob store: {len(image_data)} bytes")
                         # Decode base64 image data
-                        if part_root.file.bytes:
+                        elif getattr(part_root.file, "bytes", None):
                             image_data = base64.b64decode(part_root.file.bytes)
                             logger.info(f"Extracted image data: {len(image_data)} bytes")
                     except Exception as e:
@@ -0,0 +1,29 @@
+"""
+Helper dùng chung cho các benchmark script của search agent
+"""
+
+import asyncio
+import time
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+class SimulatedResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+class SimulatedLLM:
+    """Gemini giả lập với độ trễ cố định: invoke block thread (HTTP đồng bộ), ainvoke nhường event loop"""
+
+    def __init__(self, reply: str, latency: float):
+        self.reply = reply
+        self.latency = latency
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return SimulatedResponse(self.reply)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        return SimulatedResponse(self.reply)
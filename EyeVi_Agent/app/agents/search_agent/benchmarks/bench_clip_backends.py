@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark độ trễ và bộ nhớ (RSS) của các CLIP backend: torch eager, ONNX fp32, ONNX int8
+
+Mỗi backend chạy trong một process riêng để RSS không bị lẫn; file ONNX tạo bằng
+models/clip/export_onnx.py (--quantize cho int8).
+
+Usage:
+    python benchmarks/bench_clip_backends.py --backends torch onnx onnx-int8 --iterations 50
+    python benchmarks/bench_clip_backends.py --custom-model-path models/CLIP_FTMT.pt
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from _common import percentile
+
+TEXT = "kính mát nam gọng kim loại màu vàng gold"
+
+def rss_mb() -> float:
+    """RSS hiện tại của process (Linux /proc, fallback ru_maxrss)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def load_image():
+    from PIL import Image
+    path = os.path.join(os.path.dirname(__file__), "..", "image_test", "test.jpg")
+    if os.path.exists(path):
+        return Image.open(path).convert("RGB")
+    return Image.new("RGB", (640, 480), "gray")
+
+def run_worker(args) -> dict:
+    """Đo một backend trong process hiện tại"""
+    import torch
+    from transformers import CLIPModel, CLIPProcessor
+    from tools.clip_onnx import load_onnx_clip_model
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    if args.worker == "torch":
+        model = CLIPModel.from_pretrained(args.model)
+        if args.custom_model_path:
+            checkpoint = torch.load(args.custom_model_path, map_location=torch.device('cpu'))
+            model.load_state_dict(checkpoint.get('model_state_dict', checkpoint))
+        model.eval()
+    else:
+        model = load_onnx_clip_model(args.worker, args.model, args.custom_model_path)
+    processor = CLIPProcessor.from_pretrained(args.model)
+    load_ms = (time.perf_counter() - start) * 1000
+    loaded = rss_mb()
+
+    text_inputs = processor(text=TEXT, return_tensors="pt", padding=True)
+    image_inputs = processor(images=load_image(), return_tensors="pt")
+    timings = {"text": [], "image": []}
+    with torch.no_grad():
+        for index in range(args.warmup + args.iterations):
+            start = time.perf_counter()
+            model.get_text_features(**text_inputs)
+            text_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            model.get_image_features(**image_inputs)
+            image_ms = (time.perf_counter() - start) * 1000
+
+            if index >= args.warmup:
+                timings["text"].append(text_ms)
+                timings["image"].append(image_ms)
+
+    return {
+        "backend": args.worker,
+        "load_ms": load_ms,
+        "rss_loaded_mb": loaded - baseline,
+        "rss_peak_mb": rss_mb() - baseline,
+        "text_p50": statistics.median(timings["text"]),
+        "text_p95": percentile(timings["text"], 0.95),
+        "image_p50": statistics.median(timings["image"]),
+        "image_p95": percentile(timings["image"], 0.95),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLIP backends: latency and RSS")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default="openai/clip-vit-base-patch32")
+    parser.add_argument("--custom-model-path", help="Checkpoint fine-tuning (torch: tải vào model, onnx: kiểm tra export_meta.json)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    results = []
+    for backend in args.backends:
+        command = [
+            sys.executable, __file__, "--worker", backend, "--model", args.model,
+            "--iterations", str(args.iterations), "--warmup", str(args.warmup),
+        ]
+        if args.custom_model_path:
+            command += ["--custom-model-path", args.custom_model_path]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{backend}: lỗi\n{completed.stderr.strip()}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(
+        f"{'backend':>10} | {'load ms':>8} | {'RSS MB':>7} | {'peak MB':>7} | "
+        f"{'text p50':>8} | {'text p95':>8} | {'img p50':>8} | {'img p95':>8}"
+    )
+    print("-" * 88)
+    for result in results:
+        print(
+            f"{result['backend']:>10} | {result['load_ms']:>8.0f} | {result['rss_loaded_mb']:>7.0f} | "
+            f"{result['rss_peak_mb']:>7.0f} | {result['text_p50']:>8.1f} | {result['text_p95']:>8.1f} | "
+            f"{result['image_p50']:>8.1f} | {result['image_p95']:>8.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark throughput embedding CLIP theo số client đồng thời
+
+- direct:  mỗi client tự chạy forward pass batch-size-1 (luồng cũ của EmbedQueryNode/ProductSearch)
+- batched: các client gửi request vào ClipBatcher, gom thành một forward pass
+
+Usage:
+    python benchmarks/bench_clip_batching.py --clients 1 8 32 --kind text
+    python benchmarks/bench_clip_batching.py --kind image --max-batch 32 --max-wait-ms 10
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import torch
+from PIL import Image
+from transformers import CLIPModel, CLIPProcessor
+
+from tools.clip_batcher import ClipBatcher
+from _common import percentile
+
+QUERIES = [
+    "kính mát nam gọng kim loại",
+    "gọng kính cận cho nữ mặt tròn",
+    "kính râm phi công màu vàng gold",
+    "gọng kính nhựa trong suốt",
+    "kính thể thao chống tia UV",
+    "kính mắt mèo màu hồng",
+]
+
+def load_images():
+    paths = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "image_test", "*.jpg")))
+    if not paths:
+        return [Image.new("RGB", (224, 224), color) for color in ("black", "white", "gray")]
+    return [Image.open(path).convert("RGB") for path in paths]
+
+def direct_embed(model, processor, kind: str, item):
+    with torch.no_grad():
+        if kind == "text":
+            inputs = processor(text=item, return_tensors="pt", padding=True)
+            return model.get_text_features(**inputs)[0]
+        inputs = processor(images=item, return_tensors="pt")
+        return model.get_image_features(**inputs)[0]
+
+def run_level(embed, items, clients: int, requests_per_client: int):
+    """Chạy `clients` thread, mỗi thread gửi `requests_per_client` request tuần tự"""
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset: int):
+        local = []
+        for index in range(requests_per_client):
+            start = time.perf_counter()
+            embed(items[(offset + index) % len(items)])
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLIP embeddings/sec: direct batch-1 vs ClipBatcher")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-client", type=int, default=8)
+    parser.add_argument("--kind", choices=["text", "image"], default="text")
+    parser.add_argument("--model", default="openai/clip-vit-base-patch32")
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("CLIP_BATCH_MAX_SIZE", "16")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("CLIP_BATCH_MAX_WAIT_MS", "5")))
+    args = parser.parse_args()
+
+    model = CLIPModel.from_pretrained(args.model)
+    processor = CLIPProcessor.from_pretrained(args.model)
+    model.eval()
+    items = QUERIES if args.kind == "text" else load_images()
+
+    batcher = ClipBatcher(model, processor, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    modes = {
+        "direct": lambda item: direct_embed(model, processor, args.kind, item),
+        "batched": batcher.embed_text if args.kind == "text" else batcher.embed_image,
+    }
+
+    # Warm-up
+    for embed in modes.values():
+        embed(items[0])
+
+    print(f"{'mode':>8} | {'clients':>7} | {'emb/s':>8} | {'p50 ms':>9} | {'p95 ms':>9} | {'avg batch':>9}")
+    print("-" * 64)
+    for mode, embed in modes.items():
+        for clients in args.clients:
+            before = batcher.get_stats()
+            throughput, latencies = run_level(embed, items, clients, args.requests_per_client)
+            after = batcher.get_stats()
+            batches = after["batches"] - before["batches"]
+            avg_batch = f"{(after['requests'] - before['requests']) / batches:.1f}" if batches else "1.0"
+            print(
+                f"{mode:>8} | {clients:>7} | {throughput:>8.1f} | "
+                f"{statistics.median(latencies):>9.1f} | {percentile(latencies, 0.95):>9.1f} | {avg_batch:>9}"
+            )
+
+    batcher.close()
+
+if __name__ == "__main__":
+    main()
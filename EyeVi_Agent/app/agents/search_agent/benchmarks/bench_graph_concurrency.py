@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark throughput của search graph theo số requests đồng thời (in-flight) trên một event loop
+
+- blocking: nodes đồng bộ (llm.invoke, CLIP trên event loop) - luồng cũ, requests bị tuần tự hóa
+- async:    nodes ainvoke (llm.ainvoke, CLIP trên executor riêng, Qdrant trong thread pool)
+
+Gemini/Qdrant được giả lập bằng độ trễ cố định để đo riêng ảnh hưởng của event loop;
+CLIP giả lập (sleep, torch nhả GIL khi inference) hoặc model thật với --real-clip.
+
+Usage:
+    python benchmarks/bench_graph_concurrency.py --concurrency 1 4 16 64 --llm-ms 400 --clip-ms 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from chains.search_graph import SearchChain
+from nodes.intent_classifier_node import IntentClassifierNode
+from nodes.attribute_extraction_node import AttributeExtractionNode
+from nodes.image_analysis_node import ImageAnalysisNode
+from nodes.recommendation_node import RecommendationNode
+from nodes.format_response_node import FormatResponseNode
+from nodes.embed_query_node import EmbedQueryNode
+from nodes.semantic_search_node import SemanticSearchNode
+from nodes.query_combiner_node import get_query_combiner_node
+from nodes.query_understanding_node import QueryUnderstandingNode
+from _common import percentile, SimulatedLLM
+
+EXTRACTION_REPLY = json.dumps({
+    "normalized_description": "Kính mát nam gọng kim loại",
+    "slots": {"category": "Kính Mát", "gender": "Nam", "frameMaterial": "Kim loại"}
+}, ensure_ascii=False)
+
+UNDERSTANDING_REPLY = json.dumps({
+    "intent": "search_product",
+    "normalized_description": "Kính mát nam gọng kim loại",
+    "slots": {"category": "Kính Mát", "gender": "Nam", "frameMaterial": "Kim loại"}
+}, ensure_ascii=False)
+
+class SimulatedEmbedQueryNode(EmbedQueryNode):
+    """CLIP giả lập: sleep thay cho forward pass (torch nhả GIL trong lúc tính toán)"""
+
+    def __init__(self, latency: float):
+        # Không tải model, chỉ tạo executor như EmbedQueryNode
+        self.latency = latency
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CLIP_EXECUTOR_WORKERS", "1")),
+            thread_name_prefix="clip"
+        )
+
+    def _embed_text(self, text):
+        time.sleep(self.latency)
+        return [0.0] * 512
+
+    def _embed_image(self, image_data):
+        time.sleep(self.latency)
+        return [0.0] * 512
+
+class SimulatedQdrant:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def search(self, collection_name, query_vector, limit, query_filter=None):
+        time.sleep(self.latency)
+        return [
+            type("Hit", (), {"payload": {"product_id": str(index), "name": f"Kính {index}", "score": 0.9}})()
+            for index in range(limit)
+        ]
+
+def build_chain(async_nodes: bool, args) -> SearchChain:
+    """Dựng SearchChain với các node thật, chỉ thay Gemini/Qdrant (và CLIP nếu không --real-clip)"""
+    llm_latency = args.llm_ms / 1000
+    chain = SearchChain.__new__(SearchChain)
+    chain.async_nodes = async_nodes
+    chain.fused_query_understanding = args.fused
+
+    nodes = {
+        "intent_classifier": (IntentClassifierNode, "search_product"),
+        "attribute_extractor": (AttributeExtractionNode, EXTRACTION_REPLY),
+        "query_understanding": (QueryUnderstandingNode, UNDERSTANDING_REPLY),
+        "image_analyzer": (ImageAnalysisNode, "{}"),
+        "recommendation_node": (RecommendationNode, "Gợi ý sản phẩm"),
+        "format_response": (FormatResponseNode, "Đây là các sản phẩm phù hợp với bạn."),
+    }
+    for attribute, (node_class, reply) in nodes.items():
+        node = node_class.__new__(node_class)
+        node.llm = SimulatedLLM(reply, llm_latency)
+        setattr(chain, attribute, node)
+    chain.image_analyzer._cache = {}
+    chain.query_combiner = get_query_combiner_node()
+
+    if args.real_clip:
+        chain.embed_query = EmbedQueryNode()
+    else:
+        chain.embed_query = SimulatedEmbedQueryNode(args.clip_ms / 1000)
+
+    semantic_search = SemanticSearchNode.__new__(SemanticSearchNode)
+    semantic_search.qdrant_client = SimulatedQdrant(args.qdrant_ms / 1000)
+    semantic_search.default_limit = 5
+    chain.semantic_search = semantic_search
+
+    chain.workflow = chain._build_workflow()
+    return chain
+
+async def run_level(chain: SearchChain, concurrency: int, requests: int):
+    """Chạy `requests` requests với tối đa `concurrency` requests in-flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await chain.arun(query=f"kính mát nam gọng kim loại #{index}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert result.get("count"), result
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark search graph throughput: blocking nodes vs async nodes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests-per-level", type=int, default=4, help="Số requests = concurrency * giá trị này")
+    parser.add_argument("--llm-ms", type=float, default=400, help="Độ trễ giả lập mỗi Gemini call")
+    parser.add_argument("--clip-ms", type=float, default=30, help="Độ trễ giả lập mỗi CLIP forward pass")
+    parser.add_argument("--qdrant-ms", type=float, default=20, help="Độ trễ giả lập mỗi Qdrant search")
+    parser.add_argument("--real-clip", action="store_true", help="Dùng CLIP model thật thay cho giả lập")
+    parser.add_argument("--fused", action="store_true", help="Dùng query_understanding (intent + thuộc tính trong một LLM call)")
+    args = parser.parse_args()
+
+    print(f"{'mode':>9} | {'in-flight':>9} | {'req/s':>8} | {'p50 ms':>9} | {'p95 ms':>9}")
+    print("-" * 56)
+    for mode in ("blocking", "async"):
+        chain = build_chain(async_nodes=mode == "async", args=args)
+        for concurrency in args.concurrency:
+            throughput, latencies = await run_level(chain, concurrency, concurrency * args.requests_per_level)
+            print(
+                f"{mode:>9} | {concurrency:>9} | {throughput:>8.2f} | "
+                f"{statistics.median(latencies):>9.1f} | {percentile(latencies, 0.95):>9.1f}"
+            )
+
+if __name__ == "__main__":
+    asyncio.run(main())
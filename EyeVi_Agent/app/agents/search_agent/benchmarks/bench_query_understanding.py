@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark bước hiểu query của search graph
+
+- sequential: intent_classifier rồi attribute_extractor (hai Gemini call tuần tự) - luồng cũ
+- fused:      query_understanding (intent + thuộc tính trong một Gemini call)
+
+Mặc định Gemini được giả lập bằng độ trễ cố định; --live gọi Gemini thật (cần GOOGLE_API_KEY)
+và báo thêm tỷ lệ khớp intent/thuộc tính giữa hai luồng.
+
+Usage:
+    python benchmarks/bench_query_understanding.py --iterations 20 --llm-ms 400
+    python benchmarks/bench_query_understanding.py --live
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from nodes.intent_classifier_node import IntentClassifierNode
+from nodes.attribute_extraction_node import AttributeExtractionNode
+from nodes.query_understanding_node import QueryUnderstandingNode
+from _common import percentile, SimulatedLLM
+
+SAMPLE_QUERIES = [
+    "kính mát nam gọng kim loại",
+    "gọng kính cận cho nữ mặt tròn màu hồng",
+    "tròng kính chống ánh sáng xanh",
+    "kính râm Ray-Ban dưới 2 triệu",
+    "so sánh hai mẫu kính phi công",
+    "kính trẻ em gọng nhựa dẻo",
+    "cho mình xem chi tiết sản phẩm vừa rồi",
+    "kính thể thao chống tia UV",
+]
+
+COMPARED_FIELDS = ("category", "gender", "frameMaterial", "frameShape", "color", "brand")
+
+def build_nodes(args):
+    if args.live:
+        return IntentClassifierNode(), AttributeExtractionNode(), QueryUnderstandingNode()
+
+    latency = args.llm_ms / 1000
+    slots = {"category": "Kính Mát", "gender": "Nam", "frameMaterial": "Kim loại"}
+    replies = {
+        IntentClassifierNode: "search_product",
+        AttributeExtractionNode: json.dumps(
+            {"normalized_description": "Kính mát nam gọng kim loại", "slots": slots}, ensure_ascii=False
+        ),
+        QueryUnderstandingNode: json.dumps(
+            {"intent": "search_product", "normalized_description": "Kính mát nam gọng kim loại", "slots": slots},
+            ensure_ascii=False
+        ),
+    }
+    nodes = []
+    for node_class, reply in replies.items():
+        node = node_class.__new__(node_class)
+        node.llm = SimulatedLLM(reply, latency)
+        nodes.append(node)
+    return tuple(nodes)
+
+async def run_sequential(intent_node, extraction_node, query: str) -> dict:
+    state = {"query": query}
+    state.update(await intent_node.ainvoke(state))
+    state.update(await extraction_node.ainvoke(state))
+    return state
+
+async def run_fused(understanding_node, query: str) -> dict:
+    state = {"query": query}
+    state.update(await understanding_node.ainvoke(state))
+    return state
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark query understanding: sequential LLM calls vs fused call")
+    parser.add_argument("--iterations", type=int, default=20, help="Số lần chạy mỗi query")
+    parser.add_argument("--llm-ms", type=float, default=400, help="Độ trễ giả lập mỗi Gemini call")
+    parser.add_argument("--live", action="store_true", help="Gọi Gemini thật (cần GOOGLE_API_KEY)")
+    args = parser.parse_args()
+
+    if args.live and not os.getenv("GOOGLE_API_KEY"):
+        parser.error("--live cần GOOGLE_API_KEY")
+
+    intent_node, extraction_node, understanding_node = build_nodes(args)
+    iterations = 1 if args.live else args.iterations
+
+    timings = {"sequential": [], "fused": []}
+    intent_matches = 0
+    field_matches = 0
+    field_total = 0
+    for query in SAMPLE_QUERIES:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            sequential = await run_sequential(intent_node, extraction_node, query)
+            timings["sequential"].append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            fused = await run_fused(understanding_node, query)
+            timings["fused"].append((time.perf_counter() - start) * 1000)
+
+        intent_matches += sequential.get("intent") == fused.get("intent")
+        for field in COMPARED_FIELDS:
+            expected = sequential.get("text_extracted_attributes", {}).get(field)
+            actual = fused.get("text_extracted_attributes", {}).get(field)
+            if expected is None and actual is None:
+                continue
+            field_total += 1
+            field_matches += expected == actual
+
+        if args.live:
+            print(f"{query!r}: intent {sequential.get('intent')} -> {fused.get('intent')}")
+
+    print(f"{'path':>10} | {'calls':>5} | {'p50 ms':>9} | {'p95 ms':>9} | {'mean ms':>9}")
+    print("-" * 54)
+    for path, calls in (("sequential", 2), ("fused", 1)):
+        values = timings[path]
+        print(
+            f"{path:>10} | {calls:>5} | {statistics.median(values):>9.1f} | "
+            f"{percentile(values, 0.95):>9.1f} | {statistics.mean(values):>9.1f}"
+        )
+
+    saved = statistics.median(timings["sequential"]) - statistics.median(timings["fused"])
+    print(f"\nMedian latency saved: {saved:.1f} ms")
+    print(f"Intent agreement: {intent_matches}/{len(SAMPLE_QUERIES)}")
+    if field_total:
+        print(f"Attribute agreement: {field_matches}/{field_total} ({field_matches / field_total:.0%})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
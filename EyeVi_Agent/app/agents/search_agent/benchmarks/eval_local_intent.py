@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Đánh giá offline LocalIntentClassifierNode so với nhãn của LLM (IntentClassifierNode)
+
+Với mỗi ngưỡng similarity: tỷ lệ query xử lý cục bộ (coverage), độ chính xác trên phần đó,
+độ chính xác tổng (phần còn lại đi qua LLM) và độ trễ tiết kiệm được trên mỗi request.
+
+Nhãn LLM cần GOOGLE_API_KEY; lưu lại bằng --save-labels để chạy lại với --labels mà không gọi Gemini.
+
+Usage:
+    python benchmarks/eval_local_intent.py --save-labels intent_labels.jsonl
+    python benchmarks/eval_local_intent.py --labels intent_labels.jsonl --min-similarity 0.8 0.85 0.9
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from nodes.intent_classifier_node import IntentClassifierNode
+from nodes.embed_query_node import EmbedQueryNode
+from nodes.local_intent_classifier_node import LocalIntentClassifierNode
+from _common import percentile
+
+# Query đánh giá (khác với câu mẫu trong data/intent_prototypes.py)
+EVAL_QUERIES = [
+    "kính mát nữ gọng to bản",
+    "tìm gọng kính kim loại màu bạc",
+    "kính râm phân cực cho người lái xe",
+    "mình cần kính cận gọng vuông",
+    "có kính Gucci không shop",
+    "kính mát unisex màu nâu",
+    "gọng kính nửa viền cho nam",
+    "tròng kính đổi màu",
+    "kính mắt mèo đồi mồi",
+    "kính bơi cho trẻ em",
+    "mặt dài đeo kính gì đẹp",
+    "tư vấn kính đi biển",
+    "nên mua kính nào để đi làm",
+    "gợi ý gọng kính cho người da ngăm",
+    "mẫu này có mấy màu",
+    "kính này nặng bao nhiêu gram",
+    "chất liệu tròng của sản phẩm trên là gì",
+    "mẫu số 3 có ship nhanh không",
+    "so sánh mẫu 1 và mẫu 2",
+    "gọng titan với gọng nhựa cái nào bền hơn",
+    "mẫu nào rẻ hơn trong hai mẫu",
+    "Oakley hay Ray-Ban tốt hơn",
+    "xin chào shop",
+    "cảm ơn bạn nhé",
+    "hôm nay thời tiết thế nào",
+]
+
+def load_labels(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def label_with_llm(queries):
+    """Gọi IntentClassifierNode cho từng query, ghi lại nhãn và độ trễ"""
+    node = IntentClassifierNode(api_key=os.getenv("GOOGLE_API_KEY"))
+    labels = []
+    for query in queries:
+        start = time.perf_counter()
+        intent = node({"query": query})["intent"]
+        labels.append({"query": query, "intent": intent, "llm_ms": (time.perf_counter() - start) * 1000})
+    return labels
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate local CLIP intent classifier against LLM labels")
+    parser.add_argument("--labels", help="JSONL {query, intent, llm_ms} đã lưu (bỏ qua gọi Gemini)")
+    parser.add_argument("--save-labels", help="Lưu nhãn LLM ra JSONL")
+    parser.add_argument("--queries", help="File query (mỗi dòng một query), mặc định EVAL_QUERIES")
+    parser.add_argument("--min-similarity", type=float, nargs="+", default=[0.0, 0.8, 0.85, 0.9])
+    parser.add_argument("--min-margin", type=float, default=float(os.getenv("LOCAL_INTENT_MIN_MARGIN", "0.02")))
+    parser.add_argument("--iterations", type=int, default=5, help="Số lần đo độ trễ cục bộ mỗi query")
+    parser.add_argument("--custom-model-path", help="Checkpoint CLIP fine-tuned (như EmbedQueryNode)")
+    args = parser.parse_args()
+
+    if args.labels:
+        labels = load_labels(args.labels)
+    else:
+        if not os.getenv("GOOGLE_API_KEY"):
+            parser.error("Cần GOOGLE_API_KEY để lấy nhãn LLM (hoặc dùng --labels)")
+        if args.queries:
+            with open(args.queries, encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = EVAL_QUERIES
+        labels = label_with_llm(queries)
+        if args.save_labels:
+            with open(args.save_labels, "w", encoding="utf-8") as f:
+                for label in labels:
+                    f.write(json.dumps(label, ensure_ascii=False) + "\n")
+
+    classifier = LocalIntentClassifierNode(
+        embed_node=EmbedQueryNode(custom_model_path=args.custom_model_path),
+        fallback=None,
+        min_margin=args.min_margin
+    )
+
+    predictions = []
+    local_ms = []
+    for label in labels:
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            scores = classifier.classify(label["query"])
+            timings.append((time.perf_counter() - start) * 1000)
+        local_ms.append(statistics.median(timings))
+        predictions.append(scores)
+
+    llm_ms = [label["llm_ms"] for label in labels]
+    print(f"Queries: {len(labels)}")
+    print(f"LLM latency   p50 {statistics.median(llm_ms):8.1f} ms | p95 {percentile(llm_ms, 0.95):8.1f} ms")
+    print(f"Local latency p50 {statistics.median(local_ms):8.1f} ms | p95 {percentile(local_ms, 0.95):8.1f} ms\n")
+
+    print(f"{'min sim':>7} | {'coverage':>8} | {'local acc':>9} | {'overall acc':>11} | {'mean ms':>8} | {'saved ms/req':>12}")
+    print("-" * 72)
+    for min_similarity in args.min_similarity:
+        classifier.min_similarity = min_similarity
+        covered = correct_local = correct_total = 0
+        request_ms = []
+        for label, (intent, similarity, margin), local, llm in zip(labels, predictions, local_ms, llm_ms):
+            if classifier.is_confident(similarity, margin):
+                covered += 1
+                correct_local += intent == label["intent"]
+                correct_total += intent == label["intent"]
+                request_ms.append(local)
+            else:
+                # Fallback: nhãn LLM (đúng theo định nghĩa), trả thêm chi phí CLIP
+                correct_total += 1
+                request_ms.append(local + llm)
+
+        local_acc = f"{correct_local / covered:.1%}" if covered else "-"
+        saved = statistics.mean(llm_ms) - statistics.mean(request_ms)
+        print(
+            f"{min_similarity:>7.2f} | {covered / len(labels):>8.1%} | {local_acc:>9} | "
+            f"{correct_total / len(labels):>11.1%} | {statistics.mean(request_ms):>8.1f} | {saved:>12.1f}"
+        )
+
+    print("\nMismatches (nearest prototype):")
+    for label, (intent, similarity, margin) in zip(labels, predictions):
+        if intent != label["intent"]:
+            print(f"  {label['query']!r}: llm={label['intent']} local={intent} sim={similarity:.3f} margin={margin:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 from typing import Dict, List, Any, Optional, TypedDict
-import base64
 import os
 import logging
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 
 
@@ -14,6 +14,8 @@ from nodes.format_response_node import get_format_response_node
 from nodes.image_analysis_node import get_image_analysis_node
 from nodes.recommendation_node import get_recommendation_node
 from nodes.query_combiner_node import get_query_combiner_node
+from nodes.query_understanding_node import get_query_understanding_node
+from nodes.local_intent_classifier_node import get_local_intent_classifier_node
 
 # Cấu hình logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +25,7 @@ class SearchState(TypedDict):
     """Định nghĩa trạng thái của workflow tìm kiếm."""
     query: Optional[str]
     original_query: Optional[str]  # Lưu trữ câu query gốc của người dùng
-    image_data: Optional[str]
+    image_data: Optional[bytes]
     analysis_result: Optional[Dict[str, Any]]
     intent: Optional[str]
     extracted_attributes: Optional[Dict[str, Any]]
@@ -51,7 +53,10 @@ class SearchChain:
         streaming=True,
         qdrant_host="localhost",
         qdrant_port=6333,
-        custom_model_path=None
+        custom_model_path=None,
+        async_nodes=None,
+        fused_query_understanding=None,
+        local_intent=None
     ):
         """Khởi tạo SearchChain.
         
@@ -61,13 +66,26 @@ class SearchChain:
             qdrant_host: Host của Qdrant server
             qdrant_port: Port của Qdrant server
             custom_model_path: Đường dẫn đến mô hình CLIP tùy chỉnh
+            async_nodes: Dùng ainvoke của các node khi chạy arun (mặc định theo SEARCH_ASYNC_NODES)
+            fused_query_understanding: Phân loại intent + trích xuất thuộc tính trong một lần gọi LLM
+                (mặc định theo SEARCH_FUSED_QUERY_UNDERSTANDING)
+            local_intent: Phân loại intent bằng CLIP trước, chỉ gọi LLM khi độ tin cậy thấp
+                (mặc định theo SEARCH_LOCAL_INTENT, chỉ dùng khi không bật fused_query_understanding)
         """
+        self.async_nodes = async_nodes if async_nodes is not None else os.getenv("SEARCH_ASYNC_NODES", "true").lower() == "true"
+        self.fused_query_understanding = (
+            fused_query_understanding if fused_query_understanding is not None
+            else os.getenv("SEARCH_FUSED_QUERY_UNDERSTANDING", "true").lower() == "true"
+        )
+        self.local_intent = local_intent if local_intent is not None else os.getenv("SEARCH_LOCAL_INTENT", "false").lower() == "true"
+        
         # Khởi tạo các node
         self.intent_classifier = get_intent_classifier_node(api_key=api_key)
         self.attribute_extractor = get_attribute_extraction_node(api_key=api_key)
         self.image_analyzer = get_image_analysis_node(api_key=api_key)
         self.recommendation_node = get_recommendation_node(api_key=api_key)
         self.query_combiner = get_query_combiner_node()
+        self.query_understanding = get_query_understanding_node(api_key=api_key) if self.fused_query_understanding else None
         
         # Đường dẫn đến mô hình tùy chỉnh
         if custom_model_path and not os.path.exists(custom_model_path):
@@ -75,6 +93,15 @@ class SearchChain:
             custom_model_path = None
             
         self.embed_query = get_embed_query_node(custom_model_path=custom_model_path)
+        
+        # Phân loại intent cục bộ bằng text tower CLIP đã tải, LLM chỉ là fallback
+        if self.local_intent and self.fused_query_understanding:
+            logger.warning("SEARCH_LOCAL_INTENT bị bỏ qua vì intent đã có sẵn từ query_understanding")
+        elif self.local_intent:
+            self.intent_classifier = get_local_intent_classifier_node(
+                embed_node=self.embed_query,
+                fallback=self.intent_classifier
+            )
         self.semantic_search = get_semantic_search_node(
             qdrant_host="http://eyevi.devsecopstech.click",  # Cố định localhost
             qdrant_port=qdrant_port
@@ -90,43 +117,63 @@ class SearchChain:
         workflow = StateGraph(SearchState)
         
         # Thêm các node vào workflow
-        workflow.add_node("intent_classifier", self.intent_classifier)
+        if self.fused_query_understanding:
+            # Một node thay cho intent_classifier + attribute_extractor
+            workflow.add_node("query_understanding", self._as_node(self.query_understanding))
+        else:
+            workflow.add_node("intent_classifier", self._as_node(self.intent_classifier))
+            workflow.add_node("attribute_extractor", self._as_node(self.attribute_extractor))
         workflow.add_node("intent_router", self._intent_router)  # Đăng ký intent_router như một node
-        workflow.add_node("image_analyzer", self.image_analyzer)  # Node mới với tên đã sửa
-        workflow.add_node("attribute_extractor", self.attribute_extractor)
-        workflow.add_node("recommendation_node", self.recommendation_node)  # Thêm node mới
+        workflow.add_node("image_analyzer", self._as_node(self.image_analyzer))  # Node mới với tên đã sửa
+        workflow.add_node("recommendation_node", self._as_node(self.recommendation_node))  # Thêm node mới
         workflow.add_node("query_combiner", self.query_combiner)  # Thêm node kết hợp query
-        workflow.add_node("embed_query", self.embed_query)
-        workflow.add_node("semantic_search", self.semantic_search)
-        workflow.add_node("format_response", self.format_response)
-        
-        # Định nghĩa luồng xử lý
-        # Bắt đầu từ intent_classifier
-        workflow.set_entry_point("intent_classifier")
-        
-        # Từ intent_classifier đến intent_router
-        workflow.add_edge("intent_classifier", "intent_router")
-        
-        # Từ intent_router đến các node tiếp theo dựa trên loại input
-        workflow.add_conditional_edges(
-            "intent_router",
-            self._route_by_input_type,
-            {
-                "image_analyzer": "image_analyzer",
-                "attribute_extractor": "attribute_extractor",
-                "recommendation_node": "recommendation_node"  # Thêm edge mới
-            }
-        )
-        
-        # Từ attribute_extractor đến image_analyzer khi có cả text và image
-        workflow.add_conditional_edges(
-            "attribute_extractor",
-            self._should_go_to_image_analyzer,
-            {
-                "image_analyzer": "image_analyzer",
-                "query_combiner": "query_combiner"
-            }
-        )
+        workflow.add_node("embed_query", self._as_node(self.embed_query))
+        workflow.add_node("semantic_search", self._as_node(self.semantic_search))
+        workflow.add_node("format_response", self._as_node(self.format_response))
+        
+        if self.fused_query_understanding:
+            # Bắt đầu từ query_understanding (intent + thuộc tính đã có sẵn)
+            workflow.set_entry_point("query_understanding")
+            workflow.add_edge("query_understanding", "intent_router")
+            
+            # Luồng cũ đi qua attribute_extractor thì đi thẳng tới bước sau đó
+            workflow.add_conditional_edges(
+                "intent_router",
+                self._route_fused,
+                {
+                    "image_analyzer": "image_analyzer",
+                    "query_combiner": "query_combiner",
+                    "recommendation_node": "recommendation_node"
+                }
+            )
+        else:
+            # Định nghĩa luồng xử lý
+            # Bắt đầu từ intent_classifier
+            workflow.set_entry_point("intent_classifier")
+            
+            # Từ intent_classifier đến intent_router
+            workflow.add_edge("intent_classifier", "intent_router")
+            
+            # Từ intent_router đến các node tiếp theo dựa trên loại input
+            workflow.add_conditional_edges(
+                "intent_router",
+                self._route_by_input_type,
+                {
+                    "image_analyzer": "image_analyzer",
+                    "attribute_extractor": "attribute_extractor",
+                    "recommendation_node": "recommendation_node"  # Thêm edge mới
+                }
+            )
+            
+            # Từ attribute_extractor đến image_analyzer khi có cả text và image
+            workflow.add_conditional_edges(
+                "attribute_extractor",
+                self._should_go_to_image_analyzer,
+                {
+                    "image_analyzer": "image_analyzer",
+                    "query_combiner": "query_combiner"
+                }
+            )
         
         # Từ image_analyzer đến query_combiner khi có cả text và image
         workflow.add_conditional_edges(
@@ -156,6 +203,23 @@ class SearchChain:
         # Biên dịch workflow
         return workflow.compile()
     
+    def _as_node(self, node: Any) -> Any:
+        """
+        Đăng ký node với cả phiên bản đồng bộ (run) và bất đồng bộ (arun).
+        
+        LangGraph chạy node đồng bộ trực tiếp trên event loop khi ainvoke, nên một request đang chờ
+        Gemini/CLIP sẽ block mọi request khác; node có ainvoke được gọi bằng await thay vì vậy.
+        
+        Args:
+            node: Node có __call__ và ainvoke
+            
+        Returns:
+            Runnable dùng cho workflow.add_node
+        """
+        if not self.async_nodes:
+            return node
+        return RunnableLambda(node, afunc=node.ainvoke, name=type(node).__name__)
+    
     def _intent_router(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
         Node xử lý intent để chuẩn bị cho việc định tuyến.
@@ -214,6 +278,22 @@ class SearchChain:
         logger.info(f"Định tuyến dựa trên intent: {intent}")
         return self._route_by_intent(state)
     
+    def _route_fused(self, state: Dict[str, Any]) -> str:
+        """
+        Định tuyến khi dùng query_understanding: giống _route_by_input_type, nhưng bỏ qua
+        attribute_extractor vì thuộc tính đã được trích xuất cùng intent.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+            
+        Returns:
+            Tên của node tiếp theo
+        """
+        next_node = self._route_by_input_type(state)
+        if next_node == "attribute_extractor":
+            return self._should_go_to_image_analyzer(state)
+        return next_node
+    
     def _should_go_to_image_analyzer(self, state: Dict[str, Any]) -> str:
         """
         Kiểm tra xem có nên chuyển đến image_analyzer sau attribute_extractor không.
@@ -331,7 +411,7 @@ class SearchChain:
         initial_state = {
             "query": query,
             "original_query": query,  # Lưu trữ query gốc
-            "image_data": base64.b64encode(image_data).decode('utf-8') if image_data else None,
+            "image_data": image_data or None,  # Raw bytes, các node tự decode/encode khi cần
             "analysis_result": analysis_result
         }
         
@@ -358,7 +438,7 @@ class SearchChain:
         initial_state = {
             "query": query,
             "original_query": query,  # Lưu trữ query gốc
-            "image_data": base64.b64encode(image_data).decode('utf-8') if image_data else None,
+            "image_data": image_data or None,  # Raw bytes, các node tự decode/encode khi cần
             "analysis_result": analysis_result
         }
         
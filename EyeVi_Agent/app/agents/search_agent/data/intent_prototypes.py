@@ -0,0 +1,53 @@
+"""
+Câu mẫu (prototype) cho từng intent của Search Agent.
+Dùng bởi LocalIntentClassifierNode: query được gán intent của prototype gần nhất
+trong không gian embedding text của CLIP.
+"""
+
+INTENT_PROTOTYPES = {
+    "search_product": [
+        "tìm kính mát nam",
+        "tìm gọng kính cận cho nữ",
+        "kính mát gọng kim loại",
+        "gọng kính nhựa màu đen",
+        "kính râm Ray-Ban",
+        "tròng kính chống ánh sáng xanh",
+        "kính mát phi công màu vàng gold",
+        "có kính mắt mèo màu hồng không",
+        "cho mình xem các mẫu kính tròn",
+        "kính trẻ em gọng nhựa dẻo",
+        "kính thể thao chống tia UV",
+        "gọng kính titan không viền",
+        "find men's sunglasses",
+        "black acetate eyeglass frames",
+    ],
+    "recommend_product": [
+        "tư vấn giúp mình mẫu kính phù hợp",
+        "mặt tròn thì nên đeo kính gì",
+        "gợi ý kính cho mặt vuông",
+        "mình nên chọn gọng kính nào",
+        "kính nào hợp với khuôn mặt của tôi",
+        "tư vấn kính cho dân văn phòng",
+        "gợi ý quà tặng kính mát cho bạn trai",
+        "which glasses suit an oval face",
+    ],
+    "product_detail": [
+        "cho mình xem chi tiết sản phẩm này",
+        "sản phẩm này làm bằng chất liệu gì",
+        "mẫu kính này giá bao nhiêu",
+        "kính này có bảo hành không",
+        "thông tin chi tiết của mẫu vừa rồi",
+        "kích thước gọng của mẫu này là bao nhiêu",
+        "mẫu thứ hai còn màu khác không",
+        "tell me more about this product",
+    ],
+    "compare_products": [
+        "so sánh hai mẫu kính này",
+        "mẫu nào tốt hơn",
+        "so sánh kính Ray-Ban và Oakley",
+        "khác nhau giữa gọng titan và gọng nhựa",
+        "nên mua mẫu đầu tiên hay mẫu thứ hai",
+        "so sánh giá hai sản phẩm",
+        "compare these two sunglasses",
+    ],
+}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Script để export text tower và vision tower của CLIP (kèm checkpoint fine-tuning) sang ONNX.
+Tùy chọn lượng tử hóa int8 động (dynamic quantization) và kiểm tra parity với PyTorch.
+
+Output (dùng với CLIP_BACKEND=onnx / onnx-int8, CLIP_ONNX_DIR):
+    text.onnx, vision.onnx
+    text_int8.onnx, vision_int8.onnx (khi --quantize)
+    export_meta.json (model gốc + sha256 checkpoint, OnnxClipModel kiểm tra khi tải)
+"""
+
+import os
+import sys
+import glob
+import torch
+import argparse
+
+from PIL import Image
+from transformers import CLIPModel, CLIPProcessor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from tools.clip_onnx import write_onnx_metadata
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "onnx")
+IMAGE_TEST_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "image_test")
+
+PARITY_TEXTS = [
+    "kính mát nam gọng kim loại",
+    "gọng kính cận cho nữ mặt tròn màu hồng",
+    "kính râm phi công màu vàng gold",
+    "tròng kính chống ánh sáng xanh",
+    "Ray-Ban aviator sunglasses",
+]
+
+class TextTower(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+    
+    def forward(self, input_ids, attention_mask):
+        return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+class VisionTower(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+    
+    def forward(self, pixel_values):
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+def load_model(model_name, checkpoint_path=None):
+    """
+    Tải CLIPModel và áp dụng checkpoint fine-tuning (nếu có), giống EmbedQueryNode.
+    
+    Args:
+        model_name: Tên model CLIP gốc
+        checkpoint_path: Đường dẫn đến checkpoint (CLIP_FTMT.pt hoặc state_dict)
+    """
+    print(f"Đang tải model {model_name}...")
+    model = CLIPModel.from_pretrained(model_name)
+    
+    if checkpoint_path:
+        print(f"Đang tải checkpoint từ {checkpoint_path}...")
+        checkpoint = torch.load(checkpoint_path, map_location=torch.device('cpu'))
+        if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+            model.load_state_dict(checkpoint['model_state_dict'])
+        elif isinstance(checkpoint, dict):
+            model.load_state_dict(checkpoint)
+        else:
+            raise ValueError(f"Không hỗ trợ định dạng checkpoint: {type(checkpoint)}")
+    
+    model.eval()
+    return model
+
+def export_towers(model, processor, output_dir, opset):
+    """
+    Export text tower và vision tower với batch (và độ dài chuỗi) động.
+    
+    Args:
+        model: CLIPModel đã tải
+        processor: CLIPProcessor tương ứng
+        output_dir: Thư mục lưu file ONNX
+        opset: Phiên bản ONNX opset
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    
+    text_inputs = processor(text=PARITY_TEXTS[:2], return_tensors="pt", padding=True)
+    text_path = os.path.join(output_dir, "text.onnx")
+    print(f"Đang export text tower vào {text_path}...")
+    torch.onnx.export(
+        TextTower(model),
+        (text_inputs["input_ids"], text_inputs["attention_mask"]),
+        text_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["text_embeds"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "text_embeds": {0: "batch"},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+    
+    image_inputs = processor(images=[Image.new("RGB", (224, 224))], return_tensors="pt")
+    vision_path = os.path.join(output_dir, "vision.onnx")
+    print(f"Đang export vision tower vào {vision_path}...")
+    torch.onnx.export(
+        VisionTower(model),
+        (image_inputs["pixel_values"],),
+        vision_path,
+        input_names=["pixel_values"],
+        output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+    return text_path, vision_path
+
+def quantize_towers(paths):
+    """
+    Lượng tử hóa int8 động cho các lớp MatMul/Gemm (Conv patch embedding giữ fp32).
+    
+    Args:
+        paths: Danh sách file ONNX fp32
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    for path in paths:
+        output_path = path.replace(".onnx", "_int8.onnx")
+        print(f"Đang lượng tử hóa {path} -> {output_path}...")
+        quantize_dynamic(path, output_path, op_types_to_quantize=["MatMul", "Gemm"], weight_type=QuantType.QInt8)
+
+def load_parity_images():
+    paths = sorted(glob.glob(os.path.join(IMAGE_TEST_DIR, "*.jpg")))
+    if not paths:
+        return [Image.new("RGB", (224, 224), color) for color in ("black", "white", "red")]
+    return [Image.open(path).convert("RGB") for path in paths]
+
+def cosine(a, b):
+    a = a / a.norm(dim=-1, keepdim=True)
+    b = b / b.norm(dim=-1, keepdim=True)
+    return (a * b).sum(dim=-1)
+
+def check_parity(model, processor, output_dir, variants, threshold):
+    """
+    So sánh embedding ONNX với PyTorch trên câu mẫu và ảnh trong image_test.
+    
+    Args:
+        model: CLIPModel đã tải
+        processor: CLIPProcessor tương ứng
+        output_dir: Thư mục chứa file ONNX
+        variants: Danh sách hậu tố ("" cho fp32, "_int8")
+        threshold: Cosine similarity tối thiểu
+    
+    Returns:
+        True nếu mọi embedding đạt ngưỡng
+    """
+    import onnxruntime as ort
+    
+    text_inputs = processor(text=PARITY_TEXTS, return_tensors="pt", padding=True)
+    image_inputs = processor(images=load_parity_images(), return_tensors="pt")
+    with torch.no_grad():
+        reference = {
+            "text": model.get_text_features(**text_inputs),
+            "vision": model.get_image_features(**image_inputs),
+        }
+    feeds = {
+        "text": {
+            "input_ids": text_inputs["input_ids"].numpy(),
+            "attention_mask": text_inputs["attention_mask"].numpy(),
+        },
+        "vision": {"pixel_values": image_inputs["pixel_values"].numpy()},
+    }
+    
+    passed = True
+    print(f"\n{'model':>18} | {'min cos':>8} | {'mean cos':>8}")
+    print("-" * 42)
+    for suffix in variants:
+        for tower in ("text", "vision"):
+            path = os.path.join(output_dir, f"{tower}{suffix}.onnx")
+            session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+            output = torch.from_numpy(session.run(None, feeds[tower])[0])
+            similarities = cosine(output, reference[tower])
+            ok = similarities.min().item() >= threshold
+            passed = passed and ok
+            print(
+                f"{os.path.basename(path):>18} | {similarities.min().item():>8.4f} | "
+                f"{similarities.mean().item():>8.4f} {'OK' if ok else 'FAIL'}"
+            )
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Export CLIP text/vision towers sang ONNX")
+    parser.add_argument("--model", "-m", default="openai/clip-vit-base-patch32", help="Tên model CLIP gốc")
+    parser.add_argument("--checkpoint", "-c", help="Checkpoint fine-tuning (ví dụ CLIP_FTMT.pt)")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT_DIR, help="Thư mục lưu file ONNX")
+    parser.add_argument("--quantize", action="store_true", help="Tạo thêm bản int8 (dynamic quantization)")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset")
+    parser.add_argument("--threshold", type=float, default=0.99, help="Cosine similarity tối thiểu khi kiểm tra parity")
+    parser.add_argument("--skip-parity", action="store_true", help="Bỏ qua kiểm tra parity")
+    
+    args = parser.parse_args()
+    model = load_model(args.model, args.checkpoint)
+    processor = CLIPProcessor.from_pretrained(args.model)
+    
+    paths = export_towers(model, processor, args.output, args.opset)
+    variants = [""]
+    if args.quantize:
+        quantize_towers(paths)
+        variants.append("_int8")
+    print(f"Đã ghi metadata vào {write_onnx_metadata(args.output, args.model, args.checkpoint)}")
+    print("Đã export thành công!")
+    
+    if not args.skip_parity:
+        if not check_parity(model, processor, args.output, variants, args.threshold):
+            print(f"Parity không đạt ngưỡng cosine >= {args.threshold}")
+            sys.exit(1)
+        print("Parity đạt yêu cầu!")
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from .format_response_node import get_format_response_node
 from .image_analysis_node import get_image_analysis_node
 from .recommendation_node import get_recommendation_node
 from .query_combiner_node import get_query_combiner_node
+from .query_understanding_node import get_query_understanding_node
+from .local_intent_classifier_node import get_local_intent_classifier_node
 
 __all__ = [
     "get_intent_classifier_node",
@@ -15,5 +17,7 @@ __all__ = [
     "get_format_response_node",
     "get_image_analysis_node",
     "get_recommendation_node",
-    "get_query_combiner_node"
+    "get_query_combiner_node",
+    "get_query_understanding_node",
+    "get_local_intent_classifier_node"
 ] 
\ No newline at end of file
@@ -57,14 +57,7 @@ class AttributeExtractionNode:
         
         # Kiểm tra nếu query rỗng
         if not query:
-            logger.warning("Query rỗng, không thể trích xuất thuộc tính")
-            result = {
-                "text_extracted_attributes": {},
-                "text_normalized_query": ""
-            }
-            # Giữ lại các giá trị quan trọng
-            self._preserve_important_values(result, state)
-            return result
+            return self._empty_query_result(state)
         
         try:
             # Sửa lỗi format string - Thay thế trực tiếp {query} trong prompt
@@ -73,58 +66,120 @@ class AttributeExtractionNode:
             # Gọi LLM để trích xuất thuộc tính
             response = self.llm.invoke(formatted_prompt)
             
-            # Log phản hồi từ LLM
-            # logger.info(f"Phản hồi từ LLM:\n{response.content[:200]}...")
-            
-            # Phân tích kết quả JSON
-            result = self._parse_extraction_result(response.content)
-            
-            # Log kết quả sau khi parse
-            # logger.info(f"Kết quả sau khi parse JSON:\n{result}")
-            
-            # Chuẩn hóa các giá trị thuộc tính
-            normalized_attributes = self._normalize_attributes(result.get("slots", {}))
-            
-            logger.info(f"Đã trích xuất thuộc tính: {normalized_attributes}")
-            logger.info(f"Câu mô tả chuẩn hóa: {result.get('normalized_description', query)}")
-            
-            # Lưu kết quả vào các biến tạm thời
-            text_normalized_query = result.get("normalized_description", query)
-            text_extracted_attributes = normalized_attributes
-            
-            # Kiểm tra nếu normalized_attributes rỗng thì trả về query gốc
-            if not normalized_attributes:
-                result = {
-                    "text_extracted_attributes": {},
-                    "text_normalized_query": query
-                }
-                # Giữ lại các giá trị quan trọng
-                self._preserve_important_values(result, state)
-                return result
+            return self._build_result(response, query, state)
+        
+        except Exception as e:
+            return self._error_result(e, query, state)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__ (không block event loop trong lúc chờ Gemini).
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
             
-            # Tạo kết quả với cả biến tạm thời
-            result = {
-                "text_extracted_attributes": text_extracted_attributes,
-                "text_normalized_query": text_normalized_query
-            }
+        Returns:
+            Dict chứa các thuộc tính được trích xuất
+        """
+        query = state.get("query", "")
+        if not query:
+            return self._empty_query_result(state)
+        
+        try:
+            response = await self.llm.ainvoke(EXTRACT_QUERY.replace("{query}", query))
+            return self._build_result(response, query, state)
+        
+        except Exception as e:
+            return self._error_result(e, query, state)
+    
+    def _build_result(self, response: Any, query: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tạo kết quả từ phản hồi của LLM.
+        
+        Args:
+            response: Phản hồi từ LLM
+            query: Query của người dùng
+            state: Trạng thái hiện tại của workflow
             
-            # Giữ lại các giá trị quan trọng từ state ban đầu
-            self._preserve_important_values(result, state)
+        Returns:
+            Dict chứa các thuộc tính được trích xuất
+        """
+        # Log phản hồi từ LLM
+        # logger.info(f"Phản hồi từ LLM:\n{response.content[:200]}...")
+        
+        # Phân tích kết quả JSON
+        result = self._parse_extraction_result(response.content)
+        
+        # Log kết quả sau khi parse
+        # logger.info(f"Kết quả sau khi parse JSON:\n{result}")
+        
+        return self._result_from_extraction(result, query, state)
+    
+    def _result_from_extraction(self, result: Dict[str, Any], query: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tạo kết quả từ JSON trích xuất đã parse (normalized_description, slots).
+        
+        Args:
+            result: JSON đã parse từ phản hồi của LLM
+            query: Query của người dùng
+            state: Trạng thái hiện tại của workflow
             
-            return result
+        Returns:
+            Dict chứa các thuộc tính được trích xuất
+        """
+        # Chuẩn hóa các giá trị thuộc tính
+        normalized_attributes = self._normalize_attributes(result.get("slots", {}))
         
-        except Exception as e:
-            # Log stack trace đầy đủ
-            logger.error(f"Lỗi khi trích xuất thuộc tính: {e}")
-            logger.error(f"Chi tiết lỗi: {traceback.format_exc()}")
+        logger.info(f"Đã trích xuất thuộc tính: {normalized_attributes}")
+        logger.info(f"Câu mô tả chuẩn hóa: {result.get('normalized_description', query)}")
+        
+        # Lưu kết quả vào các biến tạm thời
+        text_normalized_query = result.get("normalized_description", query)
+        text_extracted_attributes = normalized_attributes
+        
+        # Kiểm tra nếu normalized_attributes rỗng thì trả về query gốc
+        if not normalized_attributes:
             result = {
                 "text_extracted_attributes": {},
-                "text_normalized_query": query,
-                "error": str(e)
+                "text_normalized_query": query
             }
             # Giữ lại các giá trị quan trọng
             self._preserve_important_values(result, state)
             return result
+        
+        # Tạo kết quả với cả biến tạm thời
+        result = {
+            "text_extracted_attributes": text_extracted_attributes,
+            "text_normalized_query": text_normalized_query
+        }
+        
+        # Giữ lại các giá trị quan trọng từ state ban đầu
+        self._preserve_important_values(result, state)
+        
+        return result
+    
+    def _empty_query_result(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.warning("Query rỗng, không thể trích xuất thuộc tính")
+        result = {
+            "text_extracted_attributes": {},
+            "text_normalized_query": ""
+        }
+        # Giữ lại các giá trị quan trọng
+        self._preserve_important_values(result, state)
+        return result
+    
+    def _error_result(self, e: Exception, query: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        # Log stack trace đầy đủ
+        logger.error(f"Lỗi khi trích xuất thuộc tính: {e}")
+        logger.error(f"Chi tiết lỗi: {traceback.format_exc()}")
+        result = {
+            "text_extracted_attributes": {},
+            "text_normalized_query": query,
+            "error": str(e)
+        }
+        # Giữ lại các giá trị quan trọng
+        self._preserve_important_values(result, state)
+        return result
     
     def _parse_extraction_result(self, result_text: str) -> Dict[str, Any]:
         """
@@ -2,13 +2,18 @@ from typing import Dict, Any, Optional, Union, List
 import logging
 import torch
 import os
+import asyncio
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from PIL import Image
 import requests
 
 from transformers import CLIPProcessor, CLIPModel
 
+from tools.clip_batcher import ClipBatcher, clip_batching_enabled
+from tools.clip_onnx import clip_backend, load_onnx_clip_model
+
 logger = logging.getLogger(__name__)
 
 class EmbedQueryNode:
@@ -27,32 +32,52 @@ class EmbedQueryNode:
             custom_model_path: Đường dẫn đến mô hình tùy chỉnh (nếu có)
         """
         try:
-            # Khởi tạo model và processor mặc định
-            logger.info(f"Đang tải model mặc định {model_name}")
-            self.model = CLIPModel.from_pretrained(model_name)
-            self.processor = CLIPProcessor.from_pretrained(model_name)
-            
-            # Tải mô hình tùy chỉnh nếu có
-            if custom_model_path and os.path.exists(custom_model_path):
-                logger.info(f"Đang tải mô hình tùy chỉnh từ {custom_model_path}")
-                try:
-                    checkpoint = torch.load(custom_model_path, map_location=torch.device('cpu'))
-                    
-                    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-                        logger.info("Phát hiện checkpoint từ quá trình fine-tuning")
-                        self.model.load_state_dict(checkpoint['model_state_dict'])
-                    elif isinstance(checkpoint, dict):
-                        logger.info("Thử tải state_dict trực tiếp")
-                        self.model.load_state_dict(checkpoint)
-                    else:
-                        logger.warning(f"Không hỗ trợ định dạng mô hình {type(checkpoint)}")
-                except Exception as e:
-                    logger.error(f"Lỗi khi tải mô hình tùy chỉnh: {e}")
-                    logger.warning("Tiếp tục sử dụng mô hình mặc định")
+            self.backend = clip_backend()
+            if self.backend != "torch":
+                # Trọng số fine-tuned đã nằm sẵn trong file ONNX (models/clip/export_onnx.py --checkpoint),
+                # metadata export phải khớp model_name/custom_model_path
+                logger.info(f"Đang tải CLIP backend {self.backend}")
+                self.model = load_onnx_clip_model(self.backend, model_name, custom_model_path)
+                self.processor = CLIPProcessor.from_pretrained(model_name)
+            else:
+                # Khởi tạo model và processor mặc định
+                logger.info(f"Đang tải model mặc định {model_name}")
+                self.model = CLIPModel.from_pretrained(model_name)
+                self.processor = CLIPProcessor.from_pretrained(model_name)
+                
+                # Tải mô hình tùy chỉnh nếu có
+                if custom_model_path and os.path.exists(custom_model_path):
+                    logger.info(f"Đang tải mô hình tùy chỉnh từ {custom_model_path}")
+                    try:
+                        checkpoint = torch.load(custom_model_path, map_location=torch.device('cpu'))
+                        
+                        if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+                            logger.info("Phát hiện checkpoint từ quá trình fine-tuning")
+                            self.model.load_state_dict(checkpoint['model_state_dict'])
+                        elif isinstance(checkpoint, dict):
+                            logger.info("Thử tải state_dict trực tiếp")
+                            self.model.load_state_dict(checkpoint)
+                        else:
+                            logger.warning(f"Không hỗ trợ định dạng mô hình {type(checkpoint)}")
+                    except Exception as e:
+                        logger.error(f"Lỗi khi tải mô hình tùy chỉnh: {e}")
+                        logger.warning("Tiếp tục sử dụng mô hình mặc định")
             
         except Exception as e:
             logger.error(f"Lỗi khi tải model: {e}")
             raise
+        
+        # Gom các request đồng thời thành một forward pass (CLIP_BATCHING)
+        self.batcher = ClipBatcher(self.model, self.processor) if clip_batching_enabled() else None
+        
+        # Executor riêng cho CLIP inference (CPU-bound): không chiếm thread pool mặc định của event loop,
+        # các request khác vẫn tiếp tục chờ Gemini/Qdrant trong lúc CLIP đang chạy.
+        # Khi batching, mỗi worker chỉ decode ảnh rồi chờ batcher, nên cần đủ worker để lấp đầy một batch
+        default_workers = self.batcher.max_batch_size if self.batcher else 1
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CLIP_EXECUTOR_WORKERS", str(default_workers))),
+            thread_name_prefix="clip"
+        )
     
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -67,6 +92,41 @@ class EmbedQueryNode:
         # Lấy thông tin từ state
         normalized_query = state.get("normalized_query", "")
         image_data = state.get("image_data")
+        search_type = self._resolve_search_type(state)
+        
+        return self._compute_embeddings(search_type, normalized_query, image_data)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__: CLIP inference chạy trên executor riêng, không block event loop.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+            
+        Returns:
+            Dict chứa vector embedding
+        """
+        normalized_query = state.get("normalized_query", "")
+        image_data = state.get("image_data")
+        search_type = self._resolve_search_type(state)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._compute_embeddings, search_type, normalized_query, image_data
+        )
+    
+    def _resolve_search_type(self, state: Dict[str, Any]) -> str:
+        """
+        Xác định loại tìm kiếm (text/image/combined) nếu chưa được đặt trong state.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+            
+        Returns:
+            Loại tìm kiếm
+        """
+        normalized_query = state.get("normalized_query", "")
+        image_data = state.get("image_data")
         
         # Xác định loại tìm kiếm nếu chưa được đặt
         if "search_type" not in state or not state["search_type"]:
@@ -86,6 +146,25 @@ class EmbedQueryNode:
             search_type = state["search_type"]
             logger.info(f"Sử dụng loại tìm kiếm đã đặt: {search_type}")
         
+        return search_type
+    
+    def _compute_embeddings(
+        self,
+        search_type: str,
+        normalized_query: str,
+        image_data: Optional[Union[bytes, str]]
+    ) -> Dict[str, Any]:
+        """
+        Tạo embeddings theo loại tìm kiếm (CPU-bound, chạy trên executor ở luồng async).
+        
+        Args:
+            search_type: Loại tìm kiếm
+            normalized_query: Query đã chuẩn hóa
+            image_data: Dữ liệu hình ảnh
+            
+        Returns:
+            Dict chứa vector embedding
+        """
         # Khởi tạo kết quả
         result = {
             "search_type": search_type,
@@ -131,6 +210,10 @@ class EmbedQueryNode:
         Returns:
             Vector embedding của văn bản
         """
+        if self.batcher:
+            text_features = self.batcher.embed_text(text)
+            return (text_features / text_features.norm(dim=-1, keepdim=True)).tolist()
+        
         with torch.no_grad():
             text_inputs = self.processor(
                 text=text, return_tensors="pt", padding=True
@@ -140,17 +223,17 @@ class EmbedQueryNode:
             text_embedding = text_features / text_features.norm(dim=-1, keepdim=True)
             return text_embedding.numpy()[0].tolist()
     
-    def _embed_image(self, image_data: str) -> List[float]:
+    def _embed_image(self, image_data: Union[bytes, str]) -> List[float]:
         """
         Chuyển đổi image thành vector embedding.
         
         Args:
-            image_data: Dữ liệu hình ảnh dạng base64
+            image_data: Dữ liệu hình ảnh (raw bytes, hoặc base64 với caller cũ)
             
         Returns:
             Vector embedding của hình ảnh
         """
-        # Giải mã base64
+        # Giải mã base64 (state mặc định chứa raw bytes, không cần decode)
         if isinstance(image_data, str):
             image_bytes = base64.b64decode(image_data)
         else:
@@ -159,6 +242,10 @@ class EmbedQueryNode:
         # Chuyển đổi thành đối tượng PIL.Image
         image = Image.open(BytesIO(image_bytes)).convert('RGB')
         
+        if self.batcher:
+            image_features = self.batcher.embed_image(image)
+            return (image_features / image_features.norm(dim=-1, keepdim=True)).tolist()
+        
         with torch.no_grad():
             inputs = self.processor(images=image, return_tensors="pt")
             image_features = self.model.get_image_features(**inputs)
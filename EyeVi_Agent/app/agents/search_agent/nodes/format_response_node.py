@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import logging
 import json
 import traceback
@@ -43,141 +43,203 @@ class FormatResponseNode:
         Returns:
             Dict chứa phản hồi cuối cùng
         """
-        # Lấy thông tin từ state
         search_results = state.get("search_results", [])
-        normalized_query = state.get("normalized_query", "")
-        original_query = state.get("original_query", "")  # Lấy query gốc của người dùng
-        search_type = state.get("search_type", "text")
-        image_analysis = state.get("image_analysis", {})
-        text_normalized_query = state.get("text_normalized_query", "")
-        image_normalized_query = state.get("image_normalized_query", "")
-        
-        logger.info(f"Định dạng phản hồi cho loại tìm kiếm: {search_type}")
-        logger.info(f"Query gốc: {original_query}")
-        logger.info(f"Query chuẩn hóa: {normalized_query}")
-        logger.info(f"Text normalized query: {text_normalized_query}")
-        logger.info(f"Image normalized query: {image_normalized_query}")
-        logger.info(f"Số lượng kết quả: {len(search_results)}")
+        self._log_request(state)
         
         try:
             # Kiểm tra nếu có lỗi
             if state.get("error"):
-                logger.error(f"Lỗi từ các node trước: {state['error']}")
-                return {
-                    "final_response": {
-                        "error": state["error"],
-                        "products": [],
-                        "count": 0,
-                        "summary": "Xin lỗi, đã xảy ra lỗi khi tìm kiếm sản phẩm."
-                    }
-                }
+                return self._previous_error_response(state)
             
-            # Kiểm tra nếu không có kết quả
-            if not search_results:
-                logger.info("Không có kết quả tìm kiếm, tạo phản hồi thông báo")
-                llm_response = self._generate_no_results_response(
-                    original_query or normalized_query, 
-                    search_type
-                )
-                return {
-                    "final_response": {
-                        "products": [],
-                        "count": 0,
-                        "summary": "Không tìm thấy sản phẩm phù hợp.",
-                        "llm_response": llm_response
-                    }
-                }
+            llm_response = self._invoke_llm(self._prepare_llm_request(state))
+            return self._build_final_response(state, llm_response)
             
-            # Tạo phản hồi dựa trên loại tìm kiếm
-            if search_type == "image":
-                logger.info("Sử dụng prompt cho tìm kiếm bằng hình ảnh")
-                llm_response = self._generate_image_search_response(
-                    search_results, 
-                    image_analysis,
-                    original_query
-                )
-            elif search_type == "combined":
-                logger.info("Sử dụng prompt cho tìm kiếm kết hợp")
-                llm_response = self._generate_combined_search_response(
-                    search_results,
-                    original_query,
-                    text_normalized_query,
-                    image_normalized_query,
-                    image_analysis
-                )
-            else:
-                logger.info("Sử dụng prompt cho tìm kiếm bằng văn bản")
-                llm_response = self._generate_text_search_response(
-                    search_results, 
-                    original_query or normalized_query
-                )
+        except Exception as e:
+            return self._exception_response(e, search_results)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__ (không block event loop trong lúc chờ Gemini).
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
             
-            # Tạo kết quả cuối cùng
-            final_response = {
-                "products": search_results,
-                "count": len(search_results),
-                "llm_response": llm_response,
-                "search_type": search_type
-            }
+        Returns:
+            Dict chứa phản hồi cuối cùng
+        """
+        search_results = state.get("search_results", [])
+        self._log_request(state)
+        
+        try:
+            if state.get("error"):
+                return self._previous_error_response(state)
             
-            logger.info("Đã tạo phản hồi cuối cùng")
-            return {"final_response": final_response}
+            llm_response = await self._ainvoke_llm(self._prepare_llm_request(state))
+            return self._build_final_response(state, llm_response)
+            
+        except Exception as e:
+            return self._exception_response(e, search_results)
+    
+    def _log_request(self, state: Dict[str, Any]):
+        """Log thông tin đầu vào (dùng chung cho __call__ và ainvoke)"""
+        logger.info(f"Định dạng phản hồi cho loại tìm kiếm: {state.get('search_type', 'text')}")
+        logger.info(f"Query gốc: {state.get('original_query', '')}")
+        logger.info(f"Query chuẩn hóa: {state.get('normalized_query', '')}")
+        logger.info(f"Text normalized query: {state.get('text_normalized_query', '')}")
+        logger.info(f"Image normalized query: {state.get('image_normalized_query', '')}")
+        logger.info(f"Số lượng kết quả: {len(state.get('search_results', []))}")
+    
+    def _prepare_llm_request(self, state: Dict[str, Any]) -> Tuple[str, str, str]:
+        """
+        Chọn prompt theo loại tìm kiếm.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
             
+        Returns:
+            (prompt, phản hồi fallback khi gọi LLM lỗi, tên trường hợp để log)
+        """
+        search_results = state.get("search_results", [])
+        normalized_query = state.get("normalized_query", "")
+        original_query = state.get("original_query", "")
+        search_type = state.get("search_type", "text")
+        image_analysis = state.get("image_analysis", {})
+        
+        # Kiểm tra nếu không có kết quả
+        if not search_results:
+            logger.info("Không có kết quả tìm kiếm, tạo phản hồi thông báo")
+            return self._no_results_request(original_query or normalized_query, search_type)
+        
+        # Tạo phản hồi dựa trên loại tìm kiếm
+        if search_type == "image":
+            logger.info("Sử dụng prompt cho tìm kiếm bằng hình ảnh")
+            return self._image_search_request(search_results, image_analysis, original_query)
+        elif search_type == "combined":
+            logger.info("Sử dụng prompt cho tìm kiếm kết hợp")
+            return self._combined_search_request(
+                search_results,
+                original_query,
+                state.get("text_normalized_query", ""),
+                state.get("image_normalized_query", ""),
+                image_analysis
+            )
+        else:
+            logger.info("Sử dụng prompt cho tìm kiếm bằng văn bản")
+            return self._text_search_request(search_results, original_query or normalized_query)
+    
+    def _invoke_llm(self, request: Tuple[str, str, str]) -> str:
+        prompt, fallback, case = request
+        try:
+            response = self.llm.invoke(prompt)
+            logger.info(f"Đã nhận phản hồi từ LLM cho {case}")
+            return response.content
+        except Exception as e:
+            logger.error(f"Lỗi khi tạo phản hồi cho {case}: {e}")
+            return fallback
+    
+    async def _ainvoke_llm(self, request: Tuple[str, str, str]) -> str:
+        prompt, fallback, case = request
+        try:
+            response = await self.llm.ainvoke(prompt)
+            logger.info(f"Đã nhận phản hồi từ LLM cho {case}")
+            return response.content
         except Exception as e:
-            logger.error(f"Lỗi khi định dạng phản hồi: {e}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Lỗi khi tạo phản hồi cho {case}: {e}")
+            return fallback
+    
+    def _build_final_response(self, state: Dict[str, Any], llm_response: str) -> Dict[str, Any]:
+        """
+        Tạo kết quả cuối cùng từ phản hồi của LLM.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+            llm_response: Phản hồi dạng văn bản từ LLM
+            
+        Returns:
+            Dict chứa phản hồi cuối cùng
+        """
+        search_results = state.get("search_results", [])
+        if not search_results:
             return {
                 "final_response": {
-                    "error": str(e),
-                    "products": search_results,
-                    "count": len(search_results),
-                    "summary": "Đã xảy ra lỗi khi định dạng kết quả tìm kiếm."
+                    "products": [],
+                    "count": 0,
+                    "summary": "Không tìm thấy sản phẩm phù hợp.",
+                    "llm_response": llm_response
                 }
             }
+        
+        # Tạo kết quả cuối cùng
+        final_response = {
+            "products": search_results,
+            "count": len(search_results),
+            "llm_response": llm_response,
+            "search_type": state.get("search_type", "text")
+        }
+        
+        logger.info("Đã tạo phản hồi cuối cùng")
+        return {"final_response": final_response}
+    
+    def _previous_error_response(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.error(f"Lỗi từ các node trước: {state['error']}")
+        return {
+            "final_response": {
+                "error": state["error"],
+                "products": [],
+                "count": 0,
+                "summary": "Xin lỗi, đã xảy ra lỗi khi tìm kiếm sản phẩm."
+            }
+        }
+    
+    def _exception_response(self, e: Exception, search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        logger.error(f"Lỗi khi định dạng phản hồi: {e}")
+        logger.error(traceback.format_exc())
+        return {
+            "final_response": {
+                "error": str(e),
+                "products": search_results,
+                "count": len(search_results),
+                "summary": "Đã xảy ra lỗi khi định dạng kết quả tìm kiếm."
+            }
+        }
     
-    def _generate_text_search_response(
+    def _text_search_request(
         self, 
         search_results: List[Dict[str, Any]], 
         query: str
-    ) -> str:
+    ) -> Tuple[str, str, str]:
         """
-        Tạo phản hồi cho tìm kiếm bằng văn bản.
+        Tạo prompt cho tìm kiếm bằng văn bản.
         
         Args:
             search_results: Danh sách kết quả tìm kiếm
             query: Câu truy vấn tìm kiếm
             
         Returns:
-            Phản hồi dạng văn bản
+            (prompt, phản hồi fallback, tên trường hợp)
         """
-        try:
-            # Giới hạn số lượng sản phẩm để đưa vào prompt
-            limited_results = search_results[:5]
-            
-            # Tạo prompt
-            prompt = SEARCH_RESPONSE_PROMPT.format(
-                query=query,
-                products=json.dumps(limited_results, ensure_ascii=False, indent=2)
-            )
-            
-            # Gọi LLM
-            response = self.llm.invoke(prompt)
-            logger.info("Đã nhận phản hồi từ LLM")
-            
-            return response.content
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi tạo phản hồi cho tìm kiếm văn bản: {e}")
-            return f"Tìm thấy {len(search_results)} sản phẩm phù hợp với yêu cầu của bạn."
+        # Giới hạn số lượng sản phẩm để đưa vào prompt
+        limited_results = search_results[:5]
+        
+        # Tạo prompt
+        prompt = SEARCH_RESPONSE_PROMPT.format(
+            query=query,
+            products=json.dumps(limited_results, ensure_ascii=False, indent=2)
+        )
+        return (
+            prompt,
+            f"Tìm thấy {len(search_results)} sản phẩm phù hợp với yêu cầu của bạn.",
+            "tìm kiếm văn bản"
+        )
     
-    def _generate_image_search_response(
+    def _image_search_request(
         self, 
         search_results: List[Dict[str, Any]], 
         image_analysis: Dict[str, Any],
         original_query: str = ""
-    ) -> str:
+    ) -> Tuple[str, str, str]:
         """
-        Tạo phản hồi cho tìm kiếm bằng hình ảnh.
+        Tạo prompt cho tìm kiếm bằng hình ảnh.
         
         Args:
             search_results: Danh sách kết quả tìm kiếm
@@ -185,51 +247,45 @@ class FormatResponseNode:
             original_query: Câu truy vấn gốc của người dùng (nếu có)
             
         Returns:
-            Phản hồi dạng văn bản
+            (prompt, phản hồi fallback, tên trường hợp)
         """
-        try:
-            # Kiểm tra xem hình ảnh có chứa kính mắt không
-            contains_eyewear = image_analysis.get("contains_eyewear", False)
-            
-            if not contains_eyewear:
-                # Tạo phản hồi cho trường hợp hình ảnh không chứa kính mắt
-                logger.info("Hình ảnh không chứa kính mắt, sử dụng prompt cho hình ảnh không liên quan")
-                prompt = SEARCH_RESPONSE_IRRELEVANT_IMAGE_PROMPT.format(
-                    image_analysis=json.dumps(image_analysis, ensure_ascii=False, indent=2)
-                )
-            else:
-                # Tạo phản hồi bình thường cho hình ảnh có chứa kính mắt
-                logger.info("Hình ảnh có chứa kính mắt, sử dụng prompt tìm kiếm hình ảnh thông thường")
-                # Giới hạn số lượng sản phẩm để đưa vào prompt
-                limited_results = search_results[:5]
-                
-                # Tạo prompt
-                prompt = SEARCH_RESPONSE_IMAGE_PROMPT.format(
-                    user_query=original_query,
-                    image_analysis=json.dumps(image_analysis, ensure_ascii=False, indent=2),
-                    products=json.dumps(limited_results, ensure_ascii=False, indent=2)
-                )
-            
-            # Gọi LLM
-            response = self.llm.invoke(prompt)
-            logger.info("Đã nhận phản hồi từ LLM")
-            
-            return response.content
+        # Kiểm tra xem hình ảnh có chứa kính mắt không
+        contains_eyewear = image_analysis.get("contains_eyewear", False)
+        
+        if not contains_eyewear:
+            # Tạo phản hồi cho trường hợp hình ảnh không chứa kính mắt
+            logger.info("Hình ảnh không chứa kính mắt, sử dụng prompt cho hình ảnh không liên quan")
+            prompt = SEARCH_RESPONSE_IRRELEVANT_IMAGE_PROMPT.format(
+                image_analysis=json.dumps(image_analysis, ensure_ascii=False, indent=2)
+            )
+        else:
+            # Tạo phản hồi bình thường cho hình ảnh có chứa kính mắt
+            logger.info("Hình ảnh có chứa kính mắt, sử dụng prompt tìm kiếm hình ảnh thông thường")
+            # Giới hạn số lượng sản phẩm để đưa vào prompt
+            limited_results = search_results[:5]
             
-        except Exception as e:
-            logger.error(f"Lỗi khi tạo phản hồi cho tìm kiếm hình ảnh: {e}")
-            return f"Tìm thấy {len(search_results)} sản phẩm phù hợp với hình ảnh bạn đã gửi."
+            # Tạo prompt
+            prompt = SEARCH_RESPONSE_IMAGE_PROMPT.format(
+                user_query=original_query,
+                image_analysis=json.dumps(image_analysis, ensure_ascii=False, indent=2),
+                products=json.dumps(limited_results, ensure_ascii=False, indent=2)
+            )
+        return (
+            prompt,
+            f"Tìm thấy {len(search_results)} sản phẩm phù hợp với hình ảnh bạn đã gửi.",
+            "tìm kiếm hình ảnh"
+        )
     
-    def _generate_combined_search_response(
+    def _combined_search_request(
         self,
         search_results: List[Dict[str, Any]],
         original_query: str,
         text_query: str,
         image_query: str,
         image_analysis: Dict[str, Any]
-    ) -> str:
+    ) -> Tuple[str, str, str]:
         """
-        Tạo phản hồi cho tìm kiếm kết hợp (text + image).
+        Tạo prompt cho tìm kiếm kết hợp (text + image).
         
         Args:
             search_results: Danh sách kết quả tìm kiếm
@@ -239,66 +295,54 @@ class FormatResponseNode:
             image_analysis: Kết quả phân tích hình ảnh
             
         Returns:
-            Phản hồi dạng văn bản
+            (prompt, phản hồi fallback, tên trường hợp)
         """
-        try:
-            # Kiểm tra xem hình ảnh có chứa kính mắt không
-            contains_eyewear = image_analysis.get("contains_eyewear", False)
-            
-            if not contains_eyewear:
-                # Nếu hình ảnh không chứa kính mắt, sử dụng kết quả tìm kiếm văn bản
-                logger.info("Hình ảnh không chứa kính mắt, sử dụng kết quả tìm kiếm văn bản")
-                return self._generate_text_search_response(search_results, original_query)
-            
-            # Giới hạn số lượng sản phẩm để đưa vào prompt
-            limited_results = search_results[:5]
-            logger.info(f"Kết quả tìm kiếm: {limited_results}")
-            # Tạo prompt cho tìm kiếm kết hợp
-            prompt = SEARCH_RESPONSE_COMBINED_PROMPT.format(
-                user_query=original_query,
-                text_query=text_query,
-                image_query=image_query,
-                image_analysis=json.dumps(image_analysis, ensure_ascii=False, indent=2),
-                products=json.dumps(limited_results, ensure_ascii=False, indent=2)
-            )
-            
-            # Gọi LLM
-            response = self.llm.invoke(prompt)
-            logger.info("Đã nhận phản hồi từ LLM cho tìm kiếm kết hợp")
-            
-            return response.content
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi tạo phản hồi cho tìm kiếm kết hợp: {e}")
-            return f"Tìm thấy {len(search_results)} sản phẩm phù hợp với yêu cầu kết hợp của bạn."
+        # Kiểm tra xem hình ảnh có chứa kính mắt không
+        contains_eyewear = image_analysis.get("contains_eyewear", False)
+        
+        if not contains_eyewear:
+            # Nếu hình ảnh không chứa kính mắt, sử dụng kết quả tìm kiếm văn bản
+            logger.info("Hình ảnh không chứa kính mắt, sử dụng kết quả tìm kiếm văn bản")
+            return self._text_search_request(search_results, original_query)
+        
+        # Giới hạn số lượng sản phẩm để đưa vào prompt
+        limited_results = search_results[:5]
+        logger.info(f"Kết quả tìm kiếm: {limited_results}")
+        # Tạo prompt cho tìm kiếm kết hợp
+        prompt = SEARCH_RESPONSE_COMBINED_PROMPT.format(
+            user_query=original_query,
+            text_query=text_query,
+            image_query=image_query,
+            image_analysis=json.dumps(image_analysis, ensure_ascii=False, indent=2),
+            products=json.dumps(limited_results, ensure_ascii=False, indent=2)
+        )
+        return (
+            prompt,
+            f"Tìm thấy {len(search_results)} sản phẩm phù hợp với yêu cầu kết hợp của bạn.",
+            "tìm kiếm kết hợp"
+        )
     
-    def _generate_no_results_response(self, query: str, search_type: str) -> str:
+    def _no_results_request(self, query: str, search_type: str) -> Tuple[str, str, str]:
         """
-        Tạo phản hồi khi không có kết quả tìm kiếm.
+        Tạo prompt khi không có kết quả tìm kiếm.
         
         Args:
             query: Câu truy vấn tìm kiếm
             search_type: Loại tìm kiếm
             
         Returns:
-            Phản hồi dạng văn bản
+            (prompt, phản hồi fallback, tên trường hợp)
         """
-        try:
-            # Tạo prompt
-            prompt = SEARCH_RESPONSE_NO_RESULTS_PROMPT.format(
-                query=query,
-                search_type=search_type
-            )
-            
-            # Gọi LLM
-            response = self.llm.invoke(prompt)
-            logger.info("Đã nhận phản hồi từ LLM cho trường hợp không có kết quả")
-            
-            return response.content
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi tạo phản hồi cho trường hợp không có kết quả: {e}")
-            return "Xin lỗi, chúng tôi không tìm thấy sản phẩm nào phù hợp với yêu cầu của bạn."
+        # Tạo prompt
+        prompt = SEARCH_RESPONSE_NO_RESULTS_PROMPT.format(
+            query=query,
+            search_type=search_type
+        )
+        return (
+            prompt,
+            "Xin lỗi, chúng tôi không tìm thấy sản phẩm nào phù hợp với yêu cầu của bạn.",
+            "trường hợp không có kết quả"
+        )
 
 # Hàm tiện ích để tạo node
 def get_format_response_node(api_key: Optional[str] = None) -> FormatResponseNode:
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 import logging
 import json
 import base64
@@ -61,52 +61,17 @@ class ImageAnalysisNode:
         
         # Kiểm tra nếu không có dữ liệu hình ảnh
         if not image_data:
-            logger.warning("Không có dữ liệu hình ảnh, bỏ qua phân tích")
-            # Trả về kết quả với các biến tạm thời trống
-            result = {
-                "image_normalized_query": "",
-                "image_extracted_attributes": {}
-            }
-            # Giữ lại các giá trị quan trọng
-            self._preserve_important_values(result, state)
-            return result
+            return self._no_image_result(state)
         
         try:
             # Tạo hash đơn giản từ image_data để làm key cho cache
             image_hash = self._get_image_hash(image_data)
             
             # Kiểm tra cache
-            if image_hash in self._cache:
-                logger.info("Sử dụng kết quả phân tích từ cache")
-                cached_result = self._cache[image_hash]
-                
-                # Tạo kết quả từ cache
-                result = {
-                    "image_analysis": cached_result.get("image_analysis"),
-                    "image_normalized_query": cached_result.get("image_normalized_query", ""),
-                    "image_extracted_attributes": cached_result.get("image_extracted_attributes", {})
-                }
-            else:
+            result = self._get_cached_result(image_hash)
+            if result is None:
                 # Phân tích hình ảnh
-                image_analysis = self._analyze_image(image_data)
-                
-                # Tạo normalized_query và extracted_attributes chỉ khi hình ảnh có chứa kính mắt
-                if image_analysis.get("contains_eyewear", False):
-                    image_normalized_query = self._create_query_from_analysis(image_analysis)
-                    image_extracted_attributes = self._create_attributes_from_analysis(image_analysis)
-                else:
-                    image_normalized_query = ""
-                    image_extracted_attributes = {}
-                
-                # Tạo kết quả
-                result = {
-                    "image_analysis": image_analysis,
-                    "image_normalized_query": image_normalized_query,
-                    "image_extracted_attributes": image_extracted_attributes
-                }
-                
-                # Lưu vào cache
-                self._cache[image_hash] = result
+                result = self._build_result(image_hash, self._analyze_image(image_data))
             
             # Giữ lại các giá trị quan trọng từ state ban đầu
             self._preserve_important_values(result, state)
@@ -114,27 +79,120 @@ class ImageAnalysisNode:
             return result
             
         except Exception as e:
-            logger.error(f"Lỗi khi phân tích hình ảnh: {e}")
-            logger.error(f"Chi tiết lỗi: {traceback.format_exc()}")
-            result = {
-                "image_analysis": {
-                    "contains_eyewear": False,
-                    "error": str(e)
-                },
-                "image_normalized_query": "",
-                "image_extracted_attributes": {},
-                "error": f"Lỗi khi phân tích hình ảnh: {str(e)}"
-            }
-            # Giữ lại các giá trị quan trọng
+            return self._error_result(e, state)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__ (không block event loop trong lúc chờ Gemini Vision).
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+            
+        Returns:
+            Dict chứa kết quả phân tích hình ảnh
+        """
+        image_data = state.get("image_data")
+        if not image_data:
+            return self._no_image_result(state)
+        
+        try:
+            image_hash = self._get_image_hash(image_data)
+            result = self._get_cached_result(image_hash)
+            if result is None:
+                result = self._build_result(image_hash, await self._aanalyze_image(image_data))
+            
             self._preserve_important_values(result, state)
             return result
+            
+        except Exception as e:
+            return self._error_result(e, state)
+    
+    def _get_cached_result(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy kết quả phân tích từ cache.
+        
+        Args:
+            image_hash: Hash của hình ảnh
+            
+        Returns:
+            Dict kết quả (bản sao) hoặc None nếu chưa có trong cache
+        """
+        if image_hash not in self._cache:
+            return None
+        
+        logger.info("Sử dụng kết quả phân tích từ cache")
+        cached_result = self._cache[image_hash]
+        
+        # Tạo kết quả từ cache
+        return {
+            "image_analysis": cached_result.get("image_analysis"),
+            "image_normalized_query": cached_result.get("image_normalized_query", ""),
+            "image_extracted_attributes": cached_result.get("image_extracted_attributes", {})
+        }
     
-    def _get_image_hash(self, image_data: str) -> str:
+    def _build_result(self, image_hash: str, image_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tạo kết quả từ phân tích hình ảnh và lưu vào cache.
+        
+        Args:
+            image_hash: Hash của hình ảnh
+            image_analysis: Kết quả phân tích hình ảnh
+            
+        Returns:
+            Dict chứa kết quả phân tích hình ảnh
+        """
+        # Tạo normalized_query và extracted_attributes chỉ khi hình ảnh có chứa kính mắt
+        if image_analysis.get("contains_eyewear", False):
+            image_normalized_query = self._create_query_from_analysis(image_analysis)
+            image_extracted_attributes = self._create_attributes_from_analysis(image_analysis)
+        else:
+            image_normalized_query = ""
+            image_extracted_attributes = {}
+        
+        # Tạo kết quả
+        result = {
+            "image_analysis": image_analysis,
+            "image_normalized_query": image_normalized_query,
+            "image_extracted_attributes": image_extracted_attributes
+        }
+        
+        # Lưu vào cache
+        self._cache[image_hash] = result
+        return dict(result)
+    
+    def _no_image_result(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.warning("Không có dữ liệu hình ảnh, bỏ qua phân tích")
+        # Trả về kết quả với các biến tạm thời trống
+        result = {
+            "image_normalized_query": "",
+            "image_extracted_attributes": {}
+        }
+        # Giữ lại các giá trị quan trọng
+        self._preserve_important_values(result, state)
+        return result
+    
+    def _error_result(self, e: Exception, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.error(f"Lỗi khi phân tích hình ảnh: {e}")
+        logger.error(f"Chi tiết lỗi: {traceback.format_exc()}")
+        result = {
+            "image_analysis": {
+                "contains_eyewear": False,
+                "error": str(e)
+            },
+            "image_normalized_query": "",
+            "image_extracted_attributes": {},
+            "error": f"Lỗi khi phân tích hình ảnh: {str(e)}"
+        }
+        # Giữ lại các giá trị quan trọng
+        self._preserve_important_values(result, state)
+        return result
+    
+    def _get_image_hash(self, image_data: Union[bytes, str]) -> str:
         """
         Tạo hash từ dữ liệu hình ảnh.
         
         Args:
-            image_data: Dữ liệu hình ảnh dạng base64
+            image_data: Dữ liệu hình ảnh (raw bytes hoặc base64)
             
         Returns:
             Chuỗi hash
@@ -142,72 +200,117 @@ class ImageAnalysisNode:
         import hashlib
         return hashlib.md5(image_data.encode() if isinstance(image_data, str) else image_data).hexdigest()
     
-    def _analyze_image(self, image_data: str) -> Dict[str, Any]:
+    def _analyze_image(self, image_data: Union[bytes, str]) -> Dict[str, Any]:
         """
         Phân tích hình ảnh sử dụng Gemini Vision.
         
         Args:
-            image_data: Dữ liệu hình ảnh dạng base64
+            image_data: Dữ liệu hình ảnh (raw bytes hoặc base64)
             
         Returns:
             Dict chứa kết quả phân tích
         """
         try:
-            # Chuẩn bị dữ liệu hình ảnh
-            if "base64," in image_data:
-                # Nếu image_data đã có định dạng data URL
-                image_for_model = image_data
-            else:
-                # Nếu image_data chỉ là chuỗi base64 thuần túy
-                # Thử xác định loại hình ảnh
-                try:
-                    # Giải mã base64
-                    decoded_data = base64.b64decode(image_data)
-                    img = Image.open(BytesIO(decoded_data))
-                    mime_type = f"image/{img.format.lower()}" if img.format else "image/jpeg"
-                    image_for_model = f"data:{mime_type};base64,{image_data}"
-                except Exception as e:
-                    logger.warning(f"Không thể xác định loại hình ảnh: {e}")
-                    image_for_model = f"data:image/jpeg;base64,{image_data}"
-            
-            # Gọi Gemini Vision để phân tích hình ảnh
-            from langchain_core.messages import HumanMessage
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": IMAGE_ANALYSIS_PROMPT},
-                    {"type": "image_url", "image_url": {"url": image_for_model}}
-                ]
-            )
+            response = self.llm.invoke([self._build_vision_message(image_data)])
+            return self._parse_vision_response(response)
             
-            response = self.llm.invoke([message])
-            # logger.info("Đã nhận phản hồi từ Gemini Vision")
-            
-            # Phân tích kết quả JSON
-            result = self._parse_analysis_result(response.content)
-            logger.info(f"Kết quả phân tích hình ảnh: {json.dumps(result, ensure_ascii=False)[:200]}...")
+        except Exception as e:
+            logger.error(f"Lỗi khi phân tích hình ảnh: {e}")
+            logger.error(traceback.format_exc())
+            return self._default_analysis()
+    
+    async def _aanalyze_image(self, image_data: Union[bytes, str]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của _analyze_image.
+        
+        Args:
+            image_data: Dữ liệu hình ảnh (raw bytes hoặc base64)
             
-            return result
+        Returns:
+            Dict chứa kết quả phân tích
+        """
+        try:
+            response = await self.llm.ainvoke([self._build_vision_message(image_data)])
+            return self._parse_vision_response(response)
             
         except Exception as e:
             logger.error(f"Lỗi khi phân tích hình ảnh: {e}")
             logger.error(traceback.format_exc())
-            return {
-                "contains_eyewear": False,
-                "contains_person": False,
-                "eyewear_type": "",
-                "eyewear_description": {
-                    "brand": "",
-                    "color": "",
-                    "frame_material": "",
-                    "frame_shape": "",
-                    "gender": "",
-                    "style": "",
-                    "detailed_description": ""
-                },
-                "face_description": "",
-                "general_description": "Không thể phân tích hình ảnh",
-                "suggested_search_terms": []  # Không đặt giá trị mặc định "kính mắt"
-            }
+            return self._default_analysis()
+    
+    def _build_vision_message(self, image_data: Union[bytes, str]) -> Any:
+        """
+        Tạo message (prompt + hình ảnh dạng data URL) gửi cho Gemini Vision.
+        
+        Args:
+            image_data: Dữ liệu hình ảnh (raw bytes hoặc base64)
+            
+        Returns:
+            HumanMessage
+        """
+        # Chuẩn bị dữ liệu hình ảnh
+        if isinstance(image_data, bytes):
+            # Raw bytes: chỉ encode base64 một lần khi gửi cho Gemini
+            try:
+                img = Image.open(BytesIO(image_data))
+                mime_type = f"image/{img.format.lower()}" if img.format else "image/jpeg"
+            except Exception as e:
+                logger.warning(f"Không thể xác định loại hình ảnh: {e}")
+                mime_type = "image/jpeg"
+            image_for_model = f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
+        elif "base64," in image_data:
+            # Nếu image_data đã có định dạng data URL
+            image_for_model = image_data
+        else:
+            # Nếu image_data chỉ là chuỗi base64 thuần túy
+            # Thử xác định loại hình ảnh
+            try:
+                # Giải mã base64
+                decoded_data = base64.b64decode(image_data)
+                img = Image.open(BytesIO(decoded_data))
+                mime_type = f"image/{img.format.lower()}" if img.format else "image/jpeg"
+                image_for_model = f"data:{mime_type};base64,{image_data}"
+            except Exception as e:
+                logger.warning(f"Không thể xác định loại hình ảnh: {e}")
+                image_for_model = f"data:image/jpeg;base64,{image_data}"
+        
+        # Gọi Gemini Vision để phân tích hình ảnh
+        from langchain_core.messages import HumanMessage
+        return HumanMessage(
+            content=[
+                {"type": "text", "text": IMAGE_ANALYSIS_PROMPT},
+                {"type": "image_url", "image_url": {"url": image_for_model}}
+            ]
+        )
+    
+    def _parse_vision_response(self, response: Any) -> Dict[str, Any]:
+        # logger.info("Đã nhận phản hồi từ Gemini Vision")
+        
+        # Phân tích kết quả JSON
+        result = self._parse_analysis_result(response.content)
+        logger.info(f"Kết quả phân tích hình ảnh: {json.dumps(result, ensure_ascii=False)[:200]}...")
+        
+        return result
+    
+    def _default_analysis(self) -> Dict[str, Any]:
+        """Kết quả phân tích mặc định khi không gọi được Gemini Vision"""
+        return {
+            "contains_eyewear": False,
+            "contains_person": False,
+            "eyewear_type": "",
+            "eyewear_description": {
+                "brand": "",
+                "color": "",
+                "frame_material": "",
+                "frame_shape": "",
+                "gender": "",
+                "style": "",
+                "detailed_description": ""
+            },
+            "face_description": "",
+            "general_description": "Không thể phân tích hình ảnh",
+            "suggested_search_terms": []  # Không đặt giá trị mặc định "kính mắt"
+        }
     
     def _parse_analysis_result(self, result_text: str) -> Dict[str, Any]:
         """
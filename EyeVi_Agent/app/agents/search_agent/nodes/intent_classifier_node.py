@@ -41,21 +41,54 @@ class IntentClassifierNode:
             return {"intent": "unknown"}
         
         try:
-            # Chuẩn bị prompt
-            prompt = INTENT_CLASSIFICATION_PROMPT.format(message=query)
-            
             # Gọi LLM để phân loại intent
-            response = self.llm.invoke(prompt)
-            intent = response.content.strip().lower()
-            
-            logger.info(f"Đã phân loại intent: '{intent}' cho query: '{query}'")
+            response = self.llm.invoke(INTENT_CLASSIFICATION_PROMPT.format(message=query))
+            return self._parse_intent(response, query)
+        
+        except Exception as e:
+            logger.error(f"Lỗi khi phân loại intent: {e}")
+            return {"intent": "unknown", "error": str(e)}
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__ (không block event loop trong lúc chờ Gemini).
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
             
-            # Cập nhật state với intent đã phân loại
-            return {"intent": intent}
+        Returns:
+            Dict chứa intent được phân loại
+        """
+        query = state.get("query", "")
+        if not query:
+            logger.warning("Query rỗng, không thể phân loại intent")
+            return {"intent": "unknown"}
+        
+        try:
+            response = await self.llm.ainvoke(INTENT_CLASSIFICATION_PROMPT.format(message=query))
+            return self._parse_intent(response, query)
         
         except Exception as e:
             logger.error(f"Lỗi khi phân loại intent: {e}")
             return {"intent": "unknown", "error": str(e)}
+    
+    def _parse_intent(self, response: Any, query: str) -> Dict[str, Any]:
+        """
+        Lấy intent từ phản hồi của LLM.
+        
+        Args:
+            response: Phản hồi từ LLM
+            query: Query của người dùng
+            
+        Returns:
+            Dict chứa intent được phân loại
+        """
+        intent = response.content.strip().lower()
+        
+        logger.info(f"Đã phân loại intent: '{intent}' cho query: '{query}'")
+        
+        # Cập nhật state với intent đã phân loại
+        return {"intent": intent}
 
 # Hàm tiện ích để tạo node
 def get_intent_classifier_node(api_key: Optional[str] = None) -> IntentClassifierNode:
@@ -0,0 +1,171 @@
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import os
+import asyncio
+import torch
+
+from data.intent_prototypes import INTENT_PROTOTYPES
+
+logger = logging.getLogger(__name__)
+
+class LocalIntentClassifierNode:
+    """
+    Node phân loại intent không cần LLM: so khớp embedding CLIP (text tower đã tải trong EmbedQueryNode)
+    của query với các câu mẫu của từng intent. Khi độ tin cậy thấp thì chuyển sang node LLM.
+    """
+    
+    def __init__(
+        self,
+        embed_node: Any,
+        fallback: Any,
+        min_similarity: Optional[float] = None,
+        min_margin: Optional[float] = None,
+        prototypes: Optional[Dict[str, List[str]]] = None
+    ):
+        """
+        Khởi tạo node phân loại intent cục bộ.
+        
+        Args:
+            embed_node: EmbedQueryNode (dùng chung model, processor và executor CLIP)
+            fallback: Node phân loại intent bằng LLM, dùng khi độ tin cậy thấp
+            min_similarity: Cosine similarity tối thiểu với prototype gần nhất (mặc định theo LOCAL_INTENT_MIN_SIMILARITY)
+            min_margin: Khoảng cách tối thiểu giữa intent tốt nhất và intent thứ hai (mặc định theo LOCAL_INTENT_MIN_MARGIN)
+            prototypes: Câu mẫu cho từng intent (mặc định INTENT_PROTOTYPES)
+        """
+        self.embed_node = embed_node
+        self.fallback = fallback
+        self.min_similarity = min_similarity if min_similarity is not None else float(os.getenv("LOCAL_INTENT_MIN_SIMILARITY", "0.85"))
+        self.min_margin = min_margin if min_margin is not None else float(os.getenv("LOCAL_INTENT_MIN_MARGIN", "0.02"))
+        self.prototypes = prototypes or INTENT_PROTOTYPES
+        
+        # Embedding của các prototype chỉ tính một lần
+        self._labels = [intent for intent, examples in self.prototypes.items() for _ in examples]
+        self._matrix = self._embed_texts([example for examples in self.prototypes.values() for example in examples])
+        
+        self.local_hits = 0
+        self.llm_fallbacks = 0
+        logger.info(f"LocalIntentClassifierNode đã được khởi tạo với {len(self._labels)} prototypes")
+    
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phân loại intent từ query của người dùng, chuyển sang LLM khi độ tin cậy thấp.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+        
+        Returns:
+            Dict chứa intent được phân loại
+        """
+        query = state.get("query", "")
+        if not query:
+            logger.warning("Query rỗng, không thể phân loại intent")
+            return {"intent": "unknown"}
+        
+        try:
+            result = self._local_result(query, self.classify(query))
+        except Exception as e:
+            logger.error(f"Lỗi khi phân loại intent cục bộ: {e}")
+            result = None
+        
+        if result is not None:
+            return result
+        
+        self.llm_fallbacks += 1
+        return self.fallback(state)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__: CLIP chạy trên executor của EmbedQueryNode.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+        
+        Returns:
+            Dict chứa intent được phân loại
+        """
+        query = state.get("query", "")
+        if not query:
+            logger.warning("Query rỗng, không thể phân loại intent")
+            return {"intent": "unknown"}
+        
+        try:
+            loop = asyncio.get_running_loop()
+            scores = await loop.run_in_executor(self.embed_node._executor, self.classify, query)
+            result = self._local_result(query, scores)
+        except Exception as e:
+            logger.error(f"Lỗi khi phân loại intent cục bộ: {e}")
+            result = None
+        
+        if result is not None:
+            return result
+        
+        self.llm_fallbacks += 1
+        return await self.fallback.ainvoke(state)
+    
+    def classify(self, query: str) -> Tuple[str, float, float]:
+        """
+        Tìm intent có prototype gần query nhất.
+        
+        Args:
+            query: Query của người dùng
+        
+        Returns:
+            (intent, similarity với prototype gần nhất, margin so với intent thứ hai)
+        """
+        similarities = (self._matrix @ self._embed_texts([query])[0]).tolist()
+        
+        # Điểm của mỗi intent là similarity với prototype gần nhất của intent đó
+        best_by_intent: Dict[str, float] = {}
+        for intent, similarity in zip(self._labels, similarities):
+            best_by_intent[intent] = max(similarity, best_by_intent.get(intent, -1.0))
+        
+        ranked = sorted(best_by_intent.items(), key=lambda item: item[1], reverse=True)
+        intent, similarity = ranked[0]
+        margin = similarity - ranked[1][1] if len(ranked) > 1 else similarity
+        return intent, similarity, margin
+    
+    def is_confident(self, similarity: float, margin: float) -> bool:
+        """Kiểm tra kết quả cục bộ có đủ tin cậy để bỏ qua LLM hay không."""
+        return similarity >= self.min_similarity and margin >= self.min_margin
+    
+    def _local_result(self, query: str, scores: Tuple[str, float, float]) -> Optional[Dict[str, Any]]:
+        intent, similarity, margin = scores
+        if not self.is_confident(similarity, margin):
+            logger.info(
+                f"Intent cục bộ '{intent}' không đủ tin cậy (similarity={similarity:.3f}, margin={margin:.3f}), "
+                f"chuyển sang LLM cho query: '{query}'"
+            )
+            return None
+        
+        self.local_hits += 1
+        logger.info(f"Đã phân loại intent cục bộ: '{intent}' (similarity={similarity:.3f}) cho query: '{query}'")
+        return {"intent": intent}
+    
+    def _embed_texts(self, texts: List[str]) -> torch.Tensor:
+        """
+        Tạo embedding đã chuẩn hóa cho một batch văn bản bằng text tower của CLIP.
+        
+        Args:
+            texts: Danh sách văn bản
+        
+        Returns:
+            Tensor [len(texts), dim]
+        """
+        with torch.no_grad():
+            inputs = self.embed_node.processor(text=texts, return_tensors="pt", padding=True, truncation=True)
+            features = self.embed_node.model.get_text_features(**inputs)
+            return features / features.norm(dim=-1, keepdim=True)
+
+# Hàm tiện ích để tạo node
+def get_local_intent_classifier_node(embed_node: Any, fallback: Any) -> LocalIntentClassifierNode:
+    """
+    Tạo một instance của LocalIntentClassifierNode.
+    
+    Args:
+        embed_node: EmbedQueryNode đã tải CLIP
+        fallback: Node phân loại intent bằng LLM
+    
+    Returns:
+        LocalIntentClassifierNode instance
+    """
+    return LocalIntentClassifierNode(embed_node=embed_node, fallback=fallback)
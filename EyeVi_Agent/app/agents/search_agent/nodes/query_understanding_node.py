@@ -0,0 +1,101 @@
+from typing import Dict, Any, Optional
+import logging
+
+from prompts.search_prompts import UNDERSTAND_QUERY_PROMPT
+from nodes.attribute_extraction_node import AttributeExtractionNode
+
+# Cấu hình logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class QueryUnderstandingNode(AttributeExtractionNode):
+    """
+    Node gộp IntentClassifierNode và AttributeExtractionNode: một lần gọi LLM trả về
+    intent, câu mô tả chuẩn hóa và các thuộc tính (thay vì hai round trip Gemini tuần tự).
+    """
+    
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Khởi tạo node hiểu query.
+        
+        Args:
+            api_key: API key cho Google Generative AI
+        """
+        super().__init__(api_key=api_key)
+        logger.info("QueryUnderstandingNode đã được khởi tạo")
+    
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phân loại intent và trích xuất thuộc tính từ query của người dùng.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+        
+        Returns:
+            Dict chứa intent và các thuộc tính được trích xuất
+        """
+        query = state.get("query", "")
+        
+        # Kiểm tra nếu query rỗng (ví dụ tìm kiếm chỉ bằng hình ảnh)
+        if not query:
+            return self._empty_query_result(state)
+        
+        try:
+            response = self.llm.invoke(UNDERSTAND_QUERY_PROMPT.replace("{query}", query))
+            return self._build_result(response, query, state)
+        
+        except Exception as e:
+            return self._error_result(e, query, state)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+        
+        Returns:
+            Dict chứa intent và các thuộc tính được trích xuất
+        """
+        query = state.get("query", "")
+        if not query:
+            return self._empty_query_result(state)
+        
+        try:
+            response = await self.llm.ainvoke(UNDERSTAND_QUERY_PROMPT.replace("{query}", query))
+            return self._build_result(response, query, state)
+        
+        except Exception as e:
+            return self._error_result(e, query, state)
+    
+    def _build_result(self, response: Any, query: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        parsed = self._parse_extraction_result(response.content)
+        intent = str(parsed.get("intent") or "unknown").strip().lower()
+        logger.info(f"Đã phân loại intent: '{intent}' cho query: '{query}'")
+        
+        result = self._result_from_extraction(parsed, query, state)
+        result["intent"] = intent
+        return result
+    
+    def _empty_query_result(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        result = super()._empty_query_result(state)
+        result["intent"] = "unknown"
+        return result
+    
+    def _error_result(self, e: Exception, query: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        result = super()._error_result(e, query, state)
+        result["intent"] = "unknown"
+        return result
+
+# Hàm tiện ích để tạo node
+def get_query_understanding_node(api_key: Optional[str] = None) -> QueryUnderstandingNode:
+    """
+    Tạo một instance của QueryUnderstandingNode.
+    
+    Args:
+        api_key: API key cho Google Generative AI
+    
+    Returns:
+        QueryUnderstandingNode instance
+    """
+    return QueryUnderstandingNode(api_key=api_key)
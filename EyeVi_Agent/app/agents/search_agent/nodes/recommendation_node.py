@@ -38,39 +38,67 @@ class RecommendationNode:
         """
         # Lấy query từ state
         query = state.get("query", "")
-        original_query = state.get("original_query", query)
         
         # Kiểm tra nếu query rỗng
         if not query:
             logger.warning("Query rỗng, không thể tư vấn")
-            return {
-                "final_response": {
-                    "text": "Xin lỗi, tôi không hiểu bạn muốn tư vấn về điều gì. Vui lòng cung cấp thêm thông tin."
-                }
-            }
+            return self._empty_query_response()
         
         try:
             # Gọi LLM để tư vấn
-            formatted_prompt = RECOMMENDATION_PROMPT.replace("{query}", query)
-            response = self.llm.invoke(formatted_prompt)
-            
-            # Log phản hồi từ LLM
-            logger.info(f"Phản hồi tư vấn từ LLM:\n{response.content[:200]}...")
+            response = self.llm.invoke(RECOMMENDATION_PROMPT.replace("{query}", query))
+            return self._build_response(response)
+        
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__ (không block event loop trong lúc chờ Gemini).
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
             
-            return {
-                "recommendation": response.content,
-                "final_response": {"text": response.content}
-            }
+        Returns:
+            Dict chứa kết quả tư vấn
+        """
+        query = state.get("query", "")
+        if not query:
+            logger.warning("Query rỗng, không thể tư vấn")
+            return self._empty_query_response()
+        
+        try:
+            response = await self.llm.ainvoke(RECOMMENDATION_PROMPT.replace("{query}", query))
+            return self._build_response(response)
         
         except Exception as e:
-            logger.error(f"Lỗi khi tư vấn: {e}")
-            logger.error(f"Chi tiết lỗi: {traceback.format_exc()}")
-            return {
-                "final_response": {
-                    "text": "Xin lỗi, đã xảy ra lỗi khi xử lý yêu cầu của bạn."
-                },
-                "error": str(e)
+            return self._error_response(e)
+    
+    def _build_response(self, response: Any) -> Dict[str, Any]:
+        # Log phản hồi từ LLM
+        logger.info(f"Phản hồi tư vấn từ LLM:\n{response.content[:200]}...")
+        
+        return {
+            "recommendation": response.content,
+            "final_response": {"text": response.content}
+        }
+    
+    def _empty_query_response(self) -> Dict[str, Any]:
+        return {
+            "final_response": {
+                "text": "Xin lỗi, tôi không hiểu bạn muốn tư vấn về điều gì. Vui lòng cung cấp thêm thông tin."
             }
+        }
+    
+    def _error_response(self, e: Exception) -> Dict[str, Any]:
+        logger.error(f"Lỗi khi tư vấn: {e}")
+        logger.error(f"Chi tiết lỗi: {traceback.format_exc()}")
+        return {
+            "final_response": {
+                "text": "Xin lỗi, đã xảy ra lỗi khi xử lý yêu cầu của bạn."
+            },
+            "error": str(e)
+        }
 
 # Hàm tiện ích để tạo node
 def get_recommendation_node(api_key: Optional[str] = None) -> RecommendationNode:
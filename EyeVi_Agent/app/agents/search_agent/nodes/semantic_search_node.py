@@ -2,6 +2,7 @@ from typing import Dict, Any, Optional, List, Union
 import logging
 import traceback
 import json
+import asyncio
 
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue
@@ -129,6 +130,19 @@ class SemanticSearchNode:
                 "search_type": search_type  # Thêm thông tin search_type vào kết quả lỗi
             }
     
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phiên bản bất đồng bộ của __call__: QdrantClient là client đồng bộ (network I/O),
+        chạy trong thread pool để không block event loop.
+        
+        Args:
+            state: Trạng thái hiện tại của workflow
+            
+        Returns:
+            Dict chứa kết quả tìm kiếm
+        """
+        return await asyncio.to_thread(self, state)
+    
     def _create_filter_params(self, attributes: Dict[str, Any]) -> Optional[Filter]:
         """
         Tạo filter từ các thuộc tính.
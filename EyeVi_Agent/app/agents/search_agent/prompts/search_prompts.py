@@ -92,6 +92,53 @@ Phản hồi mong muốn:
 
 """
 
+# Prompt gộp phân loại intent + trích xuất thuộc tính trong một lần gọi LLM (QueryUnderstandingNode)
+UNDERSTAND_QUERY_PROMPT = """Bạn là đầu não của Search Agent trong ứng dụng thương mại điện tử kính mắt.
+Với câu truy vấn của người dùng, hãy (1) phân loại intent và (2) trích xuất các thuộc tính kính mắt.
+
+Câu truy vấn: {query}
+
+1. `intent` - chọn một trong:
+- search_product: Người dùng muốn tìm kiếm sản phẩm
+- product_detail: Người dùng muốn tìm hiểu thông tin sản phẩm
+- compare_products: Người dùng muốn so sánh sản phẩm
+- unknown: Người dùng không có ý định tìm kiếm sản phẩm
+Lưu ý: phần lớn yêu cầu bạn nhận được là tìm kiếm sản phẩm, hãy phân tích thật kỹ để tìm ra intent đúng.
+
+2. `slots` - các thuộc tính sau nếu có (không có thì để chuỗi rỗng `""`):
+- category (Kính Mát hoặc Gọng Kính)
+- gender (Nam / Nữ / Unisex)
+- brand (ví dụ: MOLSION, PUMA, RAYBAN,...)
+- color (càng cụ thể càng tốt)
+- frameMaterial (ví dụ: Kim loại, Nhựa, Nhựa Injection, Titan,...)
+- frameShape (ví dụ: Vuông, Tròn, Đa giác, Mắt mèo,...)
+
+3. `normalized_description` - một câu mô tả hoàn chỉnh theo định dạng:
+    → "(Category) (Gender) (Brand) màu (Color), khung (FrameMaterial), kiểu dáng (FrameShape)"
+   Nếu không trích xuất được thuộc tính nào, để `normalized_description` rỗng (`""`).
+
+### Quan trọng:
+- Tuyệt đối **chỉ trả về JSON duy nhất**, không thêm giải thích, markdown hoặc văn bản khác.
+- Viết hoa chữ cái đầu của giá trị (VD: "Xanh Dương", "Vuông")
+- Người dùng sẽ sử dụng ngôn ngữ Tiếng Việt, nếu có sai chính tả, hãy tự động chuẩn hóa lại.
+
+Ví dụ:
+Truy vấn: "Tôi muốn kính xanh dương của PUMA dành cho nữ, kiểu vuông"
+Kết quả:
+{
+  "intent": "search_product",
+  "normalized_description": "Kính Mát Nữ PUMA màu Xanh dương, khung , kiểu dáng Vuông",
+  "slots": {
+    "category": "Kính Mát",
+    "gender": "Nữ",
+    "brand": "PUMA",
+    "color": "Xanh dương",
+    "frameMaterial": "",
+    "frameShape": "Vuông"
+  }
+}
+"""
+
 IMAGE_ANALYSIS_PROMPT = """
 Hãy phân tích chi tiết hình ảnh này, tập trung vào kính mắt hoặc gọng kính nếu có.
 
@@ -12,6 +12,9 @@ from transformers import CLIPProcessor, CLIPModel
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue
 
+from tools.clip_batcher import ClipBatcher, clip_batching_enabled
+from tools.clip_onnx import clip_backend, load_onnx_clip_model
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -40,28 +43,35 @@ class ProductSearch:
             custom_model_path: Đường dẫn đến mô hình tùy chỉnh (nếu có)
         """
         try:
-            # Khởi tạo model và processor mặc định
-            logger.info(f"Đang tải model mặc định {model_name}")
-            self.model = CLIPModel.from_pretrained(model_name)
-            
-            if custom_model_path and os.path.exists(custom_model_path):
-                logger.info(f"Đang tải mô hình tùy chỉnh từ {custom_model_path}")
-                try:
-                    checkpoint = torch.load(custom_model_path, map_location=torch.device('cpu'))
-                    
-                    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-                        logger.info("Phát hiện checkpoint từ quá trình fine-tuning")
-                        self.model.load_state_dict(checkpoint['model_state_dict'])
-                        logger.info("Đã tải thành công model_state_dict từ checkpoint")
-                    elif isinstance(checkpoint, dict):
-                        logger.info("Thử tải state_dict trực tiếp")
-                        self.model.load_state_dict(checkpoint)
-                        logger.info("Đã tải thành công state_dict")
-                    else:
-                        logger.warning(f"Không hỗ trợ định dạng mô hình {type(checkpoint)}")
-                except Exception as e:
-                    logger.error(f"Lỗi khi tải mô hình tùy chỉnh: {e}")
-                    logger.warning("Tiếp tục sử dụng mô hình mặc định")
+            self.backend = clip_backend()
+            if self.backend != "torch":
+                # Trọng số fine-tuned đã nằm sẵn trong file ONNX (models/clip/export_onnx.py --checkpoint),
+                # metadata export phải khớp model_name/custom_model_path
+                logger.info(f"Đang tải CLIP backend {self.backend}")
+                self.model = load_onnx_clip_model(self.backend, model_name, custom_model_path)
+            else:
+                # Khởi tạo model và processor mặc định
+                logger.info(f"Đang tải model mặc định {model_name}")
+                self.model = CLIPModel.from_pretrained(model_name)
+                
+                if custom_model_path and os.path.exists(custom_model_path):
+                    logger.info(f"Đang tải mô hình tùy chỉnh từ {custom_model_path}")
+                    try:
+                        checkpoint = torch.load(custom_model_path, map_location=torch.device('cpu'))
+                        
+                        if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+                            logger.info("Phát hiện checkpoint từ quá trình fine-tuning")
+                            self.model.load_state_dict(checkpoint['model_state_dict'])
+                            logger.info("Đã tải thành công model_state_dict từ checkpoint")
+                        elif isinstance(checkpoint, dict):
+                            logger.info("Thử tải state_dict trực tiếp")
+                            self.model.load_state_dict(checkpoint)
+                            logger.info("Đã tải thành công state_dict")
+                        else:
+                            logger.warning(f"Không hỗ trợ định dạng mô hình {type(checkpoint)}")
+                    except Exception as e:
+                        logger.error(f"Lỗi khi tải mô hình tùy chỉnh: {e}")
+                        logger.warning("Tiếp tục sử dụng mô hình mặc định")
             
             # Tải processor
             try:
@@ -82,6 +92,9 @@ class ProductSearch:
 
         self.cache_size = cache_size
 
+        # Gom các request embedding đồng thời (từ nhiều thread) thành một forward pass
+        self.batcher = ClipBatcher(self.model, self.processor) if clip_batching_enabled() else None
+
         self.process_image = lru_cache(maxsize=cache_size)(self._process_image)
         self.process_text = lru_cache(maxsize=cache_size)(self._process_text)
 
@@ -96,6 +109,8 @@ class ProductSearch:
         """
         try:
             image = Image.open(BytesIO(image_bytes)).convert('RGB')
+            if self.batcher:
+                return self.batcher.embed_image(image).numpy()
             with torch.no_grad():
                 inputs = self.processor(images=image, return_tensors="pt")
                 image_features = self.model.get_image_features(**inputs)
@@ -114,6 +129,10 @@ class ProductSearch:
             Vector đặc trưng của văn bản
         """
         try:
+            if self.batcher:
+                # Chỉ biến thể đầu tiên (text gốc) được dùng, không cần embed các biến thể còn lại
+                return self.batcher.embed_text(text).numpy()
+
             # Tạo các biến thể của truy vấn để tăng khả năng tìm kiếm
             text_variants = [text]
             
@@ -0,0 +1,80 @@
+"""
+Blob store (phía đọc) - Lấy nội dung file từ blob reference (blob://sha256/<digest>) do host agent ghi
+
+Layout phải khớp với host_agent/server/blob_store.py:
+    local: {BLOB_STORE_DIR}/{digest[:2]}/{digest}
+    redis: HASH blob:sha256:{digest} (field "data")
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+BLOB_URI_PREFIX = "blob://sha256/"
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def parse_blob_uri(uri: Optional[str]) -> Optional[str]:
+    """Lấy digest từ blob URI (None nếu không phải blob reference hợp lệ)."""
+    if not uri or not uri.startswith(BLOB_URI_PREFIX):
+        return None
+    digest = uri[len(BLOB_URI_PREFIX):]
+    return digest if _DIGEST_RE.match(digest) else None
+
+class BlobReader:
+    """Đọc blob từ local filesystem hoặc Redis theo BLOB_STORE_BACKEND."""
+
+    def __init__(self, backend: Optional[str] = None, directory: Optional[str] = None):
+        self.backend = (backend if backend is not None else os.getenv("BLOB_STORE_BACKEND", "local")).lower()
+        self.directory = directory if directory is not None else os.getenv("BLOB_STORE_DIR", "/tmp/eyevi_blobs")
+        self._redis = None
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            # decode_responses=False vì blob là binary
+            self._redis = aioredis.Redis(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                password=os.getenv("REDIS_PASSWORD") or None,
+                db=int(os.getenv("REDIS_DB", "0")),
+                decode_responses=False
+            )
+        return self._redis
+
+    def _read_local(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.directory, digest[:2], digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def read(self, uri: str) -> Optional[bytes]:
+        """
+        Đọc nội dung blob và kiểm tra SHA-256.
+
+        Returns:
+            Bytes của blob, None nếu không tìm thấy hoặc nội dung không khớp digest
+        """
+        digest = parse_blob_uri(uri)
+        if digest is None:
+            logger.warning(f"Blob URI không hợp lệ: {uri}")
+            return None
+
+        if self.backend == "redis":
+            data = await self._get_redis().hget(f"blob:sha256:{digest}", "data")
+        else:
+            data = await asyncio.to_thread(self._read_local, digest)
+
+        if data is None:
+            logger.error(f"Không tìm thấy blob {digest[:12]} trong blob store ({self.backend})")
+            return None
+        if await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest()) != digest:
+            logger.error(f"Blob {digest[:12]} không khớp SHA-256, bỏ qua")
+            return None
+        return data
@@ -0,0 +1,178 @@
+"""
+CLIP micro-batching - Gom các request embedding đồng thời thành một forward pass
+
+Mỗi request (text hoặc ảnh) được đưa vào hàng đợi; một worker thread lấy request đầu tiên,
+chờ thêm tối đa CLIP_BATCH_MAX_WAIT_MS (hoặc tới khi đủ CLIP_BATCH_MAX_SIZE) rồi chạy
+một forward pass cho cả batch và trả kết quả qua Future.
+
+Caller đồng bộ (ProductSearch, executor của EmbedQueryNode) dùng embed_text/embed_image,
+caller async dùng aembed_text/aembed_image.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class ClipBatcher:
+    """Scheduler gom batch cho get_text_features/get_image_features của CLIPModel."""
+
+    def __init__(
+        self,
+        model: Any,
+        processor: Any,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.model = model
+        self.processor = processor
+        self.max_batch_size = max_batch_size if max_batch_size is not None else int(os.getenv("CLIP_BATCH_MAX_SIZE", "16"))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.getenv("CLIP_BATCH_MAX_WAIT_MS", "5"))) / 1000
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+        self._stats = {"requests": 0, "batches": 0, "max_batch": 0, "errors": 0}
+
+    def submit(self, kind: str, item: Any) -> Future:
+        """Đưa một request ("text" hoặc "image") vào hàng đợi, trả về Future của feature vector."""
+        if kind not in ("text", "image"):
+            raise ValueError(f"Loại embedding không hỗ trợ: {kind}")
+
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((kind, item, future))
+        return future
+
+    def embed_text(self, text: str) -> torch.Tensor:
+        """Feature vector (chưa chuẩn hóa) của một văn bản, block tới khi batch chứa nó chạy xong."""
+        return self.submit("text", text).result()
+
+    def embed_image(self, image: Any) -> torch.Tensor:
+        """Feature vector (chưa chuẩn hóa) của một ảnh PIL, block tới khi batch chứa nó chạy xong."""
+        return self.submit("image", image).result()
+
+    async def aembed_text(self, text: str) -> torch.Tensor:
+        return await asyncio.wrap_future(self.submit("text", text))
+
+    async def aembed_image(self, image: Any) -> torch.Tensor:
+        return await asyncio.wrap_future(self.submit("image", image))
+
+    def close(self) -> None:
+        """Dừng worker thread (các request đã xếp hàng vẫn được xử lý trước)."""
+        with self._worker_lock:
+            if self._worker is not None:
+                self._queue.put(_STOP)
+                self._worker.join()
+                self._worker = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "avg_batch": round(self._stats["requests"] / batches, 2) if batches else 0.0,
+            "queued": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="clip-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Không để lỗi bất ngờ làm chết worker thread (mọi request sau sẽ block mãi ở .result())
+                logger.error(f"Lỗi không mong đợi trong CLIP batcher: {e}")
+                self._stats["errors"] += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            if stop:
+                return
+
+    def _process(self, batch: List[Tuple[str, Any, Future]]) -> None:
+        # Bỏ request đã bị cancel (asyncio.wrap_future cancel Future khi task chờ bị cancel)
+        batch = [(kind, item, future) for kind, item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        self._stats["requests"] += len(batch)
+        self._stats["batches"] += 1
+        self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+
+        for kind in ("text", "image"):
+            group = [(item, future) for item_kind, item, future in batch if item_kind == kind]
+            if not group:
+                continue
+
+            try:
+                features = self._forward(kind, [item for item, _ in group])
+            except Exception as e:
+                logger.error(f"Lỗi khi chạy batch CLIP ({kind}, {len(group)} items): {e}")
+                self._stats["errors"] += 1
+                if len(group) == 1:
+                    group[0][1].set_exception(e)
+                    continue
+                # Chạy lại từng item để một input lỗi không làm hỏng request của người khác trong batch
+                for item, future in group:
+                    self._resolve_single(kind, item, future)
+                continue
+
+            for index, (_, future) in enumerate(group):
+                future.set_result(features[index])
+
+    def _resolve_single(self, kind: str, item: Any, future: Future) -> None:
+        try:
+            future.set_result(self._forward(kind, [item])[0])
+        except Exception as e:
+            future.set_exception(e)
+
+    def _forward(self, kind: str, items: List[Any]) -> torch.Tensor:
+        with torch.no_grad():
+            if kind == "text":
+                # Padding bên phải không ảnh hưởng tới embedding (causal mask, lấy tại token EOS);
+                # truncation giữ query dài trong giới hạn 77 token của CLIP
+                inputs = self.processor(text=items, return_tensors="pt", padding=True, truncation=True)
+                return self.model.get_text_features(**inputs)
+            inputs = self.processor(images=items, return_tensors="pt")
+            return self.model.get_image_features(**inputs)
+
+def clip_batching_enabled() -> bool:
+    return os.getenv("CLIP_BATCHING", "true").lower() == "true"
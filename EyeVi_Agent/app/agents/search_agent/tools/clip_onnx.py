@@ -0,0 +1,149 @@
+"""
+CLIP ONNX backend - Chạy text/vision tower đã export (models/clip/export_onnx.py) bằng ONNX Runtime
+
+OnnxClipModel có cùng get_text_features/get_image_features với CLIPModel (nhận output của
+CLIPProcessor, trả torch.Tensor), nên EmbedQueryNode, ProductSearch và ClipBatcher dùng được
+mà không cần sửa luồng xử lý.
+
+CLIP_BACKEND:
+    torch      CLIPModel eager (mặc định)
+    onnx       {CLIP_ONNX_DIR}/text.onnx, vision.onnx
+    onnx-int8  {CLIP_ONNX_DIR}/text_int8.onnx, vision_int8.onnx (dynamic int8 quantization)
+
+export_onnx.py ghi kèm {CLIP_ONNX_DIR}/export_meta.json (model gốc + sha256 của checkpoint fine-tuning);
+OnnxClipModel từ chối tải nếu file ONNX được export từ checkpoint khác với custom_model_path đang cấu hình,
+tránh serve embedding base-CLIP trên index dựng bằng vector fine-tuned.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+CLIP_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(__file__), "..", "models", "clip", "onnx")
+
+ONNX_METADATA_FILE = "export_meta.json"
+
+def clip_backend(backend: Optional[str] = None) -> str:
+    """Backend CLIP đang cấu hình (tham số hoặc CLIP_BACKEND)."""
+    backend = (backend if backend is not None else os.getenv("CLIP_BACKEND", "torch")).lower()
+    if backend not in CLIP_BACKENDS:
+        raise ValueError(f"CLIP_BACKEND không hợp lệ: {backend} (hỗ trợ: {', '.join(CLIP_BACKENDS)})")
+    return backend
+
+def onnx_model_paths(onnx_dir: str, quantized: bool):
+    suffix = "_int8" if quantized else ""
+    return os.path.join(onnx_dir, f"text{suffix}.onnx"), os.path.join(onnx_dir, f"vision{suffix}.onnx")
+
+def checkpoint_sha256(checkpoint_path: Optional[str]) -> Optional[str]:
+    """sha256 của file checkpoint (None nếu không có checkpoint, giống torch backend bỏ qua path không tồn tại)"""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return None
+    digest = hashlib.sha256()
+    with open(checkpoint_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_onnx_metadata(onnx_dir: str, model_name: str, checkpoint_path: Optional[str]) -> str:
+    """Ghi metadata export (model gốc + checkpoint) cạnh file ONNX, trả về đường dẫn file"""
+    path = os.path.join(onnx_dir, ONNX_METADATA_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "checkpoint": os.path.basename(checkpoint_path) if checkpoint_path else None,
+            "checkpoint_sha256": checkpoint_sha256(checkpoint_path),
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+def verify_onnx_metadata(onnx_dir: str, model_name: Optional[str], custom_model_path: Optional[str]) -> None:
+    """
+    Kiểm tra file ONNX được export từ đúng model gốc và checkpoint fine-tuning đang cấu hình.
+
+    Raises:
+        ValueError: nếu model gốc hoặc checkpoint không khớp
+    """
+    path = os.path.join(onnx_dir, ONNX_METADATA_FILE)
+    if not os.path.exists(path):
+        logger.warning(
+            f"Không tìm thấy {path}, không kiểm tra được checkpoint của file ONNX "
+            f"(export lại bằng models/clip/export_onnx.py)"
+        )
+        return
+    with open(path, encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    if model_name and metadata.get("model_name") != model_name:
+        raise ValueError(f"File ONNX được export từ {metadata.get('model_name')}, không phải {model_name}")
+    if metadata.get("checkpoint_sha256") != checkpoint_sha256(custom_model_path):
+        raise ValueError(
+            f"File ONNX được export từ checkpoint {metadata.get('checkpoint') or '(không có)'}, "
+            f"không khớp custom_model_path={custom_model_path}; "
+            f"export lại bằng models/clip/export_onnx.py --checkpoint"
+        )
+
+class OnnxClipModel:
+    """Thay thế CLIPModel khi suy luận bằng ONNX Runtime (CPU)."""
+
+    def __init__(
+        self,
+        onnx_dir: Optional[str] = None,
+        quantized: bool = False,
+        num_threads: Optional[int] = None,
+        model_name: Optional[str] = None,
+        custom_model_path: Optional[str] = None
+    ):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("CLIP_BACKEND=onnx cần cài onnxruntime (pip install onnxruntime)") from e
+
+        self.onnx_dir = onnx_dir if onnx_dir is not None else os.getenv("CLIP_ONNX_DIR", DEFAULT_ONNX_DIR)
+        self.quantized = quantized
+        num_threads = num_threads if num_threads is not None else int(os.getenv("CLIP_ONNX_THREADS", "0"))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        text_path, vision_path = onnx_model_paths(self.onnx_dir, quantized)
+        for path in (text_path, vision_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Không tìm thấy {path}, chạy models/clip/export_onnx.py trước")
+        verify_onnx_metadata(self.onnx_dir, model_name, custom_model_path)
+
+        self.text_session = ort.InferenceSession(text_path, options, providers=["CPUExecutionProvider"])
+        self.vision_session = ort.InferenceSession(vision_path, options, providers=["CPUExecutionProvider"])
+        logger.info(f"Đã tải CLIP ONNX ({'int8' if quantized else 'fp32'}) từ {self.onnx_dir}")
+
+    def get_text_features(self, input_ids, attention_mask=None, **kwargs) -> torch.Tensor:
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        outputs = self.text_session.run(None, {
+            "input_ids": input_ids.numpy().astype("int64"),
+            "attention_mask": attention_mask.numpy().astype("int64"),
+        })
+        return torch.from_numpy(outputs[0])
+
+    def get_image_features(self, pixel_values, **kwargs) -> torch.Tensor:
+        outputs = self.vision_session.run(None, {"pixel_values": pixel_values.numpy().astype("float32")})
+        return torch.from_numpy(outputs[0])
+
+    def eval(self) -> "OnnxClipModel":
+        return self
+
+def load_onnx_clip_model(
+    backend: str,
+    model_name: Optional[str] = None,
+    custom_model_path: Optional[str] = None
+) -> OnnxClipModel:
+    """Tạo OnnxClipModel theo backend ("onnx" hoặc "onnx-int8"), kiểm tra khớp model gốc/checkpoint."""
+    return OnnxClipModel(quantized=backend == "onnx-int8", model_name=model_name, custom_model_path=custom_model_path)
@@ -25,7 +25,7 @@ from google.adk.sessions import InMemorySessionService
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
 
-from .remote_agent_connection import RemoteAgentConnections
+from .remote_agent_connection import RemoteAgentConnections, SharedAgentTransport
 
 load_dotenv()
 nest_asyncio.apply()
@@ -38,6 +38,7 @@ class OrchestratorAgent:
         self,
     ):
         self.remote_agent_connections: dict[str, RemoteAgentConnections] = {}
+        self.transport = SharedAgentTransport()
         self.cards: dict[str, AgentCard] = {}
         self.agents: str = ""
         self._agent = self.create_agent()
@@ -57,7 +58,7 @@ class OrchestratorAgent:
                 try:
                     card = await card_resolver.get_agent_card()
                     remote_connection = RemoteAgentConnections(
-                        agent_card=card, agent_url=address
+                        agent_card=card, agent_url=address, transport=self.transport
                     )
                     self.remote_agent_connections[card.name] = remote_connection
                     print(f"Initialized connection for {card.name}")
@@ -1,4 +1,7 @@
-from typing import Callable
+import asyncio
+import os
+import time
+from typing import Any, Callable
 
 import httpx
 from a2a.client import A2AClient
@@ -18,13 +21,91 @@ TaskCallbackArg = Task | TaskStatusUpdateEvent | TaskArtifactUpdateEvent
 TaskUpdateCallback = Callable[[TaskCallbackArg, AgentCard], Task]
 
 
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class SharedAgentTransport:
+    """Pooled httpx clients shared by all remote agent connections.
+
+    One client per agent with explicit connection limits and keep-alive, HTTP/2 when
+    `h2` is installed (negotiated via ALPN, plain http:// agents stay on HTTP/1.1),
+    a per-request timeout and an overall deadline instead of `timeout=None`.
+    """
+
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+        )
+        self.timeout = httpx.Timeout(
+            float(os.getenv("AGENT_READ_TIMEOUT", "60")),
+            connect=float(os.getenv("AGENT_CONNECT_TIMEOUT", "5")),
+        )
+        self.deadline = float(os.getenv("AGENT_REQUEST_DEADLINE", "90"))
+        self.http2 = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and _http2_available()
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def get_client(self, agent_name: str) -> httpx.AsyncClient:
+        client = self._clients.get(agent_name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2)
+            self._clients[agent_name] = client
+            self._stats.setdefault(
+                agent_name,
+                {"in_flight": 0, "max_in_flight": 0, "requests": 0, "timeouts": 0, "errors": 0, "total_latency": 0.0},
+            )
+        return client
+
+    async def run(self, agent_name: str, coro) -> Any:
+        """Await `coro` under the overall deadline, recording pool utilization."""
+        stats = self._stats[agent_name]
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        stats["requests"] += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(coro, timeout=self.deadline)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            stats["timeouts"] += 1
+            raise
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            stats["total_latency"] += time.perf_counter() - start
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                **stats,
+                "utilization": stats["in_flight"] / self.limits.max_connections,
+                "avg_latency_ms": stats["total_latency"] / stats["requests"] * 1000 if stats["requests"] else 0.0,
+            }
+            for name, stats in self._stats.items()
+        }
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
 class RemoteAgentConnections:
     """A class to hold the connections to the remote agents."""
 
-    def __init__(self, agent_card: AgentCard, agent_url: str):
+    def __init__(self, agent_card: AgentCard, agent_url: str, transport: SharedAgentTransport | None = None):
         print(f"agent_card: {agent_card}")
         print(f"agent_url: {agent_url}")
-        self._httpx_client = httpx.AsyncClient(timeout=30)
+        self.transport = transport or SharedAgentTransport()
+        self._httpx_client = self.transport.get_client(agent_card.name)
         self.agent_client = A2AClient(self._httpx_client, agent_card, url=agent_url)
         self.card = agent_card
         self.conversation_name = None
@@ -37,4 +118,7 @@ class RemoteAgentConnections:
     async def send_message(
         self, message_request: SendMessageRequest
     ) -> SendMessageResponse:
-        return await self.agent_client.send_message(message_request, http_kwargs={"timeout": None})
\ No newline at end of file
+        return await self.transport.run(
+            self.card.name,
+            self.agent_client.send_message(message_request, http_kwargs={"timeout": self.transport.timeout}),
+        )
\ No newline at end of file